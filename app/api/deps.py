@@ -4,6 +4,7 @@ from jose import JWTError, jwt
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import AsyncGenerator
+from app.core.cache import user_cache
 from app.core.security import SECRET_KEY, ALGORITHM
 from app.db.session import AsyncSessionLocal
 from app.models.user import User
@@ -15,6 +16,9 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
   async with AsyncSessionLocal() as session:
     yield session
 
+def invalidate_user(email: str) -> None:
+  user_cache.invalidate(email)
+
 async def get_current_user(
   db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)
 ) -> User:
@@ -31,10 +35,17 @@ async def get_current_user(
     token_data = TokenData(email=email)
   except JWTError:
     raise credentials_exception
+
+  cached_user = user_cache.get(email)
+  if cached_user is not None:
+    return cached_user
     
   result = await db.execute(select(User).filter(User.email == email))
   user = result.scalar_one_or_none()
     
   if user is None:
     raise credentials_exception
+
+  # Kopia odłączona od sesji - bezpieczna do współdzielenia między żądaniami
+  user_cache.set(email, User(id=user.id, email=user.email, hashed_password=user.hashed_password))
   return user
@@ -2,28 +2,25 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import AsyncGenerator
 from datetime import timedelta
 
-from app.db.session import AsyncSessionLocal
+from app.api.deps import get_db
 from app.schemas.user import UserCreate, UserPublic
 from app.schemas.token import Token
 from app.models.user import User
-from app.core.security import create_access_token, get_password_hash, verify_password
+from app.core.security import (
+  PasswordHashingBusy, create_access_token, get_password_hash_async, verify_password_async
+)
 from app.config import settings
 
 router = APIRouter()
 
-def get_db():
-  db = SessionLocal()
-  try:
-    yield db
-  finally:
-    db.close()
-
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-  async with AsyncSessionLocal() as session:
-    yield session
+def hashing_busy_exception() -> HTTPException:
+  return HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Server is busy, try again later",
+    headers={"Retry-After": "1"},
+  )
 
 @router.post("/register", response_model=UserPublic)
 async def register_user(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
@@ -36,7 +33,10 @@ async def register_user(user_in: UserCreate, db: AsyncSession = Depends(get_db))
       detail="Email already registered",
     )
   
-  hashed_password = get_password_hash(user_in.password)
+  try:
+    hashed_password = await get_password_hash_async(user_in.password)
+  except PasswordHashingBusy:
+    raise hashing_busy_exception()
   db_user = User(email=user_in.email, hashed_password=hashed_password)
   db.add(db_user)
   await db.commit()
@@ -51,7 +51,12 @@ async def login_for_access_token(
   result = await db.execute(select(User).filter(User.email == form_data.username))
   user = result.scalar_one_or_none()
   
-  if not user or not verify_password(form_data.password, user.hashed_password):
+  try:
+    password_ok = user is not None and await verify_password_async(form_data.password, user.hashed_password)
+  except PasswordHashingBusy:
+    raise hashing_busy_exception()
+
+  if not password_ok:
     raise HTTPException(
       status_code=status.HTTP_401_UNAUTHORIZED,
       detail="Incorrect email or password",
@@ -0,0 +1,159 @@
+import csv
+import io
+import json
+from datetime import date
+from enum import Enum
+from typing import AsyncIterator
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.api.deps import get_db, get_current_user
+from app.models.user import User
+from app.models.company import Company
+from app.models.predictions import PredictionArima, PredictionGarch, PriceHistory
+
+router = APIRouter()
+
+# Liczba wierszy pobieranych z kursora serwerowego i kodowanych naraz
+EXPORT_CHUNK_SIZE = 5000
+
+class ExportFormat(str, Enum):
+  ndjson = "ndjson"
+  csv = "csv"
+  arrow = "arrow"
+
+MEDIA_TYPES = {
+  ExportFormat.ndjson: "application/x-ndjson",
+  ExportFormat.csv: "text/csv",
+  ExportFormat.arrow: "application/vnd.apache.arrow.stream",
+}
+
+PRICE_COLUMNS = [("ticker", "string"), ("date", "date"), ("close", "float")]
+FORECAST_COLUMNS = [
+  ("ticker", "string"), ("forecast_date", "date"), ("target_date", "date"),
+  ("predicted_value", "float"), ("predicted_volatility", "float"),
+]
+
+def parse_tickers(tickers: str | None) -> list[str] | None:
+  if not tickers:
+    return None
+  return list(dict.fromkeys(t.strip().upper() for t in tickers.split(",") if t.strip()))
+
+def load_pyarrow():
+  try:
+    import pyarrow
+  except ImportError:
+    raise HTTPException(status_code=400, detail="Arrow export requires pyarrow to be installed")
+  return pyarrow
+
+async def stream_partitions(db: AsyncSession, stmt) -> AsyncIterator[list]:
+  result = await db.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+  async for partition in result.partitions():
+    yield partition
+
+async def encode_ndjson(partitions, columns) -> AsyncIterator[bytes]:
+  names = [name for name, _ in columns]
+  async for rows in partitions:
+    yield "".join(
+      json.dumps(dict(zip(names, row)), default=date.isoformat) + "\n" for row in rows
+    ).encode()
+
+async def encode_csv(partitions, columns) -> AsyncIterator[bytes]:
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerow([name for name, _ in columns])
+  async for rows in partitions:
+    writer.writerows(rows)
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+  if buffer.tell():
+    yield buffer.getvalue().encode()
+
+async def encode_arrow(partitions, columns, pa) -> AsyncIterator[bytes]:
+  types = {"string": pa.string(), "date": pa.date32(), "float": pa.float64()}
+  schema = pa.schema([(name, types[kind]) for name, kind in columns])
+  sink = io.BytesIO()
+  with pa.ipc.new_stream(sink, schema) as writer:
+    async for rows in partitions:
+      writer.write_batch(pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)],
+        schema=schema,
+      ))
+      yield sink.getvalue()
+      sink.seek(0)
+      sink.truncate()
+  yield sink.getvalue()
+
+def export_response(db: AsyncSession, stmt, columns, fmt: ExportFormat, name: str) -> StreamingResponse:
+  partitions = stream_partitions(db, stmt)
+  if fmt == ExportFormat.arrow:
+    body = encode_arrow(partitions, columns, load_pyarrow())
+  elif fmt == ExportFormat.csv:
+    body = encode_csv(partitions, columns)
+  else:
+    body = encode_ndjson(partitions, columns)
+
+  return StreamingResponse(
+    body,
+    media_type=MEDIA_TYPES[fmt],
+    headers={"Content-Disposition": f'attachment; filename="{name}.{fmt.value}"'},
+  )
+
+@router.get("/export/prices")
+async def export_prices(
+  tickers: str | None = Query(None, description="Lista tickerów rozdzielona przecinkami (domyślnie wszystkie)"),
+  start: date | None = None,
+  end: date | None = None,
+  format: ExportFormat = ExportFormat.ndjson,
+  db: AsyncSession = Depends(get_db),
+  current_user: User = Depends(get_current_user)
+):
+  stmt = (
+    select(Company.ticker, PriceHistory.date, PriceHistory.close)
+    .join(Company, Company.id == PriceHistory.company_id)
+    .order_by(Company.ticker, PriceHistory.date)
+  )
+  ticker_list = parse_tickers(tickers)
+  if ticker_list:
+    stmt = stmt.where(Company.ticker.in_(ticker_list))
+  if start:
+    stmt = stmt.where(PriceHistory.date >= start)
+  if end:
+    stmt = stmt.where(PriceHistory.date <= end)
+
+  return export_response(db, stmt, PRICE_COLUMNS, format, "prices")
+
+@router.get("/export/forecasts")
+async def export_forecasts(
+  tickers: str | None = Query(None, description="Lista tickerów rozdzielona przecinkami (domyślnie wszystkie)"),
+  start: date | None = Query(None, description="Najwcześniejsza data runu (forecast_date)"),
+  end: date | None = Query(None, description="Najpóźniejsza data runu (forecast_date)"),
+  format: ExportFormat = ExportFormat.ndjson,
+  db: AsyncSession = Depends(get_db),
+  current_user: User = Depends(get_current_user)
+):
+  stmt = (
+    select(
+      Company.ticker, PredictionArima.forecast_date, PredictionArima.target_date,
+      PredictionArima.predicted_value, PredictionGarch.predicted_volatility
+    )
+    .join(Company, Company.id == PredictionArima.company_id)
+    .outerjoin(PredictionGarch, and_(
+      PredictionGarch.company_id == PredictionArima.company_id,
+      PredictionGarch.forecast_date == PredictionArima.forecast_date,
+      PredictionGarch.target_date == PredictionArima.target_date,
+    ))
+    .order_by(Company.ticker, PredictionArima.forecast_date, PredictionArima.target_date)
+  )
+  ticker_list = parse_tickers(tickers)
+  if ticker_list:
+    stmt = stmt.where(Company.ticker.in_(ticker_list))
+  if start:
+    stmt = stmt.where(PredictionArima.forecast_date >= start)
+  if end:
+    stmt = stmt.where(PredictionArima.forecast_date <= end)
+
+  return export_response(db, stmt, FORECAST_COLUMNS, format, "forecasts")
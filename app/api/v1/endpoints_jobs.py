@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.api.deps import get_db, get_current_user
+from app.models.user import User
+from app.models.job_run import JobRun
+from app.schemas.jobs import JobRunPublic
+
+router = APIRouter()
+
+@router.get("/jobs", response_model=list[JobRunPublic])
+async def list_job_runs(
+  job_name: str | None = None,
+  status: str | None = None,
+  limit: int = Query(20, ge=1, le=100),
+  db: AsyncSession = Depends(get_db),
+  current_user: User = Depends(get_current_user)
+):
+  query = select(JobRun).order_by(JobRun.started_at.desc(), JobRun.id.desc()).limit(limit)
+  if job_name:
+    query = query.where(JobRun.job_name == job_name)
+  if status:
+    query = query.where(JobRun.status == status)
+  result = await db.execute(query)
+  return result.scalars().all()
@@ -1,74 +1,200 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import date, datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import NamedTuple
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import and_, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 from app.api.deps import get_db, get_current_user
+from app.config import settings
+from app.core.cache import dashboard_cache
+from app.core.responses import OrjsonResponse
 from app.models.user import User
 from app.models.company import Company
-from app.models.predictions import PredictionArima, PredictionGarch
-from app.schemas.predictions import DashboardData
-from datetime import date
-from sqlalchemy import desc, func
+from app.models.predictions import ForecastSnapshot, PredictionArima, PredictionGarch
+from app.schemas.predictions import DashboardData, dashboard_json
 
-router = APIRouter()
+router = APIRouter(default_response_class=OrjsonResponse)
 
-FORECAST_DAYS = 10
+MAX_BATCH_TICKERS = 100
+
+class CachedDashboard(NamedTuple):
+  body: bytes
+  etag: str
+  last_modified: datetime | None
+
+def forecast_etag(company_id: int, forecast_date: date, updated_at: datetime | None) -> str:
+  # Run = (company_id, forecast_date); chwila zapisu odróżnia ponowny run z tego samego dnia
+  version = f"{company_id}-{forecast_date:%Y%m%d}"
+  if updated_at is not None:
+    version += f"-{updated_at:%H%M%S%f}"
+  return f'"{version}"'
+
+def cache_headers(etag: str, last_modified: datetime | None) -> dict[str, str]:
+  headers = {"ETag": etag, "Cache-Control": settings.PREDICTIONS_CACHE_CONTROL}
+  if last_modified is not None:
+    headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+  return headers
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None) -> bool:
+  # If-None-Match ma pierwszeństwo przed If-Modified-Since (RFC 9110, 13.2.2)
+  if_none_match = request.headers.get("if-none-match")
+  if if_none_match is not None:
+    if if_none_match.strip() == "*":
+      return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+  if_modified_since = request.headers.get("if-modified-since")
+  if if_modified_since is None or last_modified is None:
+    return False
+  try:
+    since = parsedate_to_datetime(if_modified_since)
+  except (TypeError, ValueError):
+    return False
+  if since.tzinfo is None:
+    since = since.replace(tzinfo=timezone.utc)
+  return last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= since
+
+async def get_dashboard_as_of(db: AsyncSession, ticker: str, as_of: date) -> bytes:
+  # Ostatni run z forecast_date <= as_of - zakres na indeksie (company_id, forecast_date, target_date)
+  latest_run = (
+    select(func.max(PredictionArima.forecast_date))
+    .where(PredictionArima.company_id == Company.id, PredictionArima.forecast_date <= as_of)
+    .correlate(Company)
+    .scalar_subquery()
+  )
+  result = await db.execute(
+    select(Company.id, Company.ticker, latest_run).where(Company.ticker == ticker)
+  )
+  row = result.one_or_none()
+
+  if row is None:
+    raise HTTPException(status_code=404, detail="Company not found")
+
+  company_id, company_ticker, forecast_date = row
+  if forecast_date is None:
+    raise HTTPException(status_code=404, detail="No predictions found for this company yet.")
+
+  result = await db.execute(
+    select(PredictionArima.target_date, PredictionArima.predicted_value, PredictionGarch.predicted_volatility)
+    .outerjoin(PredictionGarch, and_(
+      PredictionGarch.company_id == PredictionArima.company_id,
+      PredictionGarch.forecast_date == PredictionArima.forecast_date,
+      PredictionGarch.target_date == PredictionArima.target_date,
+    ))
+    .where(PredictionArima.company_id == company_id, PredictionArima.forecast_date == forecast_date)
+    .order_by(PredictionArima.target_date)
+  )
+  horizon = [row._asdict() for row in result.all()]
+  return dashboard_json(company_ticker, forecast_date, horizon)
 
 @router.get("/predictions/{ticker}", response_model=DashboardData)
 async def get_predictions_for_ticker(
   ticker: str,
+  request: Request,
+  as_of: date | None = Query(None, description="Prognoza w stanie na dany dzień (domyślnie najnowsza)"),
   db: AsyncSession = Depends(get_db),
   current_user: User = Depends(get_current_user)
 ):
+  ticker = ticker.upper()
+  if as_of is not None:
+    return OrjsonResponse(await get_dashboard_as_of(db, ticker, as_of))
+
+  # Prognozy zapisuje proces workera, więc wersja snapshotu (bez horyzontu) jest sprawdzana przy każdym żądaniu:
+  # wystarcza do odpowiedzi 304, a wpis w pamięci podręcznej procesu jest ważny tylko przy zgodnym ETagu
+  result = await db.execute(
+    select(ForecastSnapshot.company_id, ForecastSnapshot.forecast_date, ForecastSnapshot.updated_at)
+    .join(Company, Company.id == ForecastSnapshot.company_id)
+    .where(Company.ticker == ticker)
+  )
+  version = result.one_or_none()
+  if version is not None:
+    etag = forecast_etag(*version)
+    if is_not_modified(request, etag, version.updated_at):
+      return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag, version.updated_at))
+
+    cached = dashboard_cache.get(ticker)
+    if cached is not None and cached.etag == etag:
+      return OrjsonResponse(cached.body, headers=cache_headers(cached.etag, cached.last_modified))
+
   result = await db.execute(
-    select(Company)
-    .where(Company.ticker == ticker.upper())
-    .options(
-      selectinload(Company.arima_predictions),
-      selectinload(Company.garch_predictions)
+    select(
+      Company.id, Company.ticker,
+      ForecastSnapshot.forecast_date, ForecastSnapshot.horizon,
+      ForecastSnapshot.updated_at, ForecastSnapshot.payload
     )
+    .outerjoin(ForecastSnapshot, ForecastSnapshot.company_id == Company.id)
+    .where(Company.ticker == ticker)
   )
-  company = result.scalar_one_or_none()
-    
-  if not company:
+  row = result.one_or_none()
+
+  if row is None:
     raise HTTPException(status_code=404, detail="Company not found")
-  
-  latest_forecast_date_q = await db.execute(
-    select(func.max(PredictionArima.forecast_date))
-    .where(PredictionArima.company_id == company.id)
-  )
-  latest_forecast_date = latest_forecast_date_q.scalar_one_or_none()
-  
-  if latest_forecast_date is None:
+
+  company_id, company_ticker, forecast_date, horizon, updated_at, payload = row
+  if forecast_date is None or not horizon:
     raise HTTPException(status_code=404, detail="No predictions found for this company yet.")
-  
-  arima_results = await db.execute(
-    select(PredictionArima)
-    .where(PredictionArima.company_id == company.id)
-    .where(PredictionArima.forecast_date == latest_forecast_date)
-    .order_by(PredictionArima.target_date)
-    .limit(FORECAST_DAYS)
-  )
-  
-  garch_results = await db.execute(
-    select(PredictionGarch)
-    .where(PredictionGarch.company_id == company.id)
-    .where(PredictionGarch.forecast_date == latest_forecast_date)
-    .order_by(PredictionGarch.target_date)
-    .limit(FORECAST_DAYS)
+
+  # Snapshoty sprzed kolumny payload są kodowane z horyzontu
+  body = payload or dashboard_json(company_ticker, forecast_date, horizon)
+  cached = CachedDashboard(body, forecast_etag(company_id, forecast_date, updated_at), updated_at)
+  dashboard_cache.set(ticker, cached)
+
+  return OrjsonResponse(cached.body, headers=cache_headers(cached.etag, cached.last_modified))
+
+@router.get("/predictions", response_model=dict[str, DashboardData])
+async def get_predictions_for_tickers(
+  tickers: str = Query(..., description="Lista tickerów rozdzielona przecinkami, np. PKO.WA,SPL.WA"),
+  db: AsyncSession = Depends(get_db),
+  current_user: User = Depends(get_current_user)
+):
+  requested = list(dict.fromkeys(t.strip().upper() for t in tickers.split(",") if t.strip()))
+  if not requested:
+    raise HTTPException(status_code=400, detail="No tickers given")
+  if len(requested) > MAX_BATCH_TICKERS:
+    raise HTTPException(
+      status_code=400,
+      detail=f"Too many tickers (max {MAX_BATCH_TICKERS})"
+    )
+
+  # Jak w get_predictions_for_ticker: wpis w pamięci podręcznej tylko dla bieżącej wersji snapshotu
+  result = await db.execute(
+    select(Company.ticker, ForecastSnapshot.company_id, ForecastSnapshot.forecast_date, ForecastSnapshot.updated_at)
+    .join(ForecastSnapshot, ForecastSnapshot.company_id == Company.id)
+    .where(Company.ticker.in_(requested))
   )
-  
-  arima_forecasts = arima_results.scalars().all()
-  garch_forecasts = garch_results.scalars().all()
+  bodies: dict[str, bytes] = {}
+  missing = []
+  for ticker, *version in result.all():
+    cached = dashboard_cache.get(ticker)
+    if cached is not None and cached.etag == forecast_etag(*version):
+      bodies[ticker] = cached.body
+    else:
+      missing.append(ticker)
 
-  if not arima_forecasts:
-    raise HTTPException(status_code=404, detail="No predictions found for this company yet.")
+  if missing:
+    result = await db.execute(
+      select(
+        Company.id, Company.ticker,
+        ForecastSnapshot.forecast_date, ForecastSnapshot.horizon,
+        ForecastSnapshot.updated_at, ForecastSnapshot.payload
+      )
+      .join(ForecastSnapshot, ForecastSnapshot.company_id == Company.id)
+      .where(Company.ticker.in_(missing))
+    )
+    for company_id, company_ticker, forecast_date, horizon, updated_at, payload in result.all():
+      if not horizon:
+        continue
+      body = payload or dashboard_json(company_ticker, forecast_date, horizon)
+      dashboard_cache.set(company_ticker, CachedDashboard(
+        body, forecast_etag(company_id, forecast_date, updated_at), updated_at
+      ))
+      bodies[company_ticker] = body
 
-  last_update_date = arima_forecasts[0].forecast_date
-  
-  return {
-    "ticker": company.ticker,
-    "last_update": last_update_date,
-    "arima_forecast": arima_forecasts,
-    "garch_forecast": garch_forecasts
-  }
+  # Tickery bez prognoz (lub nieistniejące) są pomijane w odpowiedzi
+  content = b"{" + b",".join(
+    orjson.dumps(ticker) + b":" + bodies[ticker]
+    for ticker in requested if ticker in bodies
+  ) + b"}"
+  return OrjsonResponse(content)
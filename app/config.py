@@ -8,4 +8,95 @@ class Settings(BaseSettings):
   SECRET_KEY: str
   ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+  # create_all przy każdym starcie API; False, gdy schemat jest już założony (szybszy start)
+  CREATE_SCHEMA_ON_STARTUP: bool = True
+
+  # Pula połączeń API (na proces uvicorna): maks. połączeń = workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+  # musi zmieścić się w max_connections Postgresa razem z workerem nocnych zadań
+  DB_POOL_SIZE: int = 5
+  DB_MAX_OVERFLOW: int = 10
+  DB_POOL_TIMEOUT: float = 30
+  # Połączenia starsze niż tyle sekund są zamykane przy zwrocie do puli (-1 = bez limitu)
+  DB_POOL_RECYCLE: int = 1800
+  # Ping przed każdym pobraniem z puli - dodatkowe zapytanie; zwykle wystarcza DB_POOL_RECYCLE
+  DB_POOL_PRE_PING: bool = False
+  # Cache przygotowanych zapytań asyncpg (na połączenie); 0 przy PgBouncerze w trybie transakcji
+  DB_STATEMENT_CACHE_SIZE: int = 100
+
+  BCRYPT_ROUNDS: int = 12
+  # None -> połowa rdzeni (min. 1), reszta zostaje dla pętli zdarzeń
+  PASSWORD_HASH_WORKERS: int | None = None
+  # Maks. liczba haszowań w toku (wykonywane + w kolejce); powyżej -> 503
+  PASSWORD_HASH_MAX_PENDING: int = 64
+
+  DASHBOARD_CACHE_TTL_SECONDS: float = 900
+  DASHBOARD_CACHE_MAX_SIZE: int = 1024
+  # Nagłówek Cache-Control odpowiedzi /predictions/{ticker} (odpowiedzi wymagają logowania -> private)
+  PREDICTIONS_CACHE_CONTROL: str = "private, max-age=300"
+
+  USER_CACHE_TTL_SECONDS: float = 60
+  USER_CACHE_MAX_SIZE: int = 4096
+
+  # None -> liczba rdzeni, 1 -> trening w wątku procesu API
+  TRAINING_WORKERS: int | None = None
+
+  # Nocny job jako potok: pobieranie -> zapis/odczyt notowań -> trening -> zapis prognoz.
+  # Etapy łączą kolejki o długości PIPELINE_QUEUE_SIZE; trening równolegle na TRAINING_WORKERS.
+  # Zapis/odczyt i zapis prognoz współdzielą sesję, więc operacje na bazie i tak idą po kolei.
+  PIPELINE_QUEUE_SIZE: int = 4
+  PIPELINE_DOWNLOAD_BATCH_SIZE: int = 10
+  PIPELINE_DOWNLOAD_CONCURRENCY: int = 2
+  PIPELINE_LOAD_CONCURRENCY: int = 1
+  PIPELINE_WRITE_CONCURRENCY: int = 1
+
+  # Harmonogram nocnych zadań działa w procesie workera (python -m app.workers);
+  # True przywraca dawne zachowanie - scheduler w każdym procesie API
+  RUN_SCHEDULER_IN_API: bool = False
+  WORKER_DB_POOL_SIZE: int = 2
+  WORKER_DB_MAX_OVERFLOW: int = 2
+  # Wartość os.nice() dla workera i jego procesów treningu (0 = bez zmiany)
+  WORKER_NICE: int = 10
+  # Port /metrics procesu workera i workerów kolejki (None -> metryki nocnego joba nie są wystawiane)
+  WORKER_METRICS_PORT: int | None = 9101
+  # Run bez zakończenia po tym czasie uznawany za porzucony (blokada single-flight zwalniana)
+  JOB_RUN_TIMEOUT_SECONDS: int = 6 * 3600
+
+  # "inline" - nocny job liczony przez harmonogram; "queue" - harmonogram tylko dodaje spółki do kolejki work_items,
+  # a liczą je workery (python -m app.workers.queue_worker), które można uruchomić na wielu maszynach
+  NIGHTLY_JOB_MODE: str = "inline"
+  WORK_BATCH_SIZE: int = 10
+  # Po tym czasie bez przedłużenia (worker przedłuża co 1/3 podczas liczenia) pozycja może zostać przejęta przez inny worker
+  WORK_LEASE_SECONDS: float = 1800
+  WORK_MAX_ATTEMPTS: int = 3
+  WORK_POLL_SECONDS: float = 30
+
+  # "arch" - GARCH osobno dla każdej spółki w procesie treningu; "batch" - reszty ARIMA zbierane w paczki
+  # po GARCH_BATCH_SIZE spółek i GARCH(1,1) dopasowywany dla nich wspólnie (app/workers/garch_batch.py)
+  GARCH_ENGINE: str = "arch"
+  GARCH_BATCH_SIZE: int = 200
+
+  # Katalog kolumnowego cache notowań (None -> historia zawsze z bazy)
+  PRICE_STORE_DIR: str | None = None
+
+  # "yahoo" albo "file" (pliki <ticker>.csv/.parquet w MARKET_DATA_DIR, bez sieci)
+  MARKET_DATA_PROVIDER: str = "yahoo"
+  MARKET_DATA_DIR: str | None = None
+
+  # Ponowny dobór rzędu ARIMA (auto_arima): co tyle dni lub gdy p-value Ljung-Boxa reszt spadnie poniżej progu
+  # (tylko przy spadku - jeśli poprzednie dopasowanie też było poniżej progu, czeka na ORDER_RESELECT_DAYS)
+  ORDER_RESELECT_DAYS: int = 30
+  ORDER_RESELECT_MIN_PVALUE: float = 0.01
+
+  # Pełna estymacja parametrów co MODEL_REFIT_DAYS dni; pomiędzy nimi nowe notowania tylko aktualizują
+  # zapisany filtr Kalmana. Wcześniej, gdy test chi2 błędów prognoz od ostatniej estymacji da p poniżej progu.
+  MODEL_REFIT_DAYS: int = 7
+  MODEL_DRIFT_MIN_PVALUE: float = 0.001
+  # Godzina odświeżania prognoz w dni robocze (None -> tylko nocny job). Dzisiejsze notowanie służy tylko
+  # do prognozy - nie jest zapisywane w price_history ani w stanie modelu, więc może pochodzić z trwającej sesji
+  FORECAST_REFRESH_HOUR: int | None = None
+
+  # Historia prognoz: None = bez limitu; starsze runy przerzedzane do jednego na tydzień
+  FORECAST_RETENTION_DAYS: int | None = None
+  FORECAST_COMPACT_AFTER_DAYS: int | None = 365
+
 settings = Settings()
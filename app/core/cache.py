@@ -0,0 +1,58 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable
+
+from app.config import settings
+
+class TTLCache:
+  def __init__(self, max_size: int, ttl: float):
+    self.max_size = max_size
+    self.ttl = ttl
+    self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+    self._lock = Lock()
+
+  def get(self, key: Hashable) -> Any | None:
+    with self._lock:
+      entry = self._data.get(key)
+      if entry is None:
+        return None
+      expires_at, value = entry
+      if expires_at <= time.monotonic():
+        del self._data[key]
+        return None
+      self._data.move_to_end(key)
+      return value
+
+  def set(self, key: Hashable, value: Any) -> None:
+    if self.max_size <= 0:
+      return
+    with self._lock:
+      self._data[key] = (time.monotonic() + self.ttl, value)
+      self._data.move_to_end(key)
+      while len(self._data) > self.max_size:
+        self._data.popitem(last=False)
+
+  def invalidate(self, key: Hashable) -> None:
+    with self._lock:
+      self._data.pop(key, None)
+
+  def clear(self) -> None:
+    with self._lock:
+      self._data.clear()
+
+  def __len__(self) -> int:
+    with self._lock:
+      return len(self._data)
+
+# Zserializowane odpowiedzi DashboardData, klucz: ticker (wielkie litery)
+dashboard_cache = TTLCache(
+  max_size=settings.DASHBOARD_CACHE_MAX_SIZE,
+  ttl=settings.DASHBOARD_CACHE_TTL_SECONDS,
+)
+
+# Zalogowani użytkownicy, klucz: "sub" z tokena JWT (email)
+user_cache = TTLCache(
+  max_size=settings.USER_CACHE_MAX_SIZE,
+  ttl=settings.USER_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,92 @@
+import time
+from contextlib import contextmanager
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, start_http_server, CONTENT_TYPE_LATEST
+from prometheus_client.core import GaugeMetricFamily
+
+registry = CollectorRegistry()
+
+# Etapy nocnego joba; dla etapów wykonywanych zbiorczo (np. pobieranie) ticker = "*"
+PIPELINE_STAGE_SECONDS = Histogram(
+  "pipeline_stage_duration_seconds",
+  "Czas etapów nocnego joba",
+  ["stage", "ticker", "outcome"],
+  buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+  registry=registry,
+)
+PIPELINE_RUN_SECONDS = Histogram(
+  "pipeline_run_duration_seconds",
+  "Czas całego nocnego joba",
+  buckets=(1, 10, 30, 60, 300, 600, 1800, 3600, 7200, 14400),
+  registry=registry,
+)
+PIPELINE_TICKERS = Counter(
+  "pipeline_tickers_total",
+  "Tickery przetworzone przez nocny job",
+  ["outcome"],
+  registry=registry,
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+  "http_request_duration_seconds",
+  "Czas obsługi żądań HTTP",
+  ["method", "route", "status"],
+  buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+  registry=registry,
+)
+
+# Oczekiwanie na połączenie z puli SQLAlchemy; długi ogon = pula za mała na liczbę równoległych żądań
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+  "db_pool_checkout_wait_seconds",
+  "Czas oczekiwania na połączenie z puli",
+  buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+  registry=registry,
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+  "db_pool_checkout_timeouts_total",
+  "Żądania połączenia przerwane po DB_POOL_TIMEOUT",
+  registry=registry,
+)
+
+def observe_stage(stage: str, ticker: str, seconds: float, success: bool = True) -> None:
+  outcome = "success" if success else "error"
+  PIPELINE_STAGE_SECONDS.labels(stage=stage, ticker=ticker, outcome=outcome).observe(seconds)
+
+@contextmanager
+def stage_timer(stage: str, ticker: str = "*"):
+  start = time.perf_counter()
+  success = False
+  try:
+    yield
+    success = True
+  finally:
+    observe_stage(stage, ticker, time.perf_counter() - start, success)
+
+class DBPoolCollector:
+  def __init__(self, engine):
+    self.engine = engine
+
+  def collect(self):
+    pool = self.engine.pool
+    for name, attr, doc in (
+      ("db_pool_size", "size", "Rozmiar puli połączeń"),
+      ("db_pool_checked_out", "checkedout", "Połączenia w użyciu"),
+      ("db_pool_checked_in", "checkedin", "Wolne połączenia w puli"),
+      ("db_pool_overflow", "overflow", "Połączenia ponad rozmiar puli"),
+      ("db_pool_max_overflow", "_max_overflow", "Maks. liczba połączeń ponad rozmiar puli"),
+    ):
+      value = getattr(pool, attr, None)
+      if value is None:
+        continue
+      gauge = GaugeMetricFamily(name, doc)
+      gauge.add_metric([], float(value() if callable(value) else value))
+      yield gauge
+
+def register_db_pool(engine) -> None:
+  registry.register(DBPoolCollector(engine))
+
+def render_metrics() -> tuple[bytes, str]:
+  return generate_latest(registry), CONTENT_TYPE_LATEST
+
+# Worker ma własny rejestr (metryki nocnego joba) - /metrics API go nie widzi, więc wystawia go na osobnym porcie
+def start_metrics_server(port: int, addr: str = "0.0.0.0"):
+  return start_http_server(port, addr=addr, registry=registry)
@@ -0,0 +1,10 @@
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+
+class OrjsonResponse(JSONResponse):
+  def render(self, content: Any) -> bytes:
+    # Treść zakodowana wcześniej (snapshot, cache) trafia do odpowiedzi bez ponownej serializacji
+    if isinstance(content, bytes):
+      return content
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
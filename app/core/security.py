@@ -1,10 +1,14 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from app.config import settings
 
 # --- Haszowanie Haseł ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
   return pwd_context.verify(plain_password, hashed_password)
@@ -12,6 +16,36 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
   return pwd_context.hash(password)
 
+# bcrypt zwalnia GIL, więc osobna pula wątków nie blokuje pętli zdarzeń.
+# Zbyt długa kolejka = szybka odmowa (503) zamiast rosnących opóźnień.
+class PasswordHashingBusy(Exception):
+  pass
+
+_hash_executor = ThreadPoolExecutor(
+  max_workers=settings.PASSWORD_HASH_WORKERS or max(1, (os.cpu_count() or 2) // 2),
+  thread_name_prefix="password-hash"
+)
+_pending_lock = threading.Lock()
+_pending = 0
+
+async def _run_hashing(func, *args):
+  global _pending
+  with _pending_lock:
+    if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+      raise PasswordHashingBusy()
+    _pending += 1
+  try:
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+  finally:
+    with _pending_lock:
+      _pending -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+  return await _run_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+  return await _run_hashing(get_password_hash, password)
+
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
@@ -27,4 +61,4 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
   to_encode.update({"exp": expire})
   encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-  return encoded_jwt
\ No newline at end of file
+  return encoded_jwt
@@ -0,0 +1,8 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+def dialect_insert(db: AsyncSession, table):
+  # INSERT z obsługą ON CONFLICT w wariancie bazy sesji (Postgres w produkcji, SQLite w testach)
+  if db.get_bind().dialect.name == "postgresql":
+    return postgresql.insert(table)
+  return sqlite.insert(table)
@@ -0,0 +1,51 @@
+from datetime import date
+from sqlalchemy import bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.dialect import dialect_insert
+from app.models.company import Company
+from app.models.model_state import ModelState
+
+# Rzędy modeli dobrane ręcznie - punkt startowy, później odświeżane przez nocny job
+INITIAL_COMPANIES = [
+  {"name": "Bank Ochrony Srodowiska S.A.", "ticker": "BOS.WA",
+   "order": (1, 1, 2), "seasonal_order": (1, 0, 1, 5)},
+  {"name": "Getin Holding SA", "ticker": "GTN.WA",
+   "order": (0, 1, 0), "seasonal_order": (0, 0, 0, 5)},
+  {"name": "Bank Handlowy w Warszawie S.A.", "ticker": "BHW.WA",
+   "order": (1, 1, 0), "seasonal_order": (0, 0, 0, 5)},
+  {"name": "Powszechna Kasa Oszczednosci Bank Polski Spólka Akcyjna", "ticker": "PKO.WA",
+   "order": (3, 1, 1), "seasonal_order": (0, 0, 0, 5)},
+  {"name": "Santander Bank Polska S.A.", "ticker": "SPL.WA",
+   "order": (3, 1, 0), "seasonal_order": (0, 0, 1, 5)},
+]
+
+async def seed_companies(db: AsyncSession):
+  # Jedno INSERT ... ON CONFLICT DO NOTHING na tabelę zamiast zapytania o każdą spółkę
+  conn = await db.connection()
+  companies = Company.__table__
+  result = await conn.execute(
+    dialect_insert(db, companies).on_conflict_do_nothing().returning(companies.c.name),
+    [{"name": c["name"], "ticker": c["ticker"]} for c in INITIAL_COMPANIES],
+  )
+  for name in result.scalars().all():
+    print(f"Dodano spółkę: {name}")
+
+  # Rząd modelu tylko dla spółek, które jeszcze go nie mają
+  model_states = ModelState.__table__
+  await conn.execute(
+    dialect_insert(db, model_states).values(
+      company_id=select(companies.c.id).where(companies.c.ticker == bindparam("ticker")).scalar_subquery(),
+    ).on_conflict_do_nothing(index_elements=["company_id"]),
+    [
+      {
+        "ticker": c["ticker"],
+        "order": list(c["order"]),
+        "seasonal_order": list(c["seasonal_order"]),
+        "order_selected_at": date.today(),
+      }
+      for c in INITIAL_COMPANIES
+    ],
+  )
+  await db.commit()
@@ -1,10 +1,53 @@
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import settings
+from app.core.metrics import DB_POOL_CHECKOUT_SECONDS, DB_POOL_CHECKOUT_TIMEOUTS
 
 DB_URL = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
-engine = create_async_engine(DB_URL, pool_pre_ping=True)
+class TimedQueuePool(AsyncAdaptedQueuePool):
+  # Czas oczekiwania na połączenie z puli (wraz z otwarciem nowego, gdy pula nie jest pełna)
+  def _do_get(self):
+    start = time.perf_counter()
+    try:
+      return super()._do_get()
+    except PoolTimeoutError:
+      DB_POOL_CHECKOUT_TIMEOUTS.inc()
+      raise
+    finally:
+      DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
+
+def engine_options(url: str, pool_size: int, max_overflow: int) -> dict:
+  kwargs = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+  # SQLite (testy, benchmarki) zostaje przy domyślnej puli dialektu
+  if url.startswith("sqlite"):
+    return kwargs
+
+  kwargs.update(
+    poolclass=TimedQueuePool,
+    pool_size=pool_size,
+    max_overflow=max_overflow,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+  )
+  if url.startswith("postgresql+asyncpg"):
+    # 0 przy PgBouncerze w trybie transakcji - przygotowane zapytania nie przeżywają zmiany połączenia
+    kwargs["connect_args"] = {
+      "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+      "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+  return kwargs
+
+engine = create_async_engine(DB_URL, **engine_options(DB_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW))
 
 AsyncSessionLocal = async_sessionmaker(
   autocommit=False, autoflush=False, bind=engine
-)
\ No newline at end of file
+)
+
+def create_worker_engine():
+  # Osobna, mała pula dla procesu workera - nocny job nie zabiera połączeń API
+  return create_async_engine(
+    DB_URL, **engine_options(DB_URL, settings.WORKER_DB_POOL_SIZE, settings.WORKER_DB_MAX_OVERFLOW)
+  )
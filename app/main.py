@@ -1,58 +1,61 @@
-from fastapi import FastAPI, Depends
+import time
+from fastapi import FastAPI, Depends, Request, Response
 from contextlib import asynccontextmanager
 from app.config import Settings, settings
 from app.db.base import Base
 from app.db.session import engine, AsyncSessionLocal
-from app.api.v1 import endpoints_auth, endpoints_predictions
-from app.workers.scheduler import setup_scheduler
+from app.api.v1 import endpoints_auth, endpoints_export, endpoints_jobs, endpoints_predictions
+from app.workers.cron import setup_scheduler
+# Rejestracja wszystkich tabel w Base.metadata (create_all, relacje Company)
+from app.models import company, job_run, model_state, predictions, user, work_item
 
-from app.models.company import Company
-from sqlalchemy.future import select
-
-INITIAL_COMPANIES = [
-  {"name": "Bank Ochrony Srodowiska S.A.", "ticker": "BOS.WA"},
-  {"name": "Getin Holding SA", "ticker": "GTN.WA"},
-  {"name": "Bank Handlowy w Warszawie S.A.", "ticker": "BHW.WA"},
-  {"name": "Powszechna Kasa Oszczednosci Bank Polski Spólka Akcyjna", "ticker": "PKO.WA"},
-  {"name": "Santander Bank Polska S.A.", "ticker": "SPL.WA"},
-]
-
-async def seed_companies():
-  async with AsyncSessionLocal() as db:
-    for company_data in INITIAL_COMPANIES:
-      result = await db.execute(
-        select(Company).filter_by(ticker=company_data["ticker"])
-      )
-      exists = result.scalar_one_or_none()
-      if not exists:
-        db_company = Company(
-          name=company_data["name"], 
-          ticker=company_data["ticker"]
-        )
-        db.add(db_company)
-        print(f"Dodano spółkę: {company_data['name']}")
-    await db.commit()
+from app.db.seed import seed_companies
+from app.core.metrics import HTTP_REQUEST_SECONDS, register_db_pool, render_metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):  
-  print("Uruchamianie: Tworzenie tabel w bazie danych...")
-  async with engine.begin() as conn:
-    await conn.run_sync(Base.metadata.create_all)
+  if settings.CREATE_SCHEMA_ON_STARTUP:
+    print("Uruchamianie: Tworzenie tabel w bazie danych...")
+    async with engine.begin() as conn:
+      await conn.run_sync(Base.metadata.create_all)
 
   print("Uruchamianie: Dodawanie spółek (seeding)...")
-  await seed_companies()
+  async with AsyncSessionLocal() as db:
+    await seed_companies(db)
 
-  print("Uruchamianie: Start Nocnego Schedulera...")
-  setup_scheduler()
+  # Domyślnie nocne zadania wykonuje osobny proces: python -m app.workers
+  if settings.RUN_SCHEDULER_IN_API:
+    print("Uruchamianie: Start Nocnego Schedulera...")
+    setup_scheduler()
 
   print("Startup zakończony.")
     
   yield
     
   print("Zamykanie aplikacji...")
+  await engine.dispose()
 
 app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
 
+register_db_pool(engine)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+  start = time.perf_counter()
+  status_code = 500
+  try:
+    response = await call_next(request)
+    status_code = response.status_code
+    return response
+  finally:
+    # Szablon ścieżki zamiast surowego URL - ograniczona liczba etykiet
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.labels(
+      method=request.method,
+      route=getattr(route, "path", "unmatched"),
+      status=str(status_code),
+    ).observe(time.perf_counter() - start)
+
 def get_settings() -> Settings:
   return settings
 
@@ -64,5 +67,12 @@ def read_root(settings: Settings = Depends(get_settings)):
 def health_check():
   return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+  content, media_type = render_metrics()
+  return Response(content=content, media_type=media_type)
+
 app.include_router(endpoints_auth.router, prefix="/api/v1", tags=["Auth"])
 app.include_router(endpoints_predictions.router, prefix="/api/v1", tags=["Predictions"])
+app.include_router(endpoints_export.router, prefix="/api/v1", tags=["Export"])
+app.include_router(endpoints_jobs.router, prefix="/api/v1", tags=["Jobs"])
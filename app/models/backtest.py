@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, Float, Date, ForeignKey, JSON
+from app.db.base import Base
+
+# Wynik backtestu z kroczącym punktem startu prognozy (rolling origin) dla jednej pary spółka + rząd modelu
+class BacktestResult(Base):
+  __tablename__ = "backtest_results"
+  id = Column(Integer, primary_key=True)
+  company_id = Column(Integer, ForeignKey("companies.id"), index=True)
+  order = Column(JSON)
+  seasonal_order = Column(JSON)
+  # None -> okno rosnące (cała historia do punktu startu), liczba -> okno kroczące w dniach sesyjnych
+  window_days = Column(Integer)
+  horizon = Column(Integer)
+  step = Column(Integer)
+  refit_every = Column(Integer)
+  origins = Column(Integer)
+  start_date = Column(Date)
+  end_date = Column(Date)
+  mae = Column(Float)
+  rmse = Column(Float)
+  # QLIKE: log(sigma2) + e^2 / sigma2, e - innowacje filtru Kalmana (x100, jak w GARCH)
+  qlike = Column(Float)
+  created_at = Column(Date)
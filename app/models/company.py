@@ -11,3 +11,5 @@ class Company(Base):
   arima_predictions = relationship("PredictionArima", back_populates="company")
   garch_predictions = relationship("PredictionGarch", back_populates="company")
   prices = relationship("PriceHistory", back_populates="company")
+  forecast_snapshot = relationship("ForecastSnapshot", back_populates="company", uselist=False)
+  model_state = relationship("ModelState", back_populates="company", uselist=False)
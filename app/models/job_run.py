@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index, text
+from app.db.base import Base
+
+# Historia uruchomień zadań workera. Częściowy indeks unikalny dopuszcza najwyżej jeden
+# run ze statusem "running" dla danego zadania (single-flight między procesami i maszynami).
+class JobRun(Base):
+  __tablename__ = "job_runs"
+  __table_args__ = (
+    Index(
+      "uq_job_runs_running", "job_name", unique=True,
+      postgresql_where=text("status = 'running'"),
+      sqlite_where=text("status = 'running'"),
+    ),
+  )
+  id = Column(Integer, primary_key=True)
+  job_name = Column(String, nullable=False, index=True)
+  # running -> succeeded / failed; abandoned - proces zginął w trakcie
+  status = Column(String, nullable=False)
+  owner = Column(String)
+  started_at = Column(DateTime, nullable=False)
+  finished_at = Column(DateTime)
+  written = Column(Integer)
+  failed = Column(Integer)
+  skipped = Column(Integer)
+  error = Column(String)
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, Float, Date, ForeignKey, JSON
+from sqlalchemy.orm import relationship
+from app.db.base import Base
+
+class ModelState(Base):
+  __tablename__ = "model_states"
+  company_id = Column(Integer, ForeignKey("companies.id"), primary_key=True)
+  # (p, d, q) i (P, D, Q, m) modelu SARIMAX; auto_arima uruchamiane tylko przy ponownym doborze
+  order = Column(JSON)
+  seasonal_order = Column(JSON)
+  order_selected_at = Column(Date)
+  # p-value testu Ljung-Boxa reszt z ostatniego dopasowania
+  residual_pvalue = Column(Float)
+  # Wektory parametrów z ostatniego dopasowania - punkt startowy kolejnego
+  arima_params = Column(JSON)
+  garch_params = Column(JSON)
+  # Data ostatniej pełnej estymacji parametrów
+  fitted_at = Column(Date)
+  # Stan filtra Kalmana (średnia i kowariancja prognozy stanu dla ostatniej obserwacji, state_date)
+  # oraz wariancja warunkowa i reszta GARCH z tego dnia - nowe notowania są dołączane bez estymacji
+  state_date = Column(Date)
+  filter_state = Column(JSON)
+  garch_sigma2 = Column(Float)
+  garch_resid = Column(Float)
+  # Liczba i suma kwadratów standaryzowanych błędów prognoz od ostatniej estymacji (test dryfu)
+  innovations_n = Column(Integer)
+  innovations_sq = Column(Float)
+
+  company = relationship("Company", back_populates="model_state")
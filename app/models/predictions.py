@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, JSON, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
+# Prognozy są dopisywane (jeden "run" = company_id + forecast_date). Indeks unikalny
+# (company_id, forecast_date, target_date) obsługuje zarówno ostatni run, jak i zapytania "as-of".
 class PredictionArima(Base):
   __tablename__ = "predictions_arima"
+  __table_args__ = (
+    UniqueConstraint("company_id", "forecast_date", "target_date", name="uq_predictions_arima_run_target"),
+  )
   id = Column(Integer, primary_key=True)
   company_id = Column(Integer, ForeignKey("companies.id"))
   forecast_date = Column(Date, index=True)
@@ -14,6 +19,9 @@ class PredictionArima(Base):
 
 class PredictionGarch(Base):
   __tablename__ = "predictions_garch"
+  __table_args__ = (
+    UniqueConstraint("company_id", "forecast_date", "target_date", name="uq_predictions_garch_run_target"),
+  )
   id = Column(Integer, primary_key=True)
   company_id = Column(Integer, ForeignKey("companies.id"))
   forecast_date = Column(Date, index=True)
@@ -24,9 +32,25 @@ class PredictionGarch(Base):
   
 class PriceHistory(Base):
   __tablename__ = "price_history"
+  __table_args__ = (
+    Index("ix_price_history_company_date", "company_id", "date"),
+  )
   id = Column(Integer, primary_key=True)
   company_id = Column(Integer, ForeignKey("companies.id"))
   date = Column(Date, nullable=False, index=True)
   close = Column(Float, nullable=False)
   
   company = relationship("Company", back_populates="prices")
+
+class ForecastSnapshot(Base):
+  __tablename__ = "forecast_snapshots"
+  company_id = Column(Integer, ForeignKey("companies.id"), primary_key=True)
+  forecast_date = Column(Date, nullable=False)
+  # [{"target_date", "predicted_value", "predicted_volatility"}, ...]
+  horizon = Column(JSON, nullable=False)
+  # Chwila zapisu (UTC) - Last-Modified i część ETag odpowiedzi /predictions
+  updated_at = Column(DateTime)
+  # Gotowa odpowiedź /predictions/{ticker} (JSON DashboardData) zakodowana w chwili zapisu prognozy
+  payload = Column(LargeBinary)
+
+  company = relationship("Company", back_populates="forecast_snapshot")
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, event, inspect
+from sqlalchemy.orm import Session
+from app.core.cache import user_cache
 from app.db.base import Base
 
 class User(Base):
@@ -6,4 +8,24 @@ class User(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
-    hashed_password = Column(String, nullable=False)
\ No newline at end of file
+    hashed_password = Column(String, nullable=False)
+
+# Zmiany przez ORM unieważniają user_cache dopiero po commicie - przy flushu wpis mógłby wrócić
+# z równoległego żądania, a rollback zostawiłby cache pusty bez powodu. Masowe update()/delete()
+# na tabeli users muszą wołać invalidate_user() same.
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    emails = session.info.setdefault("changed_user_emails", set())
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            emails.add(obj.email)
+            emails.update(inspect(obj).attrs.email.history.deleted)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for email in session.info.pop("changed_user_emails", ()):
+        user_cache.invalidate(email)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop("changed_user_emails", None)
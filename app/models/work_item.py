@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, UniqueConstraint
+from app.db.base import Base
+
+# Kolejka pracy nocnego joba: jeden wiersz = jedna spółka w danym dniu. Worker przejmuje wiersz
+# na czas dzierżawy (lease); po jej wygaśnięciu wiersz może przejąć inny worker.
+class WorkItem(Base):
+  __tablename__ = "work_items"
+  __table_args__ = (
+    UniqueConstraint("company_id", "run_date", name="uq_work_items_company_run"),
+  )
+  id = Column(Integer, primary_key=True)
+  company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+  run_date = Column(Date, nullable=False)
+  # pending -> running -> done / failed (po WORK_MAX_ATTEMPTS próbach)
+  status = Column(String, nullable=False, default="pending", index=True)
+  attempts = Column(Integer, nullable=False, default=0)
+  lease_owner = Column(String)
+  lease_expires_at = Column(DateTime)
+  last_error = Column(String)
+  updated_at = Column(DateTime)
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+
+class JobRunPublic(BaseModel):
+  id: int
+  job_name: str
+  status: str
+  owner: str | None
+  started_at: datetime
+  finished_at: datetime | None
+  written: int | None
+  failed: int | None
+  skipped: int | None
+  error: str | None
+
+  model_config = ConfigDict(from_attributes=True)
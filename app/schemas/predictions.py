@@ -1,3 +1,4 @@
+import orjson
 from pydantic import BaseModel, ConfigDict
 from datetime import date
 
@@ -15,4 +16,20 @@ class DashboardData(BaseModel):
   ticker: str
   last_update: date
   arima_forecast: list[ArimaPredictionOut]
-  garch_forecast: list[GarchPredictionOut]
\ No newline at end of file
+  garch_forecast: list[GarchPredictionOut]
+
+# Szybka ścieżka: ten sam kształt JSON co DashboardData.model_dump_json(), bez walidacji pydantic.
+# horizon: [{"target_date", "predicted_value", "predicted_volatility"}, ...] (daty jako date lub ISO)
+def dashboard_json(ticker: str, last_update: date | str, horizon: list[dict]) -> bytes:
+  return orjson.dumps({
+    "ticker": ticker,
+    "last_update": last_update,
+    "arima_forecast": [
+      {"target_date": h["target_date"], "predicted_value": float(h["predicted_value"])}
+      for h in horizon
+    ],
+    "garch_forecast": [
+      {"target_date": h["target_date"], "predicted_volatility": float(h["predicted_volatility"])}
+      for h in horizon if h.get("predicted_volatility") is not None
+    ],
+  })
@@ -0,0 +1,64 @@
+# Proces workera: harmonogram nocnych zadań albo jednorazowe uruchomienie, z własną pulą połączeń.
+#
+#   python -m app.workers                      # harmonogram (nocny job, kompaktowanie)
+#   python -m app.workers run nightly --tickers PKO.WA BOS.WA
+#   python -m app.workers run refresh          # nowe notowania do zapisanych filtrów, bez estymacji
+#   python -m app.workers run compaction
+import argparse
+import asyncio
+import os
+from datetime import datetime
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.config import settings
+from app.core.metrics import start_metrics_server
+from app.db.session import create_worker_engine
+# Rejestracja wszystkich tabel (relacje Company)
+from app.models import company, job_run, model_state, predictions, user, work_item
+from .cron import (
+  forecast_compaction_job, forecast_refresh_job, nightly_enqueue_job, nightly_prediction_job, setup_scheduler
+)
+
+JOBS = {
+  "nightly": nightly_prediction_job,
+  "enqueue": nightly_enqueue_job,
+  "refresh": forecast_refresh_job,
+  "compaction": forecast_compaction_job,
+}
+
+async def serve(session_factory):
+  if settings.WORKER_METRICS_PORT is not None:
+    start_metrics_server(settings.WORKER_METRICS_PORT)
+  setup_scheduler(session_factory)
+  print(f"[{datetime.now()}] Worker uruchomiony (tryb nocnego joba: {settings.NIGHTLY_JOB_MODE})")
+  await asyncio.Event().wait()
+
+async def main(args):
+  engine = create_worker_engine()
+  session_factory = async_sessionmaker(autocommit=False, autoflush=False, bind=engine)
+  try:
+    if args.command == "run":
+      kwargs = {"tickers": args.tickers} if args.tickers and args.job != "compaction" else {}
+      await JOBS[args.job](session_factory=session_factory, **kwargs)
+    else:
+      await serve(session_factory)
+  finally:
+    await engine.dispose()
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Worker nocnych zadań")
+  subparsers = parser.add_subparsers(dest="command")
+  subparsers.add_parser("serve", help="harmonogram zadań (domyślnie)")
+  run_parser = subparsers.add_parser("run", help="jednorazowe uruchomienie zadania")
+  run_parser.add_argument("job", choices=sorted(JOBS))
+  run_parser.add_argument("--tickers", nargs="*", default=None)
+  args = parser.parse_args()
+
+  # Niższy priorytet CPU (dziedziczony przez procesy treningu) - API na tej samej maszynie ma pierwszeństwo
+  if settings.WORKER_NICE:
+    try:
+      os.nice(settings.WORKER_NICE)
+    except OSError as e:
+      print(f"Nie udało się obniżyć priorytetu: {e}")
+
+  asyncio.run(main(args))
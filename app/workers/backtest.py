@@ -0,0 +1,272 @@
+import argparse
+import asyncio
+import time
+import warnings
+from dataclasses import dataclass
+from datetime import date
+from functools import partial
+import numpy as np
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.seed import INITIAL_COMPANIES
+from app.db.session import AsyncSessionLocal, engine
+from app.models.backtest import BacktestResult
+from app.models.company import Company
+from app.models.model_state import ModelState
+from .model_pipeline import FORECAST_DAYS, build_sarimax, fit_garch, fit_sarimax, prices_to_series
+from .scheduler import create_training_executor, get_last_price_dates, get_price_store, get_training_workers, load_price_arrays
+
+# Minimalna liczba obserwacji przed pierwszym punktem startu prognozy
+MIN_TRAIN_DAYS = 250
+
+@dataclass
+class SegmentScore:
+  origins: int = 0
+  n: int = 0
+  abs_error: float = 0.0
+  sq_error: float = 0.0
+  n_qlike: int = 0
+  qlike: float = 0.0
+
+  def add(self, other: "SegmentScore") -> "SegmentScore":
+    return SegmentScore(*(a + b for a, b in zip(vars(self).values(), vars(other).values())))
+
+def backtest_origins(n_obs: int, horizon: int, step: int, first: int) -> list[int]:
+  return list(range(max(first, MIN_TRAIN_DAYS - 1), n_obs - horizon, step))
+
+def garch_variance_path(params: np.ndarray, sigma2: float, last_innovation: float, horizon: int) -> np.ndarray:
+  omega, alpha, beta = params
+  path = np.empty(horizon)
+  path[0] = omega + alpha * last_innovation ** 2 + beta * sigma2
+  for k in range(1, horizon):
+    path[k] = omega + (alpha + beta) * path[k - 1]
+  return path
+
+# Punkt wejścia dla procesów roboczych. Parametry są dopasowywane raz, w pierwszym punkcie startu segmentu;
+# kolejne punkty tylko przedłużają filtr Kalmana (results.extend) i rekursję GARCH o nowe obserwacje.
+def backtest_segment(
+  ticker: str, dates: np.ndarray, closes: np.ndarray, order, seasonal_order,
+  origins: list[int], horizon: int = FORECAST_DAYS, window_days: int | None = None,
+  arima_start_params: list[float] | None = None,
+) -> SegmentScore:
+  y = prices_to_series(dates, closes)
+  values = y.to_numpy()
+  score = SegmentScore()
+
+  first = origins[0]
+  train = y.iloc[:first + 1] if window_days is None else y.iloc[max(0, first + 1 - window_days):first + 1]
+  with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    results, _ = fit_sarimax(build_sarimax(train, order, seasonal_order), arima_start_params)
+
+    residuals_scaled = results.resid.dropna() * 100
+    garch_params = None
+    if residuals_scaled.std() > 0:
+      try:
+        garch_results, _ = fit_garch(residuals_scaled)
+        garch_params = garch_results.params.to_numpy()
+        sigma2 = float(garch_results.conditional_volatility.iloc[-1] ** 2)
+        last_innovation = float(residuals_scaled.iloc[-1])
+      except Exception as e:
+        print(f"Błąd GARCH w backteście {ticker}: {e}")
+
+  innovations: dict[int, float] = {}
+  variance_forecasts: list[tuple[int, float]] = []
+
+  def extend(position: int, until: int):
+    nonlocal results, sigma2, last_innovation
+    results = results.extend(y.iloc[position + 1:until + 1])
+    for offset, innovation in enumerate(np.asarray(results.resid) * 100):
+      innovations[position + 1 + offset] = innovation
+      if garch_params is not None:
+        sigma2 = garch_params[0] + garch_params[1] * last_innovation ** 2 + garch_params[2] * sigma2
+        last_innovation = innovation
+
+  position = first
+  for origin in origins:
+    if origin > position:
+      extend(position, origin)
+      position = origin
+
+    forecast = np.asarray(results.forecast(horizon))
+    actual = values[origin + 1:origin + 1 + horizon]
+    errors = forecast[:len(actual)] - actual
+    score.origins += 1
+    score.n += len(errors)
+    score.abs_error += float(np.abs(errors).sum())
+    score.sq_error += float((errors ** 2).sum())
+
+    if garch_params is not None:
+      path = garch_variance_path(garch_params, sigma2, last_innovation, horizon)
+      variance_forecasts.extend((origin + 1 + k, path[k]) for k in range(horizon))
+
+  # Innowacje dla dat docelowych ostatnich prognoz (bez nowych punktów startu)
+  tail = min(position + horizon, len(values) - 1)
+  if garch_params is not None and tail > position:
+    extend(position, tail)
+
+  for target, variance in variance_forecasts:
+    innovation = innovations.get(target)
+    if innovation is not None and variance > 0:
+      score.n_qlike += 1
+      score.qlike += float(np.log(variance) + innovation ** 2 / variance)
+  return score
+
+def order_candidates(ticker: str, state: dict | None) -> list[tuple[tuple, tuple]]:
+  candidates = []
+  if state is not None and state["order"] and state["seasonal_order"]:
+    candidates.append((tuple(state["order"]), tuple(state["seasonal_order"])))
+  for company in INITIAL_COMPANIES:
+    if company["ticker"] == ticker:
+      candidates.append((tuple(company["order"]), tuple(company["seasonal_order"])))
+  return list(dict.fromkeys(candidates))
+
+async def run_backtest(
+  db: AsyncSession,
+  tickers: list[str] | None = None,
+  orders: list[tuple[tuple, tuple]] | None = None,
+  years: float = 5,
+  step: int = 5,
+  horizon: int = FORECAST_DAYS,
+  refit_every: int = 20,
+  window_days: int | None = None,
+  workers: int | None = None,
+) -> list[BacktestResult]:
+  query = select(Company.id, Company.ticker)
+  if tickers:
+    query = query.where(Company.ticker.in_(tickers))
+  companies_data = (await db.execute(query)).all()
+  if not companies_data:
+    return []
+
+  company_ids = [company_id for company_id, _ in companies_data]
+  last_dates = await get_last_price_dates(db, company_ids)
+  states = await db.execute(
+    select(ModelState.company_id, ModelState.order, ModelState.seasonal_order, ModelState.arima_params)
+    .where(ModelState.company_id.in_(company_ids))
+  )
+  states = {row.company_id: row._asdict() for row in states.all()}
+  store = get_price_store()
+
+  # Zadanie = (spółka, rząd, segment refit_every kolejnych punktów startu)
+  tasks = []
+  for company_id, ticker in companies_data:
+    arrays = await load_price_arrays(db, company_id, ticker, last_dates.get(company_id), store)
+    if arrays is None:
+      print(f"Brak notowań dla {ticker}, pomijanie")
+      continue
+    dates, closes = arrays
+    y = prices_to_series(dates, closes)
+    first = len(y) - 1 - int(years * 261)
+    origins = backtest_origins(len(y), horizon, step, first)
+    if not origins:
+      print(f"Za krótka historia dla {ticker}, pomijanie")
+      continue
+
+    state = states.get(company_id)
+    for order, seasonal_order in orders or order_candidates(ticker, state):
+      start_params = None
+      if state is not None and (tuple(state["order"] or ()), tuple(state["seasonal_order"] or ())) == (order, seasonal_order):
+        start_params = state["arima_params"]
+      for i in range(0, len(origins), max(refit_every, 1)):
+        segment = origins[i:i + max(refit_every, 1)]
+        key = (company_id, order, seasonal_order)
+        tasks.append((key, y.index[segment[0]].date(), y.index[min(segment[-1] + horizon, len(y) - 1)].date(), partial(
+          backtest_segment, ticker, dates, closes, order, seasonal_order, segment,
+          horizon=horizon, window_days=window_days, arima_start_params=start_params,
+        )))
+
+  if not tasks:
+    return []
+
+  executor = create_training_executor(min(workers or get_training_workers(), len(tasks)))
+  loop = asyncio.get_running_loop()
+
+  async def run(task):
+    if executor is None:
+      return await asyncio.to_thread(task)
+    return await loop.run_in_executor(executor, task)
+
+  try:
+    scores = await asyncio.gather(*(run(task) for *_, task in tasks))
+  finally:
+    if executor is not None:
+      executor.shutdown(wait=False, cancel_futures=True)
+
+  totals: dict[tuple, list] = {}
+  for (key, start_date, end_date, _), score in zip(tasks, scores):
+    if key in totals:
+      total, first_date, _ = totals[key]
+      totals[key] = [total.add(score), first_date, end_date]
+    else:
+      totals[key] = [score, start_date, end_date]
+
+  today = date.today()
+  rows = []
+  for (company_id, order, seasonal_order), (score, start_date, end_date) in totals.items():
+    rows.append(BacktestResult(
+      company_id=company_id,
+      order=list(order),
+      seasonal_order=list(seasonal_order),
+      window_days=window_days,
+      horizon=horizon,
+      step=step,
+      refit_every=refit_every,
+      origins=score.origins,
+      start_date=start_date,
+      end_date=end_date,
+      mae=score.abs_error / score.n if score.n else None,
+      rmse=float(np.sqrt(score.sq_error / score.n)) if score.n else None,
+      qlike=score.qlike / score.n_qlike if score.n_qlike else None,
+      created_at=today,
+    ))
+  db.add_all(rows)
+  await db.commit()
+  return rows
+
+def parse_order(value: str) -> tuple[tuple, tuple]:
+  # "3,1,1/0,0,0,5"
+  order, _, seasonal_order = value.partition("/")
+  seasonal = tuple(int(x) for x in seasonal_order.split(",")) if seasonal_order else (0, 0, 0, 0)
+  return tuple(int(x) for x in order.split(",")), seasonal
+
+async def main(args):
+  async with engine.begin() as conn:
+    await conn.run_sync(BacktestResult.__table__.create, checkfirst=True)
+
+  start = time.perf_counter()
+  async with AsyncSessionLocal(expire_on_commit=False) as db:
+    rows = await run_backtest(
+      db,
+      tickers=args.tickers,
+      orders=[parse_order(o) for o in args.order] if args.order else None,
+      years=args.years,
+      step=args.step,
+      horizon=args.horizon,
+      refit_every=args.refit_every,
+      window_days=args.window_days,
+      workers=args.workers,
+    )
+    tickers = dict((await db.execute(select(Company.id, Company.ticker))).all())
+  await engine.dispose()
+
+  for row in rows:
+    qlike = f"{row.qlike:.4f}" if row.qlike is not None else "-"
+    print(
+      f"{tickers[row.company_id]:<8} {row.order} {row.seasonal_order} "
+      f"punkty={row.origins} MAE={row.mae:.4f} RMSE={row.rmse:.4f} QLIKE={qlike}"
+    )
+  print(f"czas backtestu: {time.perf_counter() - start:.1f} s")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Backtest ARIMA/GARCH z kroczącym punktem startu prognozy")
+  parser.add_argument("--tickers", nargs="*", default=None)
+  parser.add_argument("--order", action="append", help="rząd do sprawdzenia, np. 3,1,1/0,0,0,5 (można powtarzać)")
+  parser.add_argument("--years", type=float, default=5)
+  parser.add_argument("--step", type=int, default=5, help="odstęp między punktami startu (dni sesyjne)")
+  parser.add_argument("--horizon", type=int, default=FORECAST_DAYS)
+  parser.add_argument("--refit-every", type=int, default=20, help="ponowne dopasowanie parametrów co tyle punktów startu")
+  parser.add_argument("--window-days", type=int, default=None, help="okno kroczące; domyślnie okno rosnące")
+  parser.add_argument("--workers", type=int, default=None)
+  asyncio.run(main(parser.parse_args()))
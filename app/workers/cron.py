@@ -0,0 +1,50 @@
+from datetime import date, datetime
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+from .job_runs import JOB_COMPACTION, JOB_ENQUEUE, JOB_NIGHTLY, JOB_REFRESH, run_tracked
+from .work_queue import enqueue_companies
+
+scheduler = AsyncIOScheduler()
+
+# Stos modelowania (pandas, statsmodels, pmdarima, arch, yfinance) jest importowany dopiero
+# przy uruchomieniu zadania - procesy, które nie liczą prognoz, go nie ładują
+
+async def nightly_prediction_job(session_factory=AsyncSessionLocal, tickers=None):
+  from .scheduler import run_nightly_prediction_job
+  return await run_tracked(session_factory, JOB_NIGHTLY, run_nightly_prediction_job, tickers=tickers)
+
+async def forecast_refresh_job(session_factory=AsyncSessionLocal, tickers=None):
+  from .scheduler import run_forecast_refresh_job
+  return await run_tracked(session_factory, JOB_REFRESH, run_forecast_refresh_job, tickers=tickers)
+
+async def forecast_compaction_job(session_factory=AsyncSessionLocal):
+  from .scheduler import run_forecast_compaction_job
+  return await run_tracked(session_factory, JOB_COMPACTION, run_forecast_compaction_job)
+
+async def enqueue_nightly_job(db: AsyncSession | None = None, tickers=None):
+  if db is None:
+    async with AsyncSessionLocal() as session:
+      return await enqueue_nightly_job(db=session, tickers=tickers)
+
+  added = await enqueue_companies(db, date.today(), tickers)
+  print(f"[{datetime.now()}] Dodano do kolejki nocnego joba: {added} spółek")
+
+async def nightly_enqueue_job(session_factory=AsyncSessionLocal, tickers=None):
+  return await run_tracked(session_factory, JOB_ENQUEUE, enqueue_nightly_job, tickers=tickers)
+
+def setup_scheduler(session_factory=AsyncSessionLocal):
+  kwargs = {"session_factory": session_factory}
+  if settings.NIGHTLY_JOB_MODE == "queue":
+    # Kolejkowanie jest idempotentne; obliczenia wykonują workery kolejki
+    scheduler.add_job(nightly_enqueue_job, 'cron', hour=1, minute=0, kwargs=kwargs)
+  else:
+    scheduler.add_job(nightly_prediction_job, 'cron', hour=1, minute=0, kwargs=kwargs)
+  if settings.FORECAST_REFRESH_HOUR is not None:
+    scheduler.add_job(
+      forecast_refresh_job, 'cron', day_of_week='mon-fri', hour=settings.FORECAST_REFRESH_HOUR, minute=0, kwargs=kwargs
+    )
+  scheduler.add_job(forecast_compaction_job, 'cron', day_of_week='sun', hour=3, minute=0, kwargs=kwargs)
+  scheduler.start()
@@ -1,39 +1,121 @@
 import yfinance as yf
 import pandas as pd
+from abc import ABC, abstractmethod
+from collections import defaultdict
 from datetime import date, datetime
+from pathlib import Path
+
+from app.config import settings
+
+PRICE_COLUMNS = ['Ticker', 'Date', 'Close']
+
+def empty_prices() -> pd.DataFrame:
+  return pd.DataFrame({
+    'Ticker': pd.Series(dtype=object),
+    'Date': pd.Series(dtype='datetime64[ns]'),
+    'Close': pd.Series(dtype=float),
+  })
+
+# Dostawca notowań: dla mapy {ticker: data_początkowa} zwraca jedną ramkę w formacie
+# "długim" (Ticker, Date, Close), posortowaną po tickerze i dacie.
+# Dostawca bez fetch nie da się utworzyć (TypeError) - błąd przy starcie, a nie w połowie nocnego joba.
+class MarketDataProvider(ABC):
+  @abstractmethod
+  def fetch(self, start_dates: dict[str, date]) -> pd.DataFrame:
+    ...
+
+def split_by_ticker(prices: pd.DataFrame) -> dict[str, pd.DataFrame]:
+  return {
+    ticker: group[['Date', 'Close']].reset_index(drop=True)
+    for ticker, group in prices.groupby('Ticker', sort=False)
+  }
+
+class YahooFinanceProvider(MarketDataProvider):
+  def __init__(self, chunk_size: int = 50):
+    self.chunk_size = chunk_size
+
+  def fetch(self, start_dates: dict[str, date]) -> pd.DataFrame:
+    # Tickery z tą samą datą początkową pobierane są jednym wywołaniem yf.download
+    groups: dict[date, list[str]] = defaultdict(list)
+    for ticker, start_date in start_dates.items():
+      groups[start_date].append(ticker)
+
+    frames = []
+    for start_date, tickers in groups.items():
+      for i in range(0, len(tickers), self.chunk_size):
+        chunk = tickers[i:i + self.chunk_size]
+        frame = self._download(chunk, start_date)
+        if not frame.empty:
+          frames.append(frame)
+
+    if not frames:
+      return empty_prices()
+    return pd.concat(frames, ignore_index=True).sort_values(['Ticker', 'Date'], ignore_index=True)
+
+  def _download(self, tickers: list[str], start_date: date) -> pd.DataFrame:
+    print(f"Pobieranie danych dla: {', '.join(tickers)} od {start_date}")
+    try:
+      df = yf.download(
+        tickers,
+        start=start_date.strftime('%Y-%m-%d'),
+        end=datetime.now(),
+        progress=False,
+        auto_adjust=True,
+        group_by='column',
+      )
+    except Exception as e:
+      print(f"Błąd yfinance dla {tickers}: {e}")
+      return empty_prices()
+
+    if df.empty or 'Close' not in df.columns.get_level_values(0):
+      return empty_prices()
+
+    close = df['Close']
+    if isinstance(close, pd.Series):
+      close = close.to_frame(tickers[0])
+
+    close = close.reset_index()
+    close = close.rename(columns={close.columns[0]: 'Date'})
+    long = close.melt(id_vars='Date', var_name='Ticker', value_name='Close').dropna(subset=['Close'])
+    return long[PRICE_COLUMNS]
+
+# Offline: pliki <ticker>.parquet lub <ticker>.csv (kolumny Date, Close) w jednym katalogu
+class FileMarketDataProvider(MarketDataProvider):
+  def __init__(self, directory: str | Path):
+    self.directory = Path(directory)
+
+  def _read(self, ticker: str) -> pd.DataFrame | None:
+    parquet_path = self.directory / f"{ticker}.parquet"
+    csv_path = self.directory / f"{ticker}.csv"
+    if parquet_path.exists():
+      return pd.read_parquet(parquet_path, columns=['Date', 'Close'])
+    if csv_path.exists():
+      return pd.read_csv(csv_path, usecols=['Date', 'Close'], parse_dates=['Date'])
+    return None
+
+  def fetch(self, start_dates: dict[str, date]) -> pd.DataFrame:
+    frames = []
+    for ticker, start_date in start_dates.items():
+      df = self._read(ticker)
+      if df is None:
+        print(f"Brak pliku z notowaniami dla: {ticker}")
+        continue
+      df = df[pd.to_datetime(df['Date']) >= pd.Timestamp(start_date)]
+      frames.append(df.assign(Ticker=ticker)[PRICE_COLUMNS])
+
+    if not frames:
+      return empty_prices()
+    return pd.concat(frames, ignore_index=True).sort_values(['Ticker', 'Date'], ignore_index=True)
+
+def get_market_data_provider() -> MarketDataProvider:
+  if settings.MARKET_DATA_PROVIDER == "file":
+    if not settings.MARKET_DATA_DIR:
+      raise ValueError("MARKET_DATA_DIR is required for the file market data provider")
+    return FileMarketDataProvider(settings.MARKET_DATA_DIR)
+  return YahooFinanceProvider()
 
 def download_stock_data(ticker: str, start_date: date) -> pd.DataFrame:
-  print(f"Pobieranie danych dla: {ticker} od {start_date}")
-  try:
-    start_str = start_date.strftime('%Y-%m-%d')
-    
-    df = yf.download(
-      ticker, 
-      start=start_str, 
-      end=datetime.now(), 
-      progress=False,
-      auto_adjust=True
-    )
-
-    if df.empty:
-      return pd.DataFrame()
-
-    if isinstance(df.columns, pd.MultiIndex):
-      df.columns = df.columns.get_level_values(0)
-
-    if 'Close' not in df.columns:
-      return pd.DataFrame()
-      
-    df = df.reset_index()
-        
-    if 'Date' not in df.columns:    
-      for col in df.columns:
-        if pd.api.types.is_datetime64_any_dtype(df[col]):
-          df.rename(columns={col: 'Date'}, inplace=True)
-          break
-
-    return df[['Date', 'Close']]
-    
-  except Exception as e:
-    print(f"Błąd yfinance dla {ticker}: {e}")
+  prices = YahooFinanceProvider().fetch({ticker: start_date})
+  if prices.empty:
     return pd.DataFrame()
+  return prices[['Date', 'Close']].reset_index(drop=True)
@@ -0,0 +1,224 @@
+import time
+from dataclasses import dataclass
+import numpy as np
+
+# GARCH(1,1) z zerową średnią (jak arch_model(mean='Zero', vol='Garch', p=1, q=1)) dopasowywany
+# jednocześnie dla wielu szeregów. Szeregi to wiersze tablicy (n, T); krótsze są dopełniane na końcu
+# i maskowane. Rekursja wariancji jest liniowa (s[t] = beta * s[t-1] + u[t]), więc liczona jest blokami
+# po BLOCK kroków mnożeniem macierzy - pętla w Pythonie ma T / BLOCK kroków niezależnie od liczby szeregów.
+# Optymalizacja: scoring Fishera z rzutowaniem na ograniczenia; krok i jego skracanie osobno dla każdego szeregu,
+# ale wszystkie szeregi liczone razem.
+
+BLOCK = 16
+BACKCAST_DAYS = 75
+BACKCAST_DECAY = 0.94
+MAX_PERSISTENCE = 1 - 1e-6
+# Parametry z = (omega, trwałość alpha+beta, udział alpha w trwałości), omega w skali szeregu o średnim kwadracie 1
+LOWER = np.array([1e-8, 0.0, 0.0])
+UPPER = np.array([10.0, MAX_PERSISTENCE, 1.0])
+MAX_STEP_HALVINGS = 10
+ACTIVE_MARGIN = np.array([1e-4, 0.05, 0.05])
+
+@dataclass
+class GarchBatchResult:
+  # (n, 3): omega, alpha, beta w skali wejścia - kolejność jak garch_results.params w arch
+  params: np.ndarray
+  loglik: np.ndarray
+  sigma2_last: np.ndarray
+  resid_last: np.ndarray
+  converged: np.ndarray
+  iterations: int
+  seconds: float
+
+  def forecast(self, horizon: int) -> np.ndarray:
+    return variance_forecast(self.params, self.sigma2_last, self.resid_last, horizon)
+
+def stack_series(series: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+  lengths = np.array([len(s) for s in series])
+  padded = -(-lengths.max() // BLOCK) * BLOCK
+  values = np.zeros((len(series), padded))
+  for i, s in enumerate(series):
+    values[i, :len(s)] = s
+  return values, lengths
+
+def backcast(values: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+  # Średnia ważona 0.94^i kwadratów pierwszych (do) 75 obserwacji - jak VolatilityProcess.backcast
+  tau = min(BACKCAST_DAYS, values.shape[1])
+  weights = BACKCAST_DECAY ** np.arange(tau) * (np.arange(tau) < lengths[:, None])
+  return (values[:, :tau] ** 2 * weights).sum(axis=1) / weights.sum(axis=1)
+
+def linear_recursion(u: np.ndarray, beta: np.ndarray, initial: np.ndarray) -> np.ndarray:
+  # s[t] = beta * s[t-1] + u[t], s[-1] = initial; u: (..., n, T), T podzielne przez BLOCK
+  *lead, n, length = u.shape
+  blocks = u.reshape(*lead, n, length // BLOCK, BLOCK)
+  powers = beta[:, None] ** np.arange(BLOCK + 1)
+  # Wewnątrz bloku: local[k] = sum_{j<=k} beta^(k-j) * u[j], jako mnożenie przez macierz trójkątną
+  lag = np.arange(BLOCK)[None, :] - np.arange(BLOCK)[:, None]
+  local = blocks @ np.where(lag >= 0, powers[:, np.maximum(lag, 0)], 0.0)
+
+  # Wartości na końcach bloków: jedna krótka rekursja, potem poprawka całych bloków naraz
+  block_decay = powers[:, BLOCK]
+  carries = np.empty(local.shape[:-1])
+  carry = np.broadcast_to(initial, (*lead, n))
+  for b in range(local.shape[-2]):
+    carries[..., b] = carry
+    carry = local[..., b, -1] + block_decay * carry
+  local += powers[:, None, 1:] * carries[..., None]
+  return local.reshape(u.shape)
+
+def to_garch(z: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+  omega, persistence, share = z
+  return omega, persistence * share, persistence * (1 - share)
+
+def from_garch(params: np.ndarray) -> np.ndarray:
+  omega, alpha, beta = params
+  persistence = alpha + beta
+  share = np.divide(alpha, persistence, out=np.full_like(alpha, 0.5), where=persistence > 0)
+  return np.clip(np.array([omega, persistence, share]), LOWER[:, None], UPPER[:, None])
+
+def previous(values: np.ndarray, first: np.ndarray) -> np.ndarray:
+  return np.concatenate([first[:, None], values[:, :-1]], axis=1)
+
+def conditional_variance(z: np.ndarray, squares: np.ndarray, initial: np.ndarray) -> np.ndarray:
+  # sigma2[0] = omega + (alpha + beta) * backcast
+  omega, alpha, beta = to_garch(z)
+  drive = omega[:, None] + alpha[:, None] * previous(squares, initial)
+  return linear_recursion(drive, beta, initial)
+
+def objective(z: np.ndarray, squares: np.ndarray, mask: np.ndarray, initial: np.ndarray, weights: np.ndarray) -> np.ndarray:
+  # Połowa średniej ujemnej log-wiarygodności na szereg (bez stałej)
+  sigma2 = conditional_variance(z, squares, initial)
+  return weights * (mask * (np.log(sigma2) + squares / sigma2)).sum(axis=1) / 2
+
+def score(z: np.ndarray, squares: np.ndarray, mask: np.ndarray, initial: np.ndarray, weights: np.ndarray):
+  omega, alpha, beta = to_garch(z)
+  sigma2 = conditional_variance(z, squares, initial)
+  # Pochodne sigma2 po (omega, alpha, beta) spełniają tę samą rekursję ze współczynnikiem beta
+  drive = np.stack([np.ones_like(squares), previous(squares, initial), previous(sigma2, initial)])
+  d_omega, d_alpha, d_beta = linear_recursion(drive, beta, np.zeros((3, len(beta))))
+  persistence, share = z[1], z[2]
+  d_sigma2 = np.stack([
+    d_omega,
+    d_alpha * share[:, None] + d_beta * (1 - share[:, None]),
+    (d_alpha - d_beta) * persistence[:, None],
+  ])
+
+  scaled = d_sigma2 / sigma2
+  gradient = weights * np.einsum("knt,nt->kn", scaled, mask * (1 - squares / sigma2)) / 2
+  # Informacja Fishera: E[d2l] = 1/2 * sum(d sigma2 d sigma2' / sigma2^2)
+  information = weights[:, None, None] * np.einsum("knt,jnt->nkj", scaled * mask, scaled) / 2
+  return gradient, information
+
+def newton_step(z: np.ndarray, gradient: np.ndarray, information: np.ndarray) -> np.ndarray:
+  # Projected Newton (Bertsekas): zmienne w odległości eps od ograniczenia, które gradient wypycha na zewnątrz,
+  # dostają krok skalowany tylko przekątną - pełny krok Newtona obcinany na granicy nie musi zmniejszać kryterium.
+  # eps maleje razem z odległością od punktu stacjonarnego
+  diagonal = np.diagonal(information, axis1=1, axis2=2).T
+  scaled = np.divide(gradient, diagonal, out=np.zeros_like(gradient), where=diagonal > 0)
+  projected = z - np.clip(z - scaled, LOWER[:, None], UPPER[:, None])
+  margin = np.minimum(ACTIVE_MARGIN[:, None], np.sqrt((projected ** 2).sum(axis=0)))
+  near_lower = (z <= LOWER[:, None] + margin) & (gradient > 0)
+  near_upper = (z >= UPPER[:, None] - margin) & (gradient < 0)
+  free = ~(near_lower | near_upper).T
+  matrix = information * (free[:, :, None] & free[:, None, :])
+  matrix = matrix + np.eye(3) * (np.where(free, 1e-6 * diagonal.T, diagonal.T) + 1e-12)[:, None, :]
+  return np.linalg.solve(matrix, gradient.T[..., None])[..., 0].T
+
+def starting_values(
+  squares: np.ndarray, mask: np.ndarray, initial: np.ndarray, weights: np.ndarray,
+  start_params: np.ndarray | None = None,
+) -> np.ndarray:
+  # Siatka jak w arch (alpha x alpha+beta, omega z wariancji bezwarunkowej); dla każdego szeregu najlepszy punkt.
+  # Wszystkie punkty siatki liczone w jednym przebiegu rekursji (szeregi powielone k razy).
+  n = len(squares)
+  candidates = [
+    np.array([np.full(n, 1 - persistence), np.full(n, persistence), np.full(n, alpha / persistence)])
+    for alpha in (0.01, 0.05, 0.1, 0.2) for persistence in (0.5, 0.7, 0.9, 0.98)
+  ]
+  if start_params is not None:
+    candidates.append(from_garch(start_params))
+  candidates = np.stack(candidates)
+  k = len(candidates)
+  losses = objective(
+    candidates.transpose(1, 0, 2).reshape(3, -1),
+    np.tile(squares, (k, 1)), np.tile(mask, (k, 1)), np.tile(initial, k), np.tile(weights, k),
+  ).reshape(k, n)
+  return candidates[np.nanargmin(losses, axis=0), :, np.arange(n)].T
+
+def fit_garch_batch(
+  series: list[np.ndarray], start_params: np.ndarray | None = None, maxiter: int = 100, tol: float = 1e-10
+) -> GarchBatchResult:
+  start = time.perf_counter()
+  values, lengths = stack_series([np.asarray(s, dtype=np.float64) for s in series])
+  n = len(values)
+  mask = (np.arange(values.shape[1]) < lengths[:, None]).astype(np.float64)
+
+  # Każdy szereg skalowany do jednostkowego średniego kwadratu - jednakowe przedziały omega dla wszystkich
+  scale2 = (values ** 2).sum(axis=1) / lengths
+  squares = values ** 2 / scale2[:, None]
+  initial = backcast(values, lengths) / scale2
+  weights = 1 / lengths
+
+  normalized_start = None
+  if start_params is not None:
+    normalized_start = np.asarray(start_params, dtype=np.float64).T.copy()
+    normalized_start[0] = normalized_start[0] / scale2
+  z = starting_values(squares, mask, initial, weights, normalized_start)
+  loss = objective(z, squares, mask, initial, weights)
+
+  # Szereg przestaje być liczony, gdy krok poprawia kryterium o mniej niż tol
+  converged = np.zeros(n, dtype=bool)
+  iterations = 0
+  while iterations < maxiter and not converged.all():
+    iterations += 1
+    active = np.flatnonzero(~converged)
+    data = (squares[active], mask[active], initial[active], weights[active])
+    current, current_loss = z[:, active], loss[active]
+    gradient, information = score(current, *data)
+    step = newton_step(current, gradient, information)
+
+    # Pełny krok; tam, gdzie nie poprawia kryterium - skracany o połowę (tylko dla tych szeregów)
+    candidate = np.clip(current - step, LOWER[:, None], UPPER[:, None])
+    candidate_loss = objective(candidate, *data)
+    pending = np.flatnonzero(~(candidate_loss < current_loss))
+    scale = 1.0
+    for _ in range(MAX_STEP_HALVINGS):
+      if len(pending) == 0:
+        break
+      scale /= 2
+      shorter = np.clip(current[:, pending] - scale * step[:, pending], LOWER[:, None], UPPER[:, None])
+      shorter_loss = objective(shorter, *(d[pending] for d in data))
+      better = shorter_loss < current_loss[pending]
+      candidate[:, pending[better]] = shorter[:, better]
+      candidate_loss[pending[better]] = shorter_loss[better]
+      pending = pending[~better]
+    candidate[:, pending] = current[:, pending]
+    candidate_loss[pending] = current_loss[pending]
+
+    converged[active] = current_loss - candidate_loss < tol
+    z[:, active] = candidate
+    loss[active] = candidate_loss
+
+  omega, alpha, beta = to_garch(z)
+  sigma2 = conditional_variance(z, squares, initial)
+  loglik = -0.5 * (mask * (np.log(2 * np.pi) + np.log(sigma2 * scale2[:, None]) + squares / sigma2)).sum(axis=1)
+  last = lengths - 1
+  rows = np.arange(n)
+  return GarchBatchResult(
+    params=np.column_stack([omega * scale2, alpha, beta]),
+    loglik=loglik,
+    sigma2_last=sigma2[rows, last] * scale2,
+    resid_last=values[rows, last],
+    converged=converged,
+    iterations=iterations,
+    seconds=time.perf_counter() - start,
+  )
+
+def variance_forecast(
+  params: np.ndarray, sigma2_last: np.ndarray, resid_last: np.ndarray, horizon: int
+) -> np.ndarray:
+  # sigma2[T+1+h] = (a+b)^h * sigma2[T+1] + omega * sum_{k<h} (a+b)^k - także przy trwałości ~1
+  omega, alpha, beta = np.asarray(params, dtype=np.float64).T
+  one_step = omega + alpha * resid_last ** 2 + beta * sigma2_last
+  powers = (alpha + beta)[:, None] ** np.arange(horizon)
+  return powers * one_step[:, None] + omega[:, None] * (np.cumsum(powers, axis=1) - powers)
@@ -0,0 +1,80 @@
+from collections import Counter
+from datetime import timedelta
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.job_run import JobRun
+from .work_queue import default_owner, utcnow
+
+JOB_NIGHTLY = "nightly_predictions"
+JOB_ENQUEUE = "nightly_enqueue"
+JOB_COMPACTION = "forecast_compaction"
+JOB_REFRESH = "forecast_refresh"
+
+async def start_job_run(db: AsyncSession, job_name: str, owner: str | None = None) -> int | None:
+  now = utcnow()
+  # Run bez zakończenia dłużej niż JOB_RUN_TIMEOUT_SECONDS - proces zginął, blokada jest zwalniana
+  await db.execute(
+    update(JobRun)
+    .where(
+      JobRun.job_name == job_name, JobRun.status == "running",
+      JobRun.started_at < now - timedelta(seconds=settings.JOB_RUN_TIMEOUT_SECONDS),
+    )
+    .values(status="abandoned", finished_at=now)
+    .execution_options(synchronize_session=False)
+  )
+
+  try:
+    async with db.begin_nested():
+      result = await db.execute(
+        insert(JobRun)
+        .values(job_name=job_name, status="running", owner=owner or default_owner(), started_at=now)
+        .returning(JobRun.id)
+      )
+      run_id = result.scalar_one()
+  except IntegrityError:
+    # Ten sam job już trwa (częściowy indeks unikalny uq_job_runs_running)
+    await db.commit()
+    return None
+  await db.commit()
+  return run_id
+
+async def finish_job_run(
+  db: AsyncSession, run_id: int, status: str,
+  outcomes: dict[int, str] | None = None, error: str | None = None
+):
+  counts = Counter((outcomes or {}).values())
+  await db.execute(
+    update(JobRun)
+    .where(JobRun.id == run_id)
+    .values(
+      status=status,
+      finished_at=utcnow(),
+      written=counts.get("written"),
+      failed=counts.get("failed"),
+      skipped=counts.get("skipped"),
+      error=error[:1000] if error else None,
+    )
+    .execution_options(synchronize_session=False)
+  )
+  await db.commit()
+
+async def run_tracked(session_factory, job_name: str, job, **kwargs):
+  async with session_factory() as db:
+    run_id = await start_job_run(db, job_name)
+  if run_id is None:
+    print(f"Zadanie {job_name} już trwa w innym procesie - pomijanie")
+    return None
+
+  try:
+    async with session_factory() as db:
+      outcomes = await job(db=db, **kwargs)
+  except Exception as e:
+    async with session_factory() as db:
+      await finish_job_run(db, run_id, "failed", error=str(e))
+    raise
+  async with session_factory() as db:
+    await finish_job_run(db, run_id, "succeeded", outcomes if isinstance(outcomes, dict) else None)
+  return outcomes
@@ -1,84 +1,313 @@
 import pmdarima as pm
 from arch import arch_model
+import numpy as np
 import pandas as pd
+from scipy.stats import chi2
 from statsmodels.tsa.statespace.sarimax import SARIMAX
+import time
 import warnings
+from dataclasses import dataclass
+from datetime import date
+from .garch_batch import fit_garch_batch, variance_forecast
 
 FORECAST_DAYS = 10
 
-MODEL_CONFIG = {
-  "BOS.WA": {"order": (1, 1, 2), "seasonal_order": (1, 0, 1, 5)},
-  "GTN.WA": {"order": (0, 1, 0), "seasonal_order": (0, 0, 0, 5)},
-  "BHW.WA": {"order": (1, 1, 0), "seasonal_order": (0, 0, 0, 5)},
-  "PKO.WA": {"order": (3, 1, 1), "seasonal_order": (0, 0, 0, 5)},
-  "SPL.WA": {"order": (3, 1, 0), "seasonal_order": (0, 0, 1, 5)},
-}
+@dataclass
+class FitResult:
+  ticker: str
+  arima_forecast: np.ndarray | None
+  garch_forecast: np.ndarray | None
+  order: tuple[int, int, int] | None = None
+  seasonal_order: tuple[int, int, int, int] | None = None
+  order_selected: bool = False
+  residual_pvalue: float | None = None
+  arima_params: list[float] | None = None
+  garch_params: list[float] | None = None
+  arima_warm_started: bool = False
+  garch_warm_started: bool = False
+  # Czasy i błędy etapów - proces roboczy nie ma dostępu do metryk procesu głównego
+  arima_seconds: float | None = None
+  garch_seconds: float | None = None
+  arima_error: str | None = None
+  garch_error: str | None = None
+  # Przeskalowane reszty ARIMA do wspólnego dopasowania GARCH wielu spółek (GARCH_ENGINE=batch)
+  garch_residuals: np.ndarray | None = None
+  # Stan po ostatniej obserwacji (state_date) - kolejne notowania dołączane bez ponownej estymacji
+  state_date: date | None = None
+  filter_state: dict | None = None
+  garch_sigma2: float | None = None
+  garch_resid: float | None = None
+  innovations_n: int = 0
+  innovations_sq: float = 0.0
+  # True -> prognoza z aktualizacji filtra przy zapisanych parametrach
+  incremental: bool = False
 
-def train_and_predict(y: pd.Series, ticker: str) -> tuple[pd.Series | None, pd.Series | None]:
+def select_order(y: pd.Series) -> tuple[tuple[int, int, int], tuple[int, int, int, int]]:
+  auto_model = pm.auto_arima(
+    y,
+    start_p=1, start_q=1,
+    max_p=3, max_q=3,
+    m=5, d=1,             
+    trace=False,
+    error_action='ignore',  
+    suppress_warnings=True, 
+    stepwise=True
+  )
+  return tuple(auto_model.order), tuple(auto_model.seasonal_order)
+
+def residual_pvalue(results, lags: int = 10) -> float | None:
+  try:
+    return float(results.test_serial_correlation('ljungbox', lags=[lags])[0, 1, -1])
+  except Exception:
+    return None
+
+def build_sarimax(y: pd.Series, order, seasonal_order) -> SARIMAX:
+  return SARIMAX(
+    y,
+    order=tuple(order),
+    seasonal_order=tuple(seasonal_order),
+    enforce_stationarity=False,
+    enforce_invertibility=False
+  )
+
+def fit_sarimax(model: SARIMAX, start_params: list[float] | None = None):
+  # Start z parametrów poprzedniej nocy; przy braku zbieżności - zwykłe dopasowanie od zera
+  if start_params is not None and len(start_params) == len(model.param_names):
+    try:
+      results = model.fit(start_params=np.asarray(start_params, dtype=np.float64), disp=False)
+      if results.mle_retvals.get("converged", False):
+        return results, True
+    except Exception as e:
+      print(f"   -> Ciepły start SARIMAX nieudany: {e}")
+  return model.fit(disp=False), False
+
+def final_filter_state(results) -> dict:
+  # Prognoza stanu dla ostatniej obserwacji (na podstawie wcześniejszych) - filtr wznawiany od tej obserwacji
+  return {
+    "mean": results.predicted_state[:, -2].tolist(),
+    "cov": results.predicted_state_cov[:, :, -2].tolist(),
+  }
+
+def fit_garch(residuals_scaled: pd.Series, start_params: list[float] | None = None):
+  garch_model = arch_model(residuals_scaled, mean='Zero', vol='Garch', p=1, q=1)
+  n_params = garch_model.num_params + garch_model.volatility.num_params
+  if start_params is not None and len(start_params) == n_params:
+    try:
+      results = garch_model.fit(disp='off', starting_values=np.asarray(start_params, dtype=np.float64))
+      if results.convergence_flag == 0:
+        return results, True
+    except Exception as e:
+      print(f"   -> Ciepły start GARCH nieudany: {e}")
+  return garch_model.fit(disp='off'), False
+
+def train_and_predict(
+  y: pd.Series,
+  ticker: str,
+  order: tuple[int, int, int] | None = None,
+  seasonal_order: tuple[int, int, int, int] | None = None,
+  arima_start_params: list[float] | None = None,
+  garch_start_params: list[float] | None = None,
+  reselect_order: bool = False,
+  min_residual_pvalue: float | None = None,
+  previous_residual_pvalue: float | None = None,
+  estimate_garch: bool = True,
+) -> FitResult:
+  result = FitResult(ticker=ticker, arima_forecast=None, garch_forecast=None)
   if y.empty:
-    return None, None
+    return result
 
   print(f"Trenowanie modeli dla {ticker}...")
-    
-  arima_residuals = None
-  arima_forecast = None
 
+  def fit(order, seasonal_order, start_params):
+    return fit_sarimax(build_sarimax(y, order, seasonal_order), start_params)
+
+  arima_start = time.perf_counter()
   try:
-    if ticker in MODEL_CONFIG:
-      params = MODEL_CONFIG[ticker]
-      print(f"   -> Używanie zdefiniowanych parametrów: {params}")
-                    
-      model = SARIMAX(
-        y,
-        order=params["order"],
-        seasonal_order=params["seasonal_order"],
-        enforce_stationarity=False,
-        enforce_invertibility=False
-      )
-      results = model.fit(disp=False)
-                
-      forecast_result = results.get_forecast(steps=FORECAST_DAYS)
-      arima_forecast = forecast_result.predicted_mean
-      arima_residuals = results.resid
-          
+    if order is None or seasonal_order is None or reselect_order:
+      print("   -> Dobór rzędu modelu (auto_arima)...")
+      previous_order = None
+      if order is not None and seasonal_order is not None:
+        previous_order = (tuple(order), tuple(seasonal_order))
+      order, seasonal_order = select_order(y)
+      if (order, seasonal_order) != previous_order:
+        arima_start_params = None
+      result.order_selected = True
     else:
-      print("   -> Parametry nieznane, uruchamianie auto_arima...")
-      auto_model = pm.auto_arima(
-        y,
-        start_p=1, start_q=1,
-        max_p=3, max_q=3,
-        m=5, d=1,             
-        trace=False,
-        error_action='ignore',  
-        suppress_warnings=True, 
-        stepwise=True
-      )
-      arima_forecast = auto_model.predict(n_periods=FORECAST_DAYS)
-      arima_residuals = auto_model.resid()
+      print(f"   -> Używanie zapisanego rzędu: {order} {seasonal_order}")
+
+    order, seasonal_order = tuple(order), tuple(seasonal_order)
+    results, result.arima_warm_started = fit(order, seasonal_order, arima_start_params)
+    pvalue = residual_pvalue(results)
+
+    # Reszty przestały przypominać biały szum - rząd dobierany ponownie jeszcze tej nocy. Tylko przy pogorszeniu:
+    # gdy poprzednie dopasowanie też było poniżej progu, auto_arima nie dałoby nic nowego aż do ORDER_RESELECT_DAYS
+    if (
+      not result.order_selected and min_residual_pvalue is not None
+      and pvalue is not None and pvalue < min_residual_pvalue
+      and (previous_residual_pvalue is None or previous_residual_pvalue >= min_residual_pvalue)
+    ):
+      print(f"   -> Ljung-Box p={pvalue:.4f}, ponowny dobór rzędu...")
+      new_order, new_seasonal_order = select_order(y)
+      result.order_selected = True
+      if (new_order, new_seasonal_order) != (order, seasonal_order):
+        order, seasonal_order = new_order, new_seasonal_order
+        results, result.arima_warm_started = fit(order, seasonal_order, None)
+        pvalue = residual_pvalue(results)
+
+    result.order = order
+    result.seasonal_order = seasonal_order
+    result.residual_pvalue = pvalue
+    result.arima_params = np.asarray(results.params, dtype=np.float64).tolist()
+    result.state_date = y.index[-1].date()
+    result.filter_state = final_filter_state(results)
+
+    arima_forecast = results.get_forecast(steps=FORECAST_DAYS).predicted_mean
+    arima_residuals = results.resid
 
   except Exception as e:
     print(f"Błąd ARIMA dla {ticker}: {e}")
-    return None, None
+    result.arima_error = str(e)
+    return result
+  finally:
+    result.arima_seconds = time.perf_counter() - arima_start
 
-  garch_vol = None
+  result.arima_forecast = np.asarray(arima_forecast, dtype=np.float64)
+
+  garch_start = time.perf_counter()
   try:
     residuals_scaled = arima_residuals.dropna() * 100
             
     if residuals_scaled.std() == 0:
       print(f"   -> Ostrzeżenie: Reszty są stałe, pomijanie GARCH.")        
-      garch_vol = pd.Series([0]*FORECAST_DAYS, index=arima_forecast.index)
+      result.garch_forecast = np.zeros(FORECAST_DAYS)
+    elif not estimate_garch:
+      result.garch_residuals = residuals_scaled.to_numpy(dtype=np.float64)
     else:
-      garch_model = arch_model(residuals_scaled, mean='Zero', vol='Garch', p=1, q=1)
-      garch_results = garch_model.fit(disp='off')
+      garch_results, result.garch_warm_started = fit_garch(residuals_scaled, garch_start_params)
           
       garch_forecast_res = garch_results.forecast(horizon=FORECAST_DAYS)
           
       garch_vol = (garch_forecast_res.variance.iloc[-1]**0.5) / 100
           
-      garch_vol.index = arima_forecast.index
+      result.garch_forecast = np.asarray(garch_vol, dtype=np.float64)
+      result.garch_params = np.asarray(garch_results.params, dtype=np.float64).tolist()
+      result.garch_sigma2 = float(garch_results.conditional_volatility.iloc[-1] ** 2)
+      result.garch_resid = float(residuals_scaled.iloc[-1])
 
   except Exception as e:
     print(f"Błąd GARCH dla {ticker}: {e}")
-    return arima_forecast, None
+    result.garch_error = str(e)
+  finally:
+    result.garch_seconds = time.perf_counter() - garch_start
+
+  return result
+
+# GARCH dla wielu spółek naraz (reszty z train_and_predict(..., estimate_garch=False)); wyniki jak z gałęzi arch powyżej
+def fit_garch_batched(fits: list[FitResult], start_params: list[list[float] | None] | None = None) -> float:
+  pending = [i for i, fit in enumerate(fits) if fit.garch_residuals is not None]
+  if not pending:
+    return 0.0
+
+  starts = None
+  if start_params is not None:
+    starts = np.array([
+      start_params[i] if start_params[i] is not None and len(start_params[i]) == 3 else [np.nan] * 3
+      for i in pending
+    ], dtype=np.float64)
+
+  batch = fit_garch_batch([fits[i].garch_residuals for i in pending], start_params=starts)
+  volatility = np.sqrt(batch.forecast(FORECAST_DAYS)) / 100
+  for row, i in enumerate(pending):
+    fit = fits[i]
+    fit.garch_forecast = volatility[row]
+    fit.garch_params = batch.params[row].tolist()
+    fit.garch_seconds = batch.seconds / len(pending)
+    fit.garch_sigma2 = float(batch.sigma2_last[row])
+    fit.garch_resid = float(batch.resid_last[row])
+    fit.garch_residuals = None
+  return batch.seconds
+
+# Nowe notowania od state_date przepuszczane przez filtr Kalmana przy zapisanych parametrach SARIMAX,
+# wariancja GARCH przedłużana rekurencją. None -> potrzebna pełna estymacja (brak ciągłości albo dryf).
+def update_and_predict(
+  y: pd.Series,
+  ticker: str,
+  order: tuple[int, int, int],
+  seasonal_order: tuple[int, int, int, int],
+  arima_params: list[float],
+  filter_state: dict,
+  state_date: date,
+  garch_params: list[float] | None = None,
+  garch_sigma2: float | None = None,
+  garch_resid: float | None = None,
+  innovations_n: int = 0,
+  innovations_sq: float = 0.0,
+  min_drift_pvalue: float | None = None,
+) -> FitResult | None:
+  new = y[y.index >= pd.Timestamp(state_date)]
+  if new.empty or new.index[0] != pd.Timestamp(state_date):
+    return None
+
+  result = FitResult(
+    ticker=ticker, arima_forecast=None, garch_forecast=None,
+    order=tuple(order), seasonal_order=tuple(seasonal_order),
+    arima_params=arima_params, garch_params=garch_params, incremental=True,
+  )
+  arima_start = time.perf_counter()
+  try:
+    model = build_sarimax(new, order, seasonal_order)
+    model.initialize_known(np.asarray(filter_state["mean"]), np.asarray(filter_state["cov"]))
+    results = model.filter(np.asarray(arima_params, dtype=np.float64))
+  except Exception as e:
+    print(f"   -> Aktualizacja filtra dla {ticker} nieudana: {e}")
+    return None
+
+  # Pierwsza obserwacja (state_date) była już w poprzednim stanie
+  errors = np.asarray(results.standardized_forecasts_error[0, 1:])
+  result.innovations_n = (innovations_n or 0) + len(errors)
+  result.innovations_sq = (innovations_sq or 0.0) + float(np.sum(errors ** 2))
+  if not np.isfinite(result.innovations_sq):
+    return None
+  # Suma kwadratów standaryzowanych błędów ~ chi2(n), gdy parametry nadal opisują szereg
+  if min_drift_pvalue is not None and result.innovations_n > 0:
+    pvalue = chi2.sf(result.innovations_sq, result.innovations_n)
+    if pvalue < min_drift_pvalue:
+      print(f"   -> Dryf dla {ticker} (p={pvalue:.4f}), pełna estymacja...")
+      return None
+
+  result.arima_forecast = np.asarray(results.get_forecast(steps=FORECAST_DAYS).predicted_mean, dtype=np.float64)
+  result.state_date = new.index[-1].date()
+  result.filter_state = final_filter_state(results)
+  result.arima_seconds = time.perf_counter() - arima_start
+
+  if garch_params is not None and garch_sigma2 is not None and garch_resid is not None:
+    garch_start = time.perf_counter()
+    omega, alpha, beta = garch_params
+    sigma2, resid = garch_sigma2, garch_resid
+    for innovation in np.asarray(results.resid)[1:] * 100:
+      sigma2 = omega + alpha * resid ** 2 + beta * sigma2
+      resid = float(innovation)
+    variance = variance_forecast(np.array([garch_params]), np.array([sigma2]), np.array([resid]), FORECAST_DAYS)[0]
+    result.garch_forecast = np.sqrt(variance) / 100
+    result.garch_sigma2 = float(sigma2)
+    result.garch_resid = resid
+    result.garch_seconds = time.perf_counter() - garch_start
+  return result
+
+def prices_to_series(dates: np.ndarray, closes: np.ndarray) -> pd.Series:
+  y = pd.Series(closes, index=pd.DatetimeIndex(dates, name='Date'), name='y')
+  return y.asfreq('B').ffill()
 
-  return arima_forecast, garch_vol
+# Punkt wejścia dla procesów roboczych: na wejściu i wyjściu tylko tablice numpy / listy liczb
+def fit_ticker(
+  ticker: str, dates: np.ndarray, closes: np.ndarray, update: dict | None = None, refit: bool = True, **kwargs
+) -> FitResult | None:
+  # refit=False -> None zamiast pełnej estymacji, gdy aktualizacja filtra nie jest możliwa
+  y = prices_to_series(dates, closes)
+  if update is not None:
+    result = update_and_predict(y, ticker, **update)
+    if result is not None or not refit:
+      return result
+  elif not refit:
+    return None
+  return train_and_predict(y, ticker, **kwargs)
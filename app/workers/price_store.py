@@ -0,0 +1,56 @@
+import os
+import re
+from datetime import date
+from pathlib import Path
+import numpy as np
+
+DATE_DTYPE = np.dtype("datetime64[D]")
+CLOSE_DTYPE = np.dtype(np.float64)
+
+# Kolumnowy magazyn notowań: dla każdego tickera dwa pliki binarne (daty i kursy zamknięcia)
+# czytane przez np.memmap. Źródłem prawdy pozostaje baza - plik można w każdej chwili odbudować.
+class PriceStore:
+  def __init__(self, root: str | os.PathLike):
+    self.root = Path(root)
+    self.root.mkdir(parents=True, exist_ok=True)
+
+  def _paths(self, ticker: str) -> tuple[Path, Path]:
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", ticker)
+    return self.root / f"{name}.dates", self.root / f"{name}.close"
+
+  def read(self, ticker: str) -> tuple[np.ndarray, np.ndarray] | None:
+    dates_path, closes_path = self._paths(ticker)
+    try:
+      dates_size = dates_path.stat().st_size
+      closes_size = closes_path.stat().st_size
+    except FileNotFoundError:
+      return None
+
+    n = dates_size // DATE_DTYPE.itemsize
+    if n == 0 or dates_size != n * DATE_DTYPE.itemsize or closes_size != n * CLOSE_DTYPE.itemsize:
+      return None
+
+    dates = np.memmap(dates_path, dtype=DATE_DTYPE, mode="r", shape=(n,))
+    closes = np.memmap(closes_path, dtype=CLOSE_DTYPE, mode="r", shape=(n,))
+    return dates, closes
+
+  def last_date(self, ticker: str) -> date | None:
+    arrays = self.read(ticker)
+    if arrays is None:
+      return None
+    return arrays[0][-1].item()
+
+  def write(self, ticker: str, dates: np.ndarray, closes: np.ndarray) -> None:
+    for path, values, dtype in zip(self._paths(ticker), (dates, closes), (DATE_DTYPE, CLOSE_DTYPE)):
+      tmp_path = path.with_suffix(path.suffix + ".tmp")
+      np.ascontiguousarray(values, dtype=dtype).tofile(tmp_path)
+      os.replace(tmp_path, path)
+
+  def append(self, ticker: str, dates: np.ndarray, closes: np.ndarray) -> None:
+    for path, values, dtype in zip(self._paths(ticker), (dates, closes), (DATE_DTYPE, CLOSE_DTYPE)):
+      with open(path, "ab") as f:
+        f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+  def invalidate(self, ticker: str) -> None:
+    for path in self._paths(ticker):
+      path.unlink(missing_ok=True)
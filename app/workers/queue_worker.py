@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.core.metrics import start_metrics_server
+from app.db.session import create_worker_engine
+# Rejestracja wszystkich tabel (relacje Company)
+from app.models import company, job_run, model_state, predictions, user, work_item
+from app.models.company import Company
+from .scheduler import process_companies
+from .work_queue import (
+  claim_work_items, complete_work_items, default_owner, enqueue_companies, fail_work_items, renew_work_items
+)
+
+async def keep_leases(session_factory, item_ids: list[int], owner: str):
+  # Dzierżawa przedłużana co 1/3 WORK_LEASE_SECONDS, dopóki paczka jest liczona - inaczej wolna paczka
+  # zostałaby przejęta przez inny worker w trakcie treningu. Osobna sesja: główną używa pipeline.
+  while True:
+    await asyncio.sleep(settings.WORK_LEASE_SECONDS / 3)
+    try:
+      async with session_factory() as db:
+        renewed = await renew_work_items(db, item_ids, owner)
+    except Exception as e:
+      print(f"Błąd przedłużania dzierżawy: {e}")
+      continue
+    if renewed < len(item_ids):
+      print(f"Worker {owner}: utracono dzierżawę {len(item_ids) - renewed} z {len(item_ids)} spółek")
+
+async def process_work_batch(session_factory, owner: str, limit: int | None = None) -> int:
+  async with session_factory() as db:
+    return await _process_work_batch(db, session_factory, owner, limit)
+
+async def _process_work_batch(db: AsyncSession, session_factory, owner: str, limit: int | None) -> int:
+  claimed = await claim_work_items(db, owner, limit or settings.WORK_BATCH_SIZE)
+  if not claimed:
+    return 0
+
+  company_ids = {company_id for _, company_id, _ in claimed}
+  tickers = dict((await db.execute(
+    select(Company.id, Company.ticker).where(Company.id.in_(company_ids))
+  )).all())
+
+  by_run_date: dict[date, list[tuple[int, int]]] = defaultdict(list)
+  for item_id, company_id, run_date in claimed:
+    by_run_date[run_date].append((item_id, company_id))
+
+  for run_date, items in by_run_date.items():
+    print(f"[{datetime.now()}] Worker {owner}: {len(items)} spółek z dnia {run_date}")
+    heartbeat = asyncio.create_task(keep_leases(session_factory, [item_id for item_id, _ in items], owner))
+    try:
+      outcomes = await process_companies(db, [(company_id, tickers[company_id]) for _, company_id in items], run_date)
+    except Exception as e:
+      await db.rollback()
+      print(f"Błąd przetwarzania paczki: {e}")
+      await fail_work_items(db, [item_id for item_id, _ in items], owner, str(e))
+      continue
+    finally:
+      heartbeat.cancel()
+
+    # Brak notowań (skipped) nie jest błędem - tak samo jak w nocnym jobie
+    done = [item_id for item_id, company_id in items if outcomes.get(company_id) in ("written", "skipped")]
+    failed = [item_id for item_id, company_id in items if outcomes.get(company_id) not in ("written", "skipped")]
+    await complete_work_items(db, done, owner)
+    await fail_work_items(db, failed, owner, "model fit or forecast write failed")
+  return len(claimed)
+
+async def run_worker(
+  session_factory, owner: str | None = None, batch_size: int | None = None, once: bool = False
+):
+  owner = owner or default_owner()
+  print(f"[{datetime.now()}] Worker {owner} uruchomiony")
+  while True:
+    processed = await process_work_batch(session_factory, owner, batch_size)
+    if processed:
+      continue
+    if once:
+      break
+    await asyncio.sleep(settings.WORK_POLL_SECONDS)
+  print(f"[{datetime.now()}] Worker {owner}: kolejka pusta")
+
+async def main(args):
+  # Kilka workerów na jednej maszynie: osobne WORKER_METRICS_PORT
+  if settings.WORKER_METRICS_PORT is not None and not args.once:
+    start_metrics_server(settings.WORKER_METRICS_PORT)
+  # Własna, mała pula połączeń jak w python -m app.workers - nie ustawienia puli API
+  engine = create_worker_engine()
+  session_factory = async_sessionmaker(autocommit=False, autoflush=False, bind=engine)
+  try:
+    if args.enqueue:
+      async with session_factory() as db:
+        added = await enqueue_companies(db, date.today(), args.tickers)
+      print(f"Dodano do kolejki: {added}")
+    await run_worker(session_factory, batch_size=args.batch_size, once=args.once)
+  finally:
+    await engine.dispose()
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Worker nocnego joba - przetwarza spółki z kolejki work_items")
+  parser.add_argument("--enqueue", action="store_true", help="najpierw dodaj dzisiejsze spółki do kolejki")
+  parser.add_argument("--tickers", nargs="*", default=None)
+  parser.add_argument("--batch-size", type=int, default=None)
+  parser.add_argument("--once", action="store_true", help="zakończ, gdy kolejka jest pusta")
+  asyncio.run(main(parser.parse_args()))
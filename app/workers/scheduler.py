@@ -1,18 +1,314 @@
 import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+import numpy as np
 import pandas as pd
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from sqlalchemy.future import select
-from sqlalchemy import delete, desc
+from sqlalchemy import bindparam, delete, func, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date, timedelta, datetime
 
+from app.config import settings
+from app.core.metrics import PIPELINE_RUN_SECONDS, PIPELINE_TICKERS, observe_stage, stage_timer
 from app.db.session import AsyncSessionLocal
 from app.models.company import Company
-from app.models.predictions import PredictionArima, PredictionGarch, PriceHistory
-from .data_loader import download_stock_data
-from .model_pipeline import train_and_predict
+from app.models.model_state import ModelState
+from app.models.predictions import PredictionArima, PredictionGarch, PriceHistory, ForecastSnapshot
+from app.schemas.predictions import dashboard_json
+from .data_loader import get_market_data_provider, split_by_ticker
+from .model_pipeline import FitResult, fit_garch_batched, fit_ticker
+from .price_store import PriceStore
+from .work_queue import utcnow
 
-scheduler = AsyncIOScheduler()
+DEFAULT_START = date(2020, 1, 1)
+
+def get_training_workers() -> int:
+  if settings.TRAINING_WORKERS is None:
+    return os.cpu_count() or 1
+  return max(settings.TRAINING_WORKERS, 1)
+
+def get_price_store() -> PriceStore | None:
+  if not settings.PRICE_STORE_DIR:
+    return None
+  return PriceStore(settings.PRICE_STORE_DIR)
+
+def create_training_executor(workers: int) -> Executor | None:
+  # 1 worker -> trening w wątku, bez osobnych procesów
+  if workers <= 1:
+    return None
+  return ProcessPoolExecutor(
+    max_workers=workers,
+    mp_context=multiprocessing.get_context("spawn")
+  )
+
+def price_rows_from_frame(company_id: int, df: pd.DataFrame, last_date: date | None) -> list[dict]:
+  if df.empty:
+    return []
+
+  frame = pd.DataFrame({
+    "date": pd.to_datetime(df["Date"]).dt.normalize(),
+    "close": pd.to_numeric(df["Close"], errors="coerce"),
+  })
+  frame = frame.dropna().drop_duplicates("date", keep="last").sort_values("date")
+  if last_date:
+    frame = frame[frame["date"] > pd.Timestamp(last_date)]
+
+  frame["date"] = frame["date"].dt.date
+  frame["company_id"] = company_id
+  return frame.to_dict("records")
+
+async def get_last_price_dates(db: AsyncSession, company_ids: list[int]) -> dict[int, date]:
+  with stage_timer("last_date_lookup"):
+    result = await db.execute(
+      select(PriceHistory.company_id, func.max(PriceHistory.date))
+      .where(PriceHistory.company_id.in_(company_ids))
+      .group_by(PriceHistory.company_id)
+    )
+    return dict(result.all())
+
+def download_start_dates(
+  companies_data, last_dates: dict[int, date], today: date, include_today: bool = False
+) -> dict[str, date]:
+  start_dates = {}
+  for company_id, company_ticker in companies_data:
+    last_date = last_dates.get(company_id)
+    start_download_date = last_date + timedelta(days=1) if last_date else DEFAULT_START
+    if start_download_date < today or (include_today and start_download_date == today):
+      start_dates[company_ticker] = start_download_date
+  return start_dates
+
+async def download_prices(start_dates: dict[str, date]) -> dict[str, pd.DataFrame]:
+  if not start_dates:
+    return {}
+  try:
+    with stage_timer("download"):
+      provider = get_market_data_provider()
+      prices = await asyncio.to_thread(provider.fetch, start_dates)
+  except Exception as e:
+    print(f"Błąd pobierania notowań: {e}")
+    return {}
+  return split_by_ticker(prices)
+
+async def store_new_prices(
+  db: AsyncSession, company_id: int, ticker: str, new_data_df: pd.DataFrame,
+  last_date: date | None, store: PriceStore | None = None
+) -> date | None:
+  rows = price_rows_from_frame(company_id, new_data_df, last_date)
+  if not rows:
+    return last_date
+
+  with stage_timer("price_insert", ticker):
+    await db.execute(insert(PriceHistory), rows)
+    await db.commit()
+    if store is not None:
+      update_price_store(store, ticker, last_date, rows)
+  return rows[-1]["date"]
+
+def split_provisional(df: pd.DataFrame, today: date) -> tuple[pd.DataFrame, pd.DataFrame]:
+  # Notowanie z bieżącego dnia (sesja może jeszcze trwać) vs. notowania z dni zamkniętych
+  is_today = pd.to_datetime(df["Date"]).dt.date >= today
+  return df[~is_today], df[is_today]
+
+def update_price_store(store: PriceStore, ticker: str, previous_last_date: date | None, rows: list[dict]):
+  dates = np.array([r["date"] for r in rows], dtype="datetime64[D]")
+  closes = np.array([r["close"] for r in rows], dtype=np.float64)
+  if previous_last_date is None:
+    store.write(ticker, dates, closes)
+  elif store.last_date(ticker) == previous_last_date:
+    store.append(ticker, dates, closes)
+  else:
+    # Plik nie pasuje do bazy - zostanie odbudowany przy odczycie
+    store.invalidate(ticker)
+
+async def load_price_arrays(
+  db: AsyncSession, company_id: int, ticker: str, last_date: date | None, store: PriceStore | None = None
+) -> tuple[np.ndarray, np.ndarray] | None:
+  with stage_timer("history_load", ticker):
+    return await _load_price_arrays(db, company_id, ticker, last_date, store)
+
+async def _load_price_arrays(
+  db: AsyncSession, company_id: int, ticker: str, last_date: date | None, store: PriceStore | None
+) -> tuple[np.ndarray, np.ndarray] | None:
+  if last_date is None:
+    return None
+
+  if store is not None:
+    arrays = store.read(ticker)
+    if arrays is not None and arrays[0][-1].item() == last_date:
+      return arrays
+
+  history_q = await db.execute(
+    select(PriceHistory.date, PriceHistory.close)
+    .where(PriceHistory.company_id == company_id)
+    .order_by(PriceHistory.date)
+  )
+  history_rows = history_q.all()
+
+  if not history_rows:
+    return None
+
+  dates = np.array([h.date for h in history_rows], dtype="datetime64[D]")
+  closes = np.array([h.close for h in history_rows], dtype=np.float64)
+  if store is not None:
+    store.write(ticker, dates, closes)
+  return dates, closes
+
+async def get_model_states(db: AsyncSession, company_ids: list[int]) -> dict[int, dict]:
+  result = await db.execute(
+    select(
+      ModelState.company_id, ModelState.order, ModelState.seasonal_order,
+      ModelState.order_selected_at, ModelState.residual_pvalue, ModelState.arima_params, ModelState.garch_params,
+      ModelState.fitted_at, ModelState.state_date, ModelState.filter_state,
+      ModelState.garch_sigma2, ModelState.garch_resid, ModelState.innovations_n, ModelState.innovations_sq
+    )
+    .where(ModelState.company_id.in_(company_ids))
+  )
+  return {row.company_id: row._asdict() for row in result.all()}
+
+def fit_kwargs(state: dict | None, today: date, refresh: bool = False) -> dict:
+  kwargs = _fit_kwargs(state, today)
+  # Przy GARCH_ENGINE=batch proces treningu kończy na ARIMA, GARCH liczy etap paczkowy
+  if settings.GARCH_ENGINE == "batch":
+    kwargs["estimate_garch"] = False
+  update = update_kwargs(state, today, refresh)
+  if update is not None:
+    kwargs["update"] = update
+  return kwargs
+
+def update_kwargs(state: dict | None, today: date, refresh: bool = False) -> dict | None:
+  # Aktualizacja filtra zamiast estymacji: do MODEL_REFIT_DAYS od ostatniej estymacji (odświeżanie - zawsze)
+  if state is None or not state.get("filter_state") or not state.get("arima_params") or state.get("state_date") is None:
+    return None
+  fitted_at = state.get("fitted_at")
+  if not refresh and (fitted_at is None or (today - fitted_at).days >= settings.MODEL_REFIT_DAYS):
+    return None
+  return {
+    "order": state["order"],
+    "seasonal_order": state["seasonal_order"],
+    "arima_params": state["arima_params"],
+    "filter_state": state["filter_state"],
+    "state_date": state["state_date"],
+    "garch_params": state["garch_params"],
+    "garch_sigma2": state.get("garch_sigma2"),
+    "garch_resid": state.get("garch_resid"),
+    "innovations_n": state.get("innovations_n"),
+    "innovations_sq": state.get("innovations_sq"),
+    "min_drift_pvalue": settings.MODEL_DRIFT_MIN_PVALUE,
+  }
+
+def _fit_kwargs(state: dict | None, today: date) -> dict:
+  if state is None:
+    return {"reselect_order": True}
+
+  selected_at = state["order_selected_at"]
+  reselect_order = (
+    state["order"] is None
+    or selected_at is None
+    or (today - selected_at).days >= settings.ORDER_RESELECT_DAYS
+  )
+  return {
+    "order": state["order"],
+    "seasonal_order": state["seasonal_order"],
+    "arima_start_params": state["arima_params"],
+    "garch_start_params": state["garch_params"],
+    "reselect_order": reselect_order,
+    "min_residual_pvalue": settings.ORDER_RESELECT_MIN_PVALUE,
+    "previous_residual_pvalue": state.get("residual_pvalue"),
+  }
+
+async def save_model_state(db: AsyncSession, company_id: int, today: date, fit: FitResult):
+  values = {
+    "state_date": fit.state_date,
+    "filter_state": fit.filter_state,
+    "garch_sigma2": fit.garch_sigma2,
+    "garch_resid": fit.garch_resid,
+    "innovations_n": fit.innovations_n,
+    "innovations_sq": fit.innovations_sq,
+  }
+  # Aktualizacja filtra nie zmienia parametrów ani daty estymacji
+  if not fit.incremental:
+    values.update(
+      order=list(fit.order) if fit.order else None,
+      seasonal_order=list(fit.seasonal_order) if fit.seasonal_order else None,
+      residual_pvalue=fit.residual_pvalue,
+      arima_params=fit.arima_params,
+      garch_params=fit.garch_params,
+      fitted_at=today,
+    )
+  if fit.order_selected:
+    values["order_selected_at"] = today
+
+  result = await db.execute(
+    update(ModelState).where(ModelState.company_id == company_id).values(**values)
+  )
+  if result.rowcount == 0:
+    await db.execute(insert(ModelState).values(company_id=company_id, **values))
+
+async def write_forecasts(
+  db: AsyncSession, company_id: int, ticker: str, today: date, fit: FitResult, save_state: bool = True
+):
+  with stage_timer("forecast_write", ticker):
+    await _write_forecasts(db, company_id, ticker, today, fit, save_state)
+  print(f"Zapisano prognozy dla {ticker}")
+
+async def _write_forecasts(
+  db: AsyncSession, company_id: int, ticker: str, today: date, fit: FitResult, save_state: bool = True
+):
+  arima_forecast = fit.arima_forecast
+  garch_forecast = fit.garch_forecast
+
+  # Historia prognoz jest zachowywana - usuwany jest tylko ewentualny wcześniejszy run z tego samego dnia
+  await db.execute(delete(PredictionArima).where(
+    PredictionArima.company_id == company_id, PredictionArima.forecast_date == today
+  ))
+  await db.execute(delete(PredictionGarch).where(
+    PredictionGarch.company_id == company_id, PredictionGarch.forecast_date == today
+  ))
+
+  target_dates = [today + timedelta(days=i+1) for i in range(len(arima_forecast))]
+  predicted_values = arima_forecast.astype(float).tolist()
+  predicted_volatilities = (
+    garch_forecast.astype(float).tolist() if garch_forecast is not None
+    else [None] * len(target_dates)
+  )
+
+  await db.execute(insert(PredictionArima), [
+    {"company_id": company_id, "forecast_date": today, "target_date": t, "predicted_value": v}
+    for t, v in zip(target_dates, predicted_values)
+  ])
+  if garch_forecast is not None:
+    await db.execute(insert(PredictionGarch), [
+      {"company_id": company_id, "forecast_date": today, "target_date": t, "predicted_volatility": v}
+      for t, v in zip(target_dates, predicted_volatilities)
+    ])
+
+  horizon = [
+    {"target_date": t.isoformat(), "predicted_value": v, "predicted_volatility": vol}
+    for t, v, vol in zip(target_dates, predicted_values, predicted_volatilities)
+  ]
+
+  await db.merge(ForecastSnapshot(
+    company_id=company_id,
+    forecast_date=today,
+    horizon=horizon,
+    updated_at=utcnow(),
+    payload=dashboard_json(ticker, today, horizon)
+  ))
+  if save_state:
+    await save_model_state(db, company_id, today, fit)
+
+  await db.commit()
+
+async def select_companies(db: AsyncSession, tickers=None):
+  query = select(Company.id, Company.ticker)
+  if tickers:
+    query = query.where(Company.ticker.in_(tickers))
+
+  result = await db.execute(query)
+  return result.all()
 
 async def run_nightly_prediction_job(db: AsyncSession | None = None, tickers=None):
   print(f"[{datetime.now()}] Uruchamianie Nocnego Joba...")
@@ -23,102 +319,260 @@ async def run_nightly_prediction_job(db: AsyncSession | None = None, tickers=Non
 
   print("JOB SESSION:", id(db))
 
-  query = select(Company.id, Company.ticker)
-  if tickers:
-    query = query.where(Company.ticker.in_(tickers))
-
-  result = await db.execute(query)
-  companies_data = result.all()
+  companies_data = await select_companies(db, tickers)
 
   today = date.today()
-  DEFAULT_START = date(2020, 1, 1)
+  start = time.perf_counter()
+  try:
+    outcomes = await process_companies(db, companies_data, today)
+  finally:
+    PIPELINE_RUN_SECONDS.observe(time.perf_counter() - start)
 
-  for company_id, company_ticker in companies_data:
-    print(f"--- Przetwarzanie: {company_ticker} ---")
+  print(f"[{datetime.now()}] Nocny Job zakończony.")
+  return outcomes
 
-    last_entry_q = await db.execute(
-      select(PriceHistory.date)
-      .where(PriceHistory.company_id == company_id)
-      .order_by(desc(PriceHistory.date))
-      .limit(1)
-    )
-    last_date = last_entry_q.scalar_one_or_none()
+async def run_forecast_refresh_job(db: AsyncSession | None = None, tickers=None):
+  # W ciągu dnia: notowania do dziś włącznie dołączane do zapisanych filtrów, bez estymacji. Dzisiejsze
+  # notowanie jest tymczasowe - nie trafia do price_history ani do stanu modelu (ten aktualizuje nocny job);
+  # spółki bez zapisanego stanu albo z wykrytym dryfem czekają na nocny job
+  if db is None:
+    async with AsyncSessionLocal() as session:
+      return await run_forecast_refresh_job(db=session, tickers=tickers)
+
+  companies_data = await select_companies(db, tickers)
+  with stage_timer("forecast_refresh"):
+    outcomes = await process_companies(db, companies_data, date.today(), refresh=True)
+  print(f"[{datetime.now()}] Odświeżanie prognoz zakończone: {len(outcomes)} spółek")
+  return outcomes
+
+def record_fit_metrics(ticker: str, fit: FitResult):
+  suffix = "update" if fit.incremental else "fit"
+  if fit.arima_seconds is not None:
+    observe_stage(f"arima_{suffix}", ticker, fit.arima_seconds, fit.arima_error is None)
+  if fit.garch_seconds is not None:
+    observe_stage(f"garch_{suffix}", ticker, fit.garch_seconds, fit.garch_error is None)
+
+async def run_stage(handler, inbox: asyncio.Queue, outbox: asyncio.Queue | None, concurrency: int):
+  # Workery pobierają z kolejki aż do znacznika końca (None); put() na pełnej kolejce wstrzymuje etap
+  async def worker():
+    while True:
+      item = await inbox.get()
+      if item is None:
+        inbox.put_nowait(None)
+        return
+      for result in await handler(*item) or ():
+        await outbox.put(result)
+
+  await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+  if outbox is not None:
+    await outbox.put(None)
+
+async def run_batch_stage(handler, inbox: asyncio.Queue, outbox: asyncio.Queue, batch_size: int):
+  # Elementy zbierane w paczki po batch_size; niepełna paczka przetwarzana po znaczniku końca
+  batch = []
+  while True:
+    item = await inbox.get()
+    if item is not None:
+      batch.append(item)
+    if batch and (item is None or len(batch) >= batch_size):
+      for result in await handler(batch) or ():
+        await outbox.put(result)
+      batch = []
+    if item is None:
+      break
+  await outbox.put(None)
+
+async def feed_queue(queue: asyncio.Queue, items):
+  for item in items:
+    await queue.put(item)
+  await queue.put(None)
+
+async def process_companies(db: AsyncSession, companies_data, today: date, refresh: bool = False) -> dict[int, str]:
+  # Wynik: company_id -> "written" / "failed" / "skipped"
+  outcomes: dict[int, str] = {}
+  if not companies_data:
+    return outcomes
 
-    start_download_date = DEFAULT_START
-    if last_date:
-      start_download_date = last_date + timedelta(days=1)
+  store = get_price_store()
+  company_ids = [company_id for company_id, _ in companies_data]
+  last_dates = await get_last_price_dates(db, company_ids)
+  model_states = await get_model_states(db, company_ids)
+
+  workers = min(get_training_workers(), len(companies_data))
+  executor = create_training_executor(workers)
+  loop = asyncio.get_running_loop()
+  # Etapy bazodanowe współdzielą sesję - w danej chwili korzysta z niej tylko jeden
+  db_lock = asyncio.Lock()
+
+  # Etap 1: pobieranie nowych notowań paczkami tickerów
+  async def download(batch):
+    new_prices = await download_prices(download_start_dates(batch, last_dates, today, include_today=refresh))
+    return [(company_id, company_ticker, new_prices.get(company_ticker)) for company_id, company_ticker in batch]
+
+  # Etap 2: zapis notowań i wczytanie historii
+  async def load(company_id, company_ticker, new_data_df):
+    print(f"--- Przetwarzanie: {company_ticker} ---")
+    last_date = last_dates.get(company_id)
+    provisional = None
+    if refresh and new_data_df is not None:
+      new_data_df, provisional = split_provisional(new_data_df, today)
+    async with db_lock:
+      if new_data_df is not None and not new_data_df.empty:
+        try:
+          last_date = await store_new_prices(db, company_id, company_ticker, new_data_df, last_date, store)
+        except Exception as e:
+          await db.rollback()
+          print(f"Błąd zapisu notowań dla {company_ticker}: {e}")
 
-    if start_download_date < today:
       try:
-        new_data_df = await asyncio.to_thread(
-          download_stock_data, company_ticker, start_download_date
+        arrays = await load_price_arrays(db, company_id, company_ticker, last_date, store)
+      except Exception as e:
+        print(f"Błąd odczytu historii dla {company_ticker}: {e}")
+        arrays = None
+    if arrays is None:
+      PIPELINE_TICKERS.labels(outcome="skipped").inc()
+      outcomes[company_id] = "skipped"
+      return None
+    if provisional is not None:
+      rows = price_rows_from_frame(company_id, provisional, last_date)
+      if rows:
+        arrays = (
+          np.concatenate([arrays[0], np.array([r["date"] for r in rows], dtype="datetime64[D]")]),
+          np.concatenate([arrays[1], np.array([r["close"] for r in rows], dtype=np.float64)]),
         )
-        if not new_data_df.empty:
-          for _, row in new_data_df.iterrows():
-            current_date = pd.to_datetime(row['Date']).date()
-            if last_date and current_date <= last_date:
-              continue
-            ph = PriceHistory(
-              company_id=company_id,
-              date=current_date,
-              close=row['Close']
-            )
-            db.add(ph)
-          await db.commit()
-      except Exception:
-        pass
-
-    history_q = await db.execute(
-      select(PriceHistory)
-      .where(PriceHistory.company_id == company_id)
-      .order_by(PriceHistory.date)
-    )
-    history_rows = history_q.scalars().all()
-
-    if not history_rows:
-      continue
+    return [(company_id, company_ticker, *arrays)]
 
-    df_full = pd.DataFrame([
-      {'Date': h.date, 'y': h.close} for h in history_rows
-    ])
-    df_full['Date'] = pd.to_datetime(df_full['Date'])
-    df_full.set_index('Date', inplace=True)
-    series_clean = df_full['y'].asfreq('B').ffill()
+  # Etap 3: trening modeli (pula procesów albo wątek)
+  async def fit(company_id, company_ticker, dates, closes):
+    kwargs = fit_kwargs(model_states.get(company_id), today, refresh)
+    if refresh and "update" not in kwargs:
+      PIPELINE_TICKERS.labels(outcome="skipped").inc()
+      outcomes[company_id] = "skipped"
+      return None
+    task = partial(fit_ticker, company_ticker, dates, closes, refit=not refresh, **kwargs)
+    fit_start = time.perf_counter()
+    try:
+      if executor is None:
+        fit_result = await asyncio.to_thread(task)
+      else:
+        fit_result = await loop.run_in_executor(executor, task)
+    except Exception as e:
+      print(f"Błąd treningu dla {company_ticker}: {e}")
+      observe_stage("arima_fit", company_ticker, time.perf_counter() - fit_start, success=False)
+      PIPELINE_TICKERS.labels(outcome="failed").inc()
+      outcomes[company_id] = "failed"
+      return None
+    # Odświeżanie bez możliwej aktualizacji filtra (dryf, luka w notowaniach) - estymacja w nocnym jobie
+    if fit_result is None:
+      PIPELINE_TICKERS.labels(outcome="skipped").inc()
+      outcomes[company_id] = "skipped"
+      return None
+    record_fit_metrics(company_ticker, fit_result)
+    if fit_result.arima_forecast is None:
+      PIPELINE_TICKERS.labels(outcome="failed").inc()
+      outcomes[company_id] = "failed"
+      return None
+    return [(company_id, company_ticker, fit_result)]
 
+  # Etap 3b (GARCH_ENGINE=batch): GARCH dla paczki spółek naraz, poza pętlą zdarzeń
+  async def garch(batch):
+    fits = [fit_result for _, _, fit_result in batch]
+    start_params = [(model_states.get(company_id) or {}).get("garch_params") for company_id, _, _ in batch]
     try:
-      arima_forecast, garch_forecast = await asyncio.to_thread(
-        train_and_predict, series_clean, company_ticker
+      await asyncio.to_thread(fit_garch_batched, fits, start_params)
+    except Exception as e:
+      print(f"Błąd wspólnego dopasowania GARCH ({len(batch)} spółek): {e}")
+      for fit_result in fits:
+        fit_result.garch_error = str(e)
+        fit_result.garch_residuals = None
+    for _, company_ticker, fit_result in batch:
+      if fit_result.garch_seconds is not None:
+        observe_stage("garch_fit", company_ticker, fit_result.garch_seconds, fit_result.garch_error is None)
+    return batch
+
+  # Etap 4: zapis prognoz w miarę ich spływania
+  async def write(company_id, company_ticker, fit_result):
+    async with db_lock:
+      try:
+        await write_forecasts(db, company_id, company_ticker, today, fit_result, save_state=not refresh)
+        PIPELINE_TICKERS.labels(outcome="written").inc()
+        outcomes[company_id] = "written"
+      except Exception as e:
+        await db.rollback()
+        print(f"Błąd zapisu prognoz dla {company_ticker}: {e}")
+        PIPELINE_TICKERS.labels(outcome="failed").inc()
+        outcomes[company_id] = "failed"
+
+  batch_size = max(settings.PIPELINE_DOWNLOAD_BATCH_SIZE, 1)
+  batches = [(companies_data[i:i + batch_size],) for i in range(0, len(companies_data), batch_size)]
+  batch_garch = settings.GARCH_ENGINE == "batch"
+  queues = [asyncio.Queue(maxsize=max(settings.PIPELINE_QUEUE_SIZE, 1)) for _ in range(5 if batch_garch else 4)]
+
+  try:
+    async with asyncio.TaskGroup() as tg:
+      tg.create_task(feed_queue(queues[0], batches))
+      tg.create_task(run_stage(download, queues[0], queues[1], settings.PIPELINE_DOWNLOAD_CONCURRENCY))
+      tg.create_task(run_stage(load, queues[1], queues[2], settings.PIPELINE_LOAD_CONCURRENCY))
+      tg.create_task(run_stage(fit, queues[2], queues[3], workers))
+      if batch_garch:
+        tg.create_task(run_batch_stage(garch, queues[3], queues[4], max(settings.GARCH_BATCH_SIZE, 1)))
+      tg.create_task(run_stage(write, queues[-1], None, settings.PIPELINE_WRITE_CONCURRENCY))
+  finally:
+    if executor is not None:
+      executor.shutdown(wait=False, cancel_futures=True)
+  return outcomes
+
+async def compact_forecast_history(db: AsyncSession, today: date | None = None) -> int:
+  today = today or date.today()
+  deleted = 0
+
+  # Runy starsze niż FORECAST_RETENTION_DAYS są usuwane
+  if settings.FORECAST_RETENTION_DAYS is not None:
+    cutoff = today - timedelta(days=settings.FORECAST_RETENTION_DAYS)
+    for model in (PredictionArima, PredictionGarch):
+      result = await db.execute(delete(model).where(model.forecast_date < cutoff))
+      deleted += result.rowcount
+
+  # Runy starsze niż FORECAST_COMPACT_AFTER_DAYS są przerzedzane do ostatniego runu w tygodniu
+  if settings.FORECAST_COMPACT_AFTER_DAYS is not None:
+    cutoff = today - timedelta(days=settings.FORECAST_COMPACT_AFTER_DAYS)
+    for model in (PredictionArima, PredictionGarch):
+      result = await db.execute(
+        select(model.company_id, model.forecast_date)
+        .where(model.forecast_date < cutoff)
+        .distinct()
       )
-    except Exception:
-      continue
-
-    if arima_forecast is None:
-      continue
-
-    await db.execute(delete(PredictionArima).where(PredictionArima.company_id == company_id))
-    await db.execute(delete(PredictionGarch).where(PredictionGarch.company_id == company_id))
-
-    for i in range(len(arima_forecast)):
-      target_dt = today + timedelta(days=i+1)
-      db.add(PredictionArima(
-        company_id=company_id,
-        forecast_date=today,
-        target_date=target_dt,
-        predicted_value=arima_forecast.iloc[i]
-      ))
-      if garch_forecast is not None:
-        db.add(PredictionGarch(
-          company_id=company_id,
-          forecast_date=today,
-          target_date=target_dt,
-          predicted_volatility=garch_forecast.iloc[i]
-        ))
+      last_in_week: dict[tuple[int, int, int], date] = {}
+      runs = result.all()
+      for company_id, forecast_date in runs:
+        key = (company_id, *forecast_date.isocalendar()[:2])
+        if forecast_date > last_in_week.get(key, date.min):
+          last_in_week[key] = forecast_date
 
-    await db.commit()
-    print(f"Zapisano prognozy dla {company_ticker}")
+      stale_runs = [
+        {"company_id": company_id, "forecast_date": forecast_date}
+        for company_id, forecast_date in runs
+        if last_in_week[(company_id, *forecast_date.isocalendar()[:2])] != forecast_date
+      ]
+      if stale_runs:
+        conn = await db.connection()
+        result = await conn.execute(
+          delete(model.__table__).where(
+            model.__table__.c.company_id == bindparam("company_id"),
+            model.__table__.c.forecast_date == bindparam("forecast_date"),
+          ),
+          stale_runs,
+        )
+        deleted += max(result.rowcount, 0)
 
-  print(f"[{datetime.now()}] Nocny Job zakończony.")
+  await db.commit()
+  return deleted
+
+async def run_forecast_compaction_job(db: AsyncSession | None = None):
+  if db is None:
+    async with AsyncSessionLocal() as session:
+      return await run_forecast_compaction_job(db=session)
 
-def setup_scheduler():
-  scheduler.add_job(run_nightly_prediction_job, 'cron', hour=1, minute=0)
-  scheduler.start()
+  with stage_timer("forecast_compaction"):
+    deleted = await compact_forecast_history(db)
+  print(f"[{datetime.now()}] Kompaktowanie historii prognoz: usunięto {deleted} wierszy")
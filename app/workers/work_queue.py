@@ -0,0 +1,141 @@
+import os
+import socket
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import and_, case, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.config import settings
+from app.db.dialect import dialect_insert
+from app.models.company import Company
+from app.models.work_item import WorkItem
+
+def utcnow() -> datetime:
+  return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def default_owner() -> str:
+  return f"{socket.gethostname()}:{os.getpid()}"
+
+def dialect_name(db: AsyncSession) -> str:
+  return db.get_bind().dialect.name
+
+async def enqueue_companies(db: AsyncSession, run_date: date, tickers: list[str] | None = None) -> int:
+  query = select(Company.id)
+  if tickers:
+    query = query.where(Company.ticker.in_(tickers))
+  company_ids = (await db.execute(query)).scalars().all()
+  if not company_ids:
+    return 0
+
+  # Unikalne (company_id, run_date): wiele procesów może wrzucić ten sam dzień, wiersz powstanie raz
+  now = utcnow()
+  conn = await db.connection()
+  result = await conn.execute(
+    dialect_insert(db, WorkItem.__table__)
+    .on_conflict_do_nothing(index_elements=["company_id", "run_date"])
+    .returning(WorkItem.__table__.c.id),
+    [
+      {"company_id": company_id, "run_date": run_date, "status": "pending", "attempts": 0, "updated_at": now}
+      for company_id in company_ids
+    ],
+  )
+  added = len(result.all())
+  await db.commit()
+  return added
+
+def claimable(now: datetime):
+  return and_(
+    WorkItem.attempts < settings.WORK_MAX_ATTEMPTS,
+    or_(
+      WorkItem.status == "pending",
+      and_(WorkItem.status == "running", WorkItem.lease_expires_at < now),
+    ),
+  )
+
+async def claim_work_items(
+  db: AsyncSession, owner: str, limit: int, now: datetime | None = None
+) -> list[tuple[int, int, date]]:
+  now = now or utcnow()
+
+  # Wygasłe dzierżawy bez pozostałych prób
+  await db.execute(
+    update(WorkItem)
+    .where(
+      WorkItem.status == "running", WorkItem.lease_expires_at < now,
+      WorkItem.attempts >= settings.WORK_MAX_ATTEMPTS,
+    )
+    .values(status="failed", lease_owner=None, lease_expires_at=None, updated_at=now)
+    .execution_options(synchronize_session=False)
+  )
+
+  candidates = (
+    select(WorkItem.id)
+    .where(claimable(now))
+    .order_by(WorkItem.run_date, WorkItem.id)
+    .limit(limit)
+  )
+  # Postgres: wiersze zablokowane przez inny worker są pomijane zamiast na nie czekać.
+  # SQLite: zapis jest i tak szeregowany, a warunek w UPDATE działa jak compare-and-set.
+  if dialect_name(db) == "postgresql":
+    candidates = candidates.with_for_update(skip_locked=True)
+
+  result = await db.execute(
+    update(WorkItem)
+    .where(WorkItem.id.in_(candidates.scalar_subquery()), claimable(now))
+    .values(
+      status="running",
+      lease_owner=owner,
+      lease_expires_at=now + timedelta(seconds=settings.WORK_LEASE_SECONDS),
+      attempts=WorkItem.attempts + 1,
+      updated_at=now,
+    )
+    .returning(WorkItem.id, WorkItem.company_id, WorkItem.run_date)
+    .execution_options(synchronize_session=False)
+  )
+  claimed = [tuple(row) for row in result.all()]
+  await db.commit()
+  return claimed
+
+async def complete_work_items(db: AsyncSession, item_ids: list[int], owner: str) -> int:
+  if not item_ids:
+    return 0
+  # Tylko właściciel aktualnej dzierżawy - po jej wygaśnięciu wiersz należy już do innego workera
+  result = await db.execute(
+    update(WorkItem)
+    .where(WorkItem.id.in_(item_ids), WorkItem.lease_owner == owner, WorkItem.status == "running")
+    .values(status="done", lease_owner=None, lease_expires_at=None, last_error=None, updated_at=utcnow())
+    .execution_options(synchronize_session=False)
+  )
+  await db.commit()
+  return result.rowcount
+
+async def renew_work_items(db: AsyncSession, item_ids: list[int], owner: str, now: datetime | None = None) -> int:
+  if not item_ids:
+    return 0
+  now = now or utcnow()
+  result = await db.execute(
+    update(WorkItem)
+    .where(WorkItem.id.in_(item_ids), WorkItem.lease_owner == owner, WorkItem.status == "running")
+    .values(lease_expires_at=now + timedelta(seconds=settings.WORK_LEASE_SECONDS), updated_at=now)
+    .execution_options(synchronize_session=False)
+  )
+  await db.commit()
+  return result.rowcount
+
+async def fail_work_items(db: AsyncSession, item_ids: list[int], owner: str, error: str) -> int:
+  if not item_ids:
+    return 0
+  result = await db.execute(
+    update(WorkItem)
+    .where(WorkItem.id.in_(item_ids), WorkItem.lease_owner == owner, WorkItem.status == "running")
+    .values(
+      status=case((WorkItem.attempts >= settings.WORK_MAX_ATTEMPTS, "failed"), else_="pending"),
+      lease_owner=None,
+      lease_expires_at=None,
+      last_error=error[:1000],
+      updated_at=utcnow(),
+    )
+    .execution_options(synchronize_session=False)
+  )
+  await db.commit()
+  return result.rowcount
@@ -0,0 +1,270 @@
+# Test obciążeniowy API w procesie (httpx + ASGITransport): N spółek, M dni historii prognoz,
+# /api/v1/predictions/{ticker}, /api/v1/login i /health przy zadanej współbieżności.
+#
+#   python -m benchmarks.api_load --companies 50 --days 30 --concurrency 16 --output wyniki.json
+#   python -m benchmarks.api_load --baseline wyniki.json     # porównanie z poprzednim commitem
+#   python -m benchmarks.api_load --nightly worker --baseline wyniki.json   # w trakcie nocnego joba
+#
+# --nightly worker: równolegle `python -m app.workers run nightly` (osobny proces, WORKER_NICE);
+# --nightly in-process: ten sam job w pętli zdarzeń API (jak RUN_SCHEDULER_IN_API=true).
+# Job liczy --nightly-tickers syntetycznych spółek na osobnej bazie SQLite.
+#
+# Domyślnie tymczasowa baza SQLite (aiosqlite). Lokalny Postgres: --db-url postgresql+asyncpg://...
+# razem z --reset-db (tabele są usuwane i tworzone od nowa - tylko dedykowana baza!).
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from benchmarks.common import git_revision, latency_summary
+
+SCENARIOS = ("predictions", "login", "health")
+EMAIL = "bench@example.com"
+PASSWORD = "password123"
+
+def parse_args():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--companies", type=int, default=50)
+  parser.add_argument("--days", type=int, default=30, help="dni historii prognoz na spółkę")
+  parser.add_argument("--concurrency", type=int, default=16)
+  parser.add_argument("--requests", type=int, default=2000, help="żądań na scenariusz (login: /10)")
+  parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+  parser.add_argument("--no-cache", action="store_true", help="wyłącza cache odpowiedzi /predictions")
+  parser.add_argument("--db-url", default=None)
+  parser.add_argument("--reset-db", action="store_true")
+  parser.add_argument("--output", default=None, help="plik JSON z wynikami")
+  parser.add_argument("--baseline", default=None, help="plik JSON z poprzedniego uruchomienia do porównania")
+  parser.add_argument("--nightly", choices=("none", "worker", "in-process"), default="none",
+                      help="nocny job działający w trakcie scenariuszy")
+  parser.add_argument("--nightly-tickers", type=int, default=20)
+  parser.add_argument("--nightly-warmup", type=float, default=10, help="s od startu joba do pierwszego scenariusza")
+  return parser.parse_args()
+
+FORECAST_DAYS = 10
+
+# Silnik bazy powstaje przy imporcie app.db.session, więc aplikacja jest importowana dopiero po ustawieniu
+# DATABASE_URL w main() - sam import modułu nie czyta argumentów ani nie dotyka konfiguracji
+async def seed(companies: int, days: int) -> list[str]:
+  from sqlalchemy import insert
+
+  from app.core import security
+  from app.db.base import Base
+  from app.db.session import engine, AsyncSessionLocal
+  from app.models.company import Company
+  from app.models.predictions import ForecastSnapshot, PredictionArima, PredictionGarch
+  from app.models.user import User
+
+  async with engine.begin() as conn:
+    await conn.run_sync(Base.metadata.drop_all)
+    await conn.run_sync(Base.metadata.create_all)
+
+  tickers = [f"B{i:04d}.WA" for i in range(companies)]
+  today = date.today()
+  rng = random.Random(0)
+
+  async with AsyncSessionLocal() as db:
+    await db.execute(insert(Company), [
+      {"id": i + 1, "name": f"Benchmark {t}", "ticker": t} for i, t in enumerate(tickers)
+    ])
+    for company_id in range(1, companies + 1):
+      arima, garch = [], []
+      for d in range(days):
+        forecast_date = today - timedelta(days=days - 1 - d)
+        for h in range(FORECAST_DAYS):
+          target_date = forecast_date + timedelta(days=h + 1)
+          arima.append({"company_id": company_id, "forecast_date": forecast_date,
+                        "target_date": target_date, "predicted_value": 50 + rng.random()})
+          garch.append({"company_id": company_id, "forecast_date": forecast_date,
+                        "target_date": target_date, "predicted_volatility": rng.random()})
+      await db.execute(insert(PredictionArima), arima)
+      await db.execute(insert(PredictionGarch), garch)
+      latest = arima[-FORECAST_DAYS:]
+      db.add(ForecastSnapshot(company_id=company_id, forecast_date=today, horizon=[
+        {"target_date": a["target_date"].isoformat(), "predicted_value": a["predicted_value"],
+         "predicted_volatility": g["predicted_volatility"]}
+        for a, g in zip(latest, garch[-FORECAST_DAYS:])
+      ]))
+    db.add(User(email=EMAIL, hashed_password=security.get_password_hash(PASSWORD)))
+    await db.commit()
+  return tickers
+
+async def start_nightly(args, directory: Path):
+  from benchmarks.bench_nightly_job import benchmark_tickers, prepare_database, write_market_data
+
+  tickers = benchmark_tickers(args.nightly_tickers)
+  data_dir = directory / "market_data"
+  data_dir.mkdir()
+  write_market_data(data_dir, tickers, "2025-12-31")
+  db_url = f"sqlite+aiosqlite:///{directory}/nightly.db"
+  await prepare_database(db_url, tickers)
+
+  if args.nightly == "worker":
+    env = {**os.environ, "DATABASE_URL": db_url, "MARKET_DATA_PROVIDER": "file", "MARKET_DATA_DIR": str(data_dir)}
+    return subprocess.Popen(
+      [sys.executable, "-m", "app.workers", "run", "nightly", "--tickers", *tickers],
+      env=env, stdout=subprocess.DEVNULL,
+    )
+
+  from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+  from app.config import settings
+  from app.workers.scheduler import run_nightly_prediction_job
+
+  settings.MARKET_DATA_PROVIDER = "file"
+  settings.MARKET_DATA_DIR = str(data_dir)
+
+  async def job():
+    engine = create_async_engine(db_url)
+    try:
+      async with async_sessionmaker(bind=engine)() as db:
+        await run_nightly_prediction_job(db=db, tickers=tickers)
+    finally:
+      await engine.dispose()
+  return asyncio.create_task(job())
+
+def nightly_running(nightly) -> bool:
+  if isinstance(nightly, subprocess.Popen):
+    return nightly.poll() is None
+  return not nightly.done()
+
+def stop_nightly(nightly):
+  if isinstance(nightly, subprocess.Popen):
+    nightly.terminate()
+    nightly.wait()
+  else:
+    nightly.cancel()
+
+async def drive(make_request, total: int, concurrency: int) -> dict:
+  latencies: list[float] = []
+  errors = 0
+  remaining = total
+
+  async def worker():
+    nonlocal remaining, errors
+    while remaining > 0:
+      remaining -= 1
+      start = time.perf_counter()
+      try:
+        response = await make_request()
+        ok = response.status_code == 200
+      except Exception:
+        ok = False
+      latencies.append(time.perf_counter() - start)
+      if not ok:
+        errors += 1
+
+  start = time.perf_counter()
+  await asyncio.gather(*(worker() for _ in range(concurrency)))
+  return latency_summary(latencies, time.perf_counter() - start, errors)
+
+async def login(client):
+  return await client.post(
+    "/api/v1/login",
+    data={"username": EMAIL, "password": PASSWORD},
+    headers={"Content-Type": "application/x-www-form-urlencoded"},
+  )
+
+async def run(args) -> dict:
+  from httpx import AsyncClient, ASGITransport
+
+  from app.core import cache
+  from app.db.session import engine
+  from app.main import app
+
+  if args.no_cache:
+    cache.dashboard_cache.max_size = 0
+
+  seed_start = time.perf_counter()
+  tickers = await seed(args.companies, args.days)
+  seed_elapsed = time.perf_counter() - seed_start
+
+  nightly = None
+  if args.nightly != "none":
+    nightly = await start_nightly(args, Path(tempfile.mkdtemp()))
+    await asyncio.sleep(args.nightly_warmup)
+
+  results = {}
+  transport = ASGITransport(app=app)
+  async with AsyncClient(transport=transport, base_url="http://bench") as client:
+    token = (await login(client)).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    rng = random.Random(1)
+
+    requests = {
+      "predictions": (
+        lambda: client.get(f"/api/v1/predictions/{rng.choice(tickers)}", headers=headers),
+        args.requests,
+      ),
+      "login": (lambda: login(client), max(1, args.requests // 10)),
+      "health": (lambda: client.get("/health"), args.requests),
+    }
+    for name in args.scenarios.split(","):
+      make_request, total = requests[name]
+      results[name] = await drive(make_request, total, args.concurrency)
+
+  # False -> job skończył się przed końcem scenariuszy (więcej --nightly-tickers)
+  nightly_until_end = None
+  if nightly is not None:
+    nightly_until_end = nightly_running(nightly)
+    stop_nightly(nightly)
+
+  await engine.dispose()
+  return {
+    "revision": git_revision(),
+    "timestamp": datetime.now(timezone.utc).isoformat(),
+    "params": {
+      "companies": args.companies, "days": args.days, "concurrency": args.concurrency,
+      "requests": args.requests, "cache": not args.no_cache,
+      "database": engine.url.get_backend_name(),
+      "nightly": args.nightly, "nightly_tickers": args.nightly_tickers if nightly else None,
+    },
+    "nightly_until_end": nightly_until_end,
+    "seed_seconds": seed_elapsed,
+    "results": results,
+  }
+
+def print_report(report: dict, baseline: dict | None):
+  print(f"rewizja {report['revision']}  {report['params']}")
+  for name, r in report["results"].items():
+    line = (
+      f"{name:12s} {r['rps']:9.1f} req/s  p50 {r['p50_ms']:7.2f} ms  "
+      f"p95 {r['p95_ms']:7.2f} ms  p99 {r['p99_ms']:7.2f} ms  błędy {r['errors']}"
+    )
+    base = (baseline or {}).get("results", {}).get(name)
+    if base:
+      line += f"  | vs {baseline['revision']}: req/s {r['rps'] / base['rps'] - 1:+.1%}, p99 {r['p99_ms'] / base['p99_ms'] - 1:+.1%}"
+    print(line)
+  if report.get("nightly_until_end") is False:
+    print("uwaga: nocny job skończył się przed końcem scenariuszy")
+
+def main():
+  args = parse_args()
+  if args.db_url is None:
+    args.db_url = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+    args.reset_db = True
+  elif not args.reset_db:
+    sys.exit("--db-url wymaga --reset-db (tabele zostaną usunięte i utworzone od nowa)")
+
+  os.environ["DATABASE_URL"] = args.db_url
+  os.environ.setdefault("SECRET_KEY", "benchmark")
+
+  baseline = None
+  if args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+
+  report = asyncio.run(run(args))
+  print_report(report, baseline)
+
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+  main()
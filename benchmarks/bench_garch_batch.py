@@ -0,0 +1,69 @@
+# GARCH(1,1) dla wielu spółek: pętla arch_model(...).fit() + forecast() (ścieżka GARCH_ENGINE=arch)
+# vs. wspólne dopasowanie z app/workers/garch_batch.py. Syntetyczne reszty o różnych długościach i parametrach.
+#
+#   python -m benchmarks.bench_garch_batch --tickers 300 --days 1000
+import argparse
+import time
+import warnings
+
+import numpy as np
+from arch import arch_model
+
+from app.workers.garch_batch import fit_garch_batch
+from app.workers.model_pipeline import FORECAST_DAYS
+
+def simulate(n_tickers: int, days: int, seed: int = 0) -> list[np.ndarray]:
+  rng = np.random.default_rng(seed)
+  series = []
+  for _ in range(n_tickers):
+    n = int(rng.integers(int(days * 0.8), days + 1))
+    alpha = rng.uniform(0.02, 0.15)
+    beta = rng.uniform(0.6, 0.97 - alpha)
+    omega = rng.uniform(0.01, 0.3) * (1 - alpha - beta)
+    shocks = rng.standard_normal(n)
+    resid = np.empty(n)
+    sigma2 = omega / (1 - alpha - beta)
+    for t in range(n):
+      resid[t] = np.sqrt(sigma2) * shocks[t]
+      sigma2 = omega + alpha * resid[t] ** 2 + beta * sigma2
+    series.append(resid * 100)
+  return series
+
+def arch_loop(series: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+  logliks, variances = [], []
+  with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    for resid in series:
+      results = arch_model(resid, mean="Zero", vol="Garch", p=1, q=1).fit(disp="off")
+      logliks.append(results.loglikelihood)
+      variances.append(results.forecast(horizon=FORECAST_DAYS).variance.iloc[-1].to_numpy())
+  return np.array(logliks), np.array(variances)
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--tickers", type=int, default=300)
+  parser.add_argument("--days", type=int, default=1000)
+  args = parser.parse_args()
+
+  series = simulate(args.tickers, args.days)
+
+  start = time.perf_counter()
+  arch_loglik, arch_variance = arch_loop(series)
+  arch_seconds = time.perf_counter() - start
+
+  batch = fit_garch_batch(series)
+  batch_variance = batch.forecast(FORECAST_DAYS)
+
+  print(f"spółki: {args.tickers}, obserwacje: do {args.days}")
+  print(f"pętla arch:        {arch_seconds:8.2f} s")
+  print(f"garch_batch:       {batch.seconds:8.2f} s  ({batch.iterations} iteracji, zbieżne: {batch.converged.sum()}/{len(series)})")
+  print(f"przyspieszenie:    {arch_seconds / batch.seconds:8.1f}x")
+  gap = arch_loglik - batch.loglik
+  print(f"log-wiarygodność:  max(arch - batch) = {gap.max():.2e}, batch lepszy o > 1e-3: {(gap < -1e-3).sum()}, gorszy: {(gap > 1e-3).sum()}")
+  # Prognozy porównywalne tylko tam, gdzie oba dopasowania trafiły w to samo maksimum
+  same = np.abs(gap) <= 1e-3
+  error = np.abs(batch_variance[same] / arch_variance[same] - 1).max(axis=1)
+  print(f"wariancja prognoz ({same.sum()} spółek z tym samym maksimum): błąd względny mediana {np.median(error):.1e}, max {error.max():.1e}")
+
+if __name__ == "__main__":
+  main()
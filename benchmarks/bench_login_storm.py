@@ -0,0 +1,124 @@
+# Opóźnienia /predictions podczas "burzy logowań": haszowanie bcrypt w puli wątków
+# vs. bezpośrednio w pętli zdarzeń (stare zachowanie).
+#
+#   python -m benchmarks.bench_login_storm --duration 5 --logins 16
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_tmp}/bench.db")
+
+import numpy as np
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.future import select
+
+from app.core import security
+from app.db.base import Base
+from app.db.seed import seed_companies
+from app.db.session import engine, AsyncSessionLocal
+from app.main import app
+from app.models.company import Company
+from app.models.predictions import ForecastSnapshot
+from app.models.user import User
+
+EMAIL = "bench@example.com"
+PASSWORD = "password123"
+
+async def setup_database():
+  async with engine.begin() as conn:
+    await conn.run_sync(Base.metadata.create_all)
+  async with AsyncSessionLocal() as db:
+    await seed_companies(db)
+    company = (await db.execute(select(Company).filter_by(ticker="PKO.WA"))).scalar_one()
+    today = date.today()
+    db.add(ForecastSnapshot(company_id=company.id, forecast_date=today, horizon=[
+      {"target_date": (today + timedelta(days=i + 1)).isoformat(), "predicted_value": 40.0 + i,
+       "predicted_volatility": 0.5}
+      for i in range(10)
+    ]))
+    db.add(User(email=EMAIL, hashed_password=security.get_password_hash(PASSWORD)))
+    await db.commit()
+
+async def login(client: AsyncClient):
+  return await client.post(
+    "/api/v1/login",
+    data={"username": EMAIL, "password": PASSWORD},
+    headers={"Content-Type": "application/x-www-form-urlencoded"},
+  )
+
+async def scenario(client: AsyncClient, token: str, duration: float, login_workers: int, readers: int, rate: float):
+  headers = {"Authorization": f"Bearer {token}"}
+  latencies = []
+  logins = 0
+  deadline = time.perf_counter() + duration
+  interval = readers / rate
+
+  # Stały harmonogram wysyłki: opóźnienie liczone od planowanego startu, więc
+  # zablokowana pętla zdarzeń nie "ukrywa" żądań, których nie zdążyła wysłać
+  async def reader(offset: float):
+    scheduled = time.perf_counter() + offset
+    while scheduled < deadline:
+      await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+      response = await client.get("/api/v1/predictions/PKO.WA", headers=headers)
+      latencies.append(time.perf_counter() - scheduled)
+      assert response.status_code == 200
+      scheduled += interval
+
+  async def login_worker():
+    nonlocal logins
+    while time.perf_counter() < deadline:
+      response = await login(client)
+      if response.status_code == 200:
+        logins += 1
+
+  await asyncio.gather(
+    *(reader(i * interval / readers) for i in range(readers)),
+    *(login_worker() for _ in range(login_workers)),
+  )
+  ms = np.array(latencies) * 1000
+  return {
+    "requests": len(ms),
+    "p50_ms": float(np.percentile(ms, 50)),
+    "p99_ms": float(np.percentile(ms, 99)),
+    "logins_per_s": logins / duration,
+  }
+
+async def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--duration", type=float, default=5.0)
+  parser.add_argument("--logins", type=int, default=16, help="współbieżne pętle logowania")
+  parser.add_argument("--readers", type=int, default=4, help="współbieżni czytelnicy /predictions")
+  parser.add_argument("--rate", type=float, default=50.0, help="łączna liczba żądań /predictions na sekundę")
+  args = parser.parse_args()
+
+  await setup_database()
+  transport = ASGITransport(app=app)
+  async with AsyncClient(transport=transport, base_url="http://bench") as client:
+    token = (await login(client)).json()["access_token"]
+
+    results = {"bez logowań": await scenario(client, token, args.duration, 0, args.readers, args.rate)}
+    results["logowania, pula wątków"] = await scenario(client, token, args.duration, args.logins, args.readers, args.rate)
+
+    offloaded = security._run_hashing
+    async def inline_hashing(func, *func_args):
+      return func(*func_args)
+    security._run_hashing = inline_hashing
+    try:
+      results["logowania, w pętli zdarzeń"] = await scenario(client, token, args.duration, args.logins, args.readers, args.rate)
+    finally:
+      security._run_hashing = offloaded
+
+  print(f"bcrypt rounds: {security.pwd_context.to_dict()['bcrypt__rounds']}")
+  for name, r in results.items():
+    print(
+      f"{name:28s} /predictions p50 {r['p50_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms"
+      f"  ({r['requests']} żądań)  logowania/s {r['logins_per_s']:.1f}"
+    )
+
+if __name__ == "__main__":
+  asyncio.run(main())
@@ -0,0 +1,78 @@
+# Nocny job end-to-end bez sieci: syntetyczne notowania w plikach CSV + FileMarketDataProvider.
+#
+#   python -m benchmarks.bench_nightly_job --tickers 5 --workers 4
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.config import settings
+from app.db.base import Base
+from app.models.company import Company
+from app.db.seed import INITIAL_COMPANIES, seed_companies
+from app.workers.scheduler import run_nightly_prediction_job
+
+def benchmark_tickers(n: int) -> list[str]:
+  known = [c["ticker"] for c in INITIAL_COMPANIES]
+  return [known[i] if i < len(known) else f"SYN{i}.WA" for i in range(n)]
+
+def write_market_data(directory: Path, tickers: list[str], end: str):
+  for seed, ticker in enumerate(tickers):
+    dates = pd.bdate_range("2020-01-01", end)
+    closes = 50 + np.cumsum(np.random.default_rng(seed).normal(0, 0.5, len(dates)))
+    pd.DataFrame({"Date": dates, "Close": closes}).to_csv(directory / f"{ticker}.csv", index=False)
+
+async def prepare_database(db_url: str, tickers: list[str]):
+  engine = create_async_engine(db_url)
+  async with engine.begin() as conn:
+    await conn.run_sync(Base.metadata.create_all)
+  Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+  async with Session() as db:
+    await seed_companies(db)
+    for ticker in tickers[len(INITIAL_COMPANIES):]:
+      db.add(Company(name=f"Company {ticker}", ticker=ticker))
+    await db.commit()
+  await engine.dispose()
+
+async def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--tickers", type=int, default=5)
+  parser.add_argument("--workers", type=int, default=None)
+  parser.add_argument("--end", default="2025-12-31")
+  args = parser.parse_args()
+
+  tickers = benchmark_tickers(args.tickers)
+
+  with tempfile.TemporaryDirectory() as tmp:
+    data_dir = Path(tmp) / "market_data"
+    data_dir.mkdir()
+    write_market_data(data_dir, tickers, args.end)
+
+    settings.MARKET_DATA_PROVIDER = "file"
+    settings.MARKET_DATA_DIR = str(data_dir)
+    settings.TRAINING_WORKERS = args.workers
+
+    db_url = f"sqlite+aiosqlite:///{tmp}/bench.db"
+    await prepare_database(db_url, tickers)
+    engine = create_async_engine(db_url)
+    Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with Session() as db:
+      start = time.perf_counter()
+      await run_nightly_prediction_job(db=db, tickers=tickers)
+      elapsed = time.perf_counter() - start
+    await engine.dispose()
+
+  print(f"tickery: {len(tickers)}, workers: {args.workers or 'auto'}")
+  print(f"czas nocnego joba: {elapsed:.2f} s")
+
+if __name__ == "__main__":
+  asyncio.run(main())
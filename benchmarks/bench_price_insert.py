@@ -0,0 +1,81 @@
+# Porównanie zapisu notowań: pętla iterrows + db.add (stara ścieżka) vs. insert() executemany.
+#
+#   python -m benchmarks.bench_price_insert --tickers 20 --start 2020-01-01
+import argparse
+import asyncio
+import os
+import time
+from datetime import date
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.db.base import Base
+from app.models.company import Company
+from app.models.predictions import PriceHistory
+from app.workers.scheduler import price_rows_from_frame
+
+def make_frame(start: date, seed: int) -> pd.DataFrame:
+  dates = pd.bdate_range(start, "2025-12-31")
+  closes = 50 + np.cumsum(np.random.default_rng(seed).normal(0, 0.5, len(dates)))
+  return pd.DataFrame({"Date": dates, "Close": closes})
+
+async def legacy_insert(db, company_id, df, last_date):
+  for _, row in df.iterrows():
+    current_date = pd.to_datetime(row['Date']).date()
+    if last_date and current_date <= last_date:
+      continue
+    db.add(PriceHistory(company_id=company_id, date=current_date, close=row['Close']))
+  await db.commit()
+
+async def bulk_insert(db, company_id, df, last_date):
+  rows = price_rows_from_frame(company_id, df, last_date)
+  if rows:
+    await db.execute(insert(PriceHistory), rows)
+  await db.commit()
+
+async def run(writer, frames, db_url) -> float:
+  engine = create_async_engine(db_url)
+  async with engine.begin() as conn:
+    await conn.run_sync(Base.metadata.drop_all)
+    await conn.run_sync(Base.metadata.create_all)
+  Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+  async with Session() as db:
+    for i in range(len(frames)):
+      db.add(Company(name=f"Company {i}", ticker=f"T{i}.WA"))
+    await db.commit()
+
+  start = time.perf_counter()
+  async with Session() as db:
+    for company_id, df in enumerate(frames, start=1):
+      await writer(db, company_id, df, None)
+  elapsed = time.perf_counter() - start
+  await engine.dispose()
+  return elapsed
+
+async def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--tickers", type=int, default=20)
+  parser.add_argument("--start", type=date.fromisoformat, default=date(2020, 1, 1))
+  parser.add_argument("--db-url", default="sqlite+aiosqlite:///:memory:")
+  args = parser.parse_args()
+
+  frames = [make_frame(args.start, seed) for seed in range(args.tickers)]
+  rows = sum(len(f) for f in frames)
+
+  legacy = await run(legacy_insert, frames, args.db_url)
+  bulk = await run(bulk_insert, frames, args.db_url)
+
+  print(f"wiersze: {rows} ({args.tickers} tickerów)")
+  print(f"iterrows + db.add:   {legacy:8.3f} s  ({rows / legacy:10.0f} wierszy/s)")
+  print(f"insert() executemany:{bulk:8.3f} s  ({rows / bulk:10.0f} wierszy/s)")
+  print(f"przyspieszenie:      {legacy / bulk:8.1f}x")
+
+if __name__ == "__main__":
+  asyncio.run(main())
@@ -0,0 +1,78 @@
+# Koszt CPU serializacji odpowiedzi /predictions/{ticker} (bez bazy i HTTP): walidacja pydantic + model_dump_json
+# (stara ścieżka) vs. orjson z krotek/słowników vs. gotowy payload zapisany przy prognozie.
+#
+#   python -m benchmarks.bench_serialization --requests 20000 --horizon 10
+import argparse
+import os
+import time
+from datetime import date, timedelta
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+from fastapi.responses import Response
+
+from app.core.responses import OrjsonResponse
+from app.schemas.predictions import DashboardData, dashboard_json
+
+TICKER = "PKO.WA"
+FORECAST_DATE = date(2024, 1, 2)
+
+def make_horizon(days: int) -> list[dict]:
+  return [
+    {
+      "target_date": (FORECAST_DATE + timedelta(days=i + 1)).isoformat(),
+      "predicted_value": 50.0 + i * 0.123456789,
+      "predicted_volatility": 0.01 + i * 0.000987654321,
+    }
+    for i in range(days)
+  ]
+
+def pydantic_path(horizon: list[dict]) -> Response:
+  dashboard = DashboardData(
+    ticker=TICKER,
+    last_update=FORECAST_DATE,
+    arima_forecast=[
+      {"target_date": h["target_date"], "predicted_value": h["predicted_value"]} for h in horizon
+    ],
+    garch_forecast=[
+      {"target_date": h["target_date"], "predicted_volatility": h["predicted_volatility"]}
+      for h in horizon if h.get("predicted_volatility") is not None
+    ],
+  )
+  return Response(content=dashboard.model_dump_json().encode(), media_type="application/json")
+
+def orjson_path(horizon: list[dict]) -> Response:
+  return OrjsonResponse(dashboard_json(TICKER, FORECAST_DATE, horizon))
+
+def precomputed_path(payload: bytes) -> Response:
+  return OrjsonResponse(payload)
+
+def cpu_per_request(fn, arg, requests: int) -> float:
+  start = time.process_time()
+  for _ in range(requests):
+    fn(arg)
+  return (time.process_time() - start) / requests
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--requests", type=int, default=20000)
+  parser.add_argument("--horizon", type=int, default=10)
+  args = parser.parse_args()
+
+  horizon = make_horizon(args.horizon)
+  payload = dashboard_json(TICKER, FORECAST_DATE, horizon)
+  assert pydantic_path(horizon).body == orjson_path(horizon).body == payload
+
+  results = {
+    "pydantic + model_dump_json": cpu_per_request(pydantic_path, horizon, args.requests),
+    "orjson z wierszy": cpu_per_request(orjson_path, horizon, args.requests),
+    "gotowy payload": cpu_per_request(precomputed_path, payload, args.requests),
+  }
+  base = results["pydantic + model_dump_json"]
+  print(f"żądania: {args.requests}, horyzont: {args.horizon} dni, odpowiedź: {len(payload)} B")
+  for name, seconds in results.items():
+    print(f"{name:28s} {seconds * 1e6:8.2f} µs CPU/żądanie  ({base / seconds:5.1f}x)")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,108 @@
+# Czas startu procesu API (import app.main + lifespan) i szczytowe RSS, każdy pomiar w świeżym procesie.
+#
+#   python -m benchmarks.bench_startup --runs 5 --output start.json
+#   python -m benchmarks.bench_startup --baseline start.json
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import git_revision
+
+HEAVY_MODULES = ("pandas", "statsmodels", "pmdarima", "arch", "yfinance")
+
+def child():
+  import asyncio
+  import resource
+  import time
+
+  start = time.perf_counter()
+  from app.main import app
+  import_seconds = time.perf_counter() - start
+
+  async def startup():
+    async with app.router.lifespan_context(app):
+      pass
+
+  start = time.perf_counter()
+  asyncio.run(startup())
+  startup_seconds = time.perf_counter() - start
+
+  print(json.dumps({
+    "import_seconds": import_seconds,
+    "startup_seconds": startup_seconds,
+    # Linux: ru_maxrss w KB
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+  }))
+
+def measure(db_url: str, create_schema: bool) -> dict:
+  env = {
+    **os.environ,
+    "SECRET_KEY": "benchmark",
+    "DATABASE_URL": db_url,
+    "CREATE_SCHEMA_ON_STARTUP": str(create_schema).lower(),
+  }
+  result = subprocess.run(
+    [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+    capture_output=True, text=True, check=True, env=env,
+  )
+  return json.loads(result.stdout.strip().splitlines()[-1])
+
+def run(args) -> dict:
+  with tempfile.TemporaryDirectory() as tmp:
+    db_url = f"sqlite+aiosqlite:///{tmp}/startup.db"
+    # Pierwszy start zakłada schemat i dane startowe; mierzone są kolejne starty
+    measure(db_url, create_schema=True)
+    samples = [measure(db_url, create_schema=not args.skip_schema) for _ in range(args.runs)]
+
+  return {
+    "revision": git_revision(),
+    "params": {"runs": args.runs, "create_schema": not args.skip_schema},
+    "results": {
+      key: statistics.median(s[key] for s in samples)
+      for key in ("import_seconds", "startup_seconds", "max_rss_mb")
+    },
+    "heavy_modules": samples[-1]["heavy_modules"],
+  }
+
+def print_report(report: dict, baseline: dict | None):
+  print(f"rewizja {report['revision']}  {report['params']}")
+  for key, value in report["results"].items():
+    line = f"{key:16s} {value:9.3f}"
+    base = (baseline or {}).get("results", {}).get(key)
+    if base:
+      line += f"  | vs {baseline['revision']}: {value / base - 1:+.1%}"
+    print(line)
+  print(f"ciężkie moduły po starcie: {report['heavy_modules'] or 'brak'}")
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--runs", type=int, default=5)
+  parser.add_argument("--skip-schema", action="store_true", help="CREATE_SCHEMA_ON_STARTUP=false")
+  parser.add_argument("--output", default=None)
+  parser.add_argument("--baseline", default=None, help="plik JSON z poprzedniego uruchomienia do porównania")
+  parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.child:
+    child()
+    return
+
+  baseline = None
+  if args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+
+  report = run(args)
+  print_report(report, baseline)
+
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+  main()
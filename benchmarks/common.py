@@ -0,0 +1,24 @@
+import subprocess
+import numpy as np
+
+def latency_summary(latencies: list[float], elapsed: float, errors: int = 0) -> dict:
+  ms = np.asarray(latencies, dtype=np.float64) * 1000
+  if len(ms) == 0:
+    ms = np.array([np.nan])
+  return {
+    "requests": len(latencies),
+    "errors": errors,
+    "rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+    "p50_ms": float(np.percentile(ms, 50)),
+    "p95_ms": float(np.percentile(ms, 95)),
+    "p99_ms": float(np.percentile(ms, 99)),
+    "max_ms": float(np.max(ms)),
+  }
+
+def git_revision() -> str | None:
+  try:
+    return subprocess.run(
+      ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+    ).stdout.strip()
+  except Exception:
+    return None
@@ -1,25 +1,20 @@
+import os
+# Szybsze haszowanie w testach (ustawienie musi być przed importem app)
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.future import select
 from sqlalchemy.pool import StaticPool
 
 from app.main import app
 from app.db.base import Base
-from app.models.company import Company
-from app.api.v1.endpoints_auth import get_db as get_db_auth
-from app.api.deps import get_db as get_db_deps
+from app.db.seed import seed_companies
+from app.api.deps import get_db
 from app.workers.scheduler import run_nightly_prediction_job
 from app.core.security import get_password_hash
-
-INITIAL_COMPANIES = [
-  {"name": "Bank Ochrony Srodowiska S.A.", "ticker": "BOS.WA"},
-  {"name": "Getin Holding SA", "ticker": "GTN.WA"},
-  {"name": "Bank Handlowy w Warszawie S.A.", "ticker": "BHW.WA"},
-  {"name": "Powszechna Kasa Oszczednosci Bank Polski Spólka Akcyjna", "ticker": "PKO.WA"},
-  {"name": "Santander Bank Polska S.A.", "ticker": "SPL.WA"},
-]
+from app.core.cache import dashboard_cache, user_cache
 
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
@@ -36,11 +31,7 @@ async def setup_db():
 
   SetupSession = async_sessionmaker(bind=engine, expire_on_commit=False)
   async with SetupSession() as db:
-    for company_data in INITIAL_COMPANIES:
-      result = await db.execute(select(Company).filter_by(ticker=company_data["ticker"]))
-      if not result.scalar_one_or_none():
-        db.add(Company(name=company_data["name"], ticker=company_data["ticker"]))
-    await db.commit()
+    await seed_companies(db)
 
   yield
 
@@ -61,8 +52,9 @@ async def db_session():
   async def get_test_session():
     yield shared_session
 
-  app.dependency_overrides[get_db_auth] = get_test_session
-  app.dependency_overrides[get_db_deps] = get_test_session
+  app.dependency_overrides[get_db] = get_test_session
+  dashboard_cache.clear()
+  user_cache.clear()
 
   try:
     yield shared_session
@@ -1,5 +1,14 @@
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.api.deps import invalidate_user
+from app.config import settings
+from app.core import security
+from app.core.cache import user_cache
+from app.models.user import User
 
 @pytest.mark.asyncio
 async def test_register_user(client: AsyncClient):
@@ -41,3 +50,67 @@ async def test_login_for_access_token(client: AsyncClient):
   data = response.json()
   assert "access_token" in data
   assert data["token_type"] == "bearer"
+
+@pytest.mark.asyncio
+async def test_current_user_served_from_cache(client: AsyncClient, logged_in_token: str, db_session):
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  response = await client.get("/api/v1/predictions/FAKE", headers=headers)
+  assert response.status_code == 404
+  assert user_cache.get("test-user@example.com") is not None
+
+  # Masowy delete omija zdarzenia ORM - użytkownik nadal jest w cache
+  await db_session.execute(delete(User).where(User.email == "test-user@example.com"))
+  response = await client.get("/api/v1/predictions/FAKE", headers=headers)
+  assert response.status_code == 404
+
+  invalidate_user("test-user@example.com")
+  response = await client.get("/api/v1/predictions/FAKE", headers=headers)
+  assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_current_user_cache_invalidated_on_orm_delete_after_commit(
+  client: AsyncClient, logged_in_token: str, db_session
+):
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  await client.get("/api/v1/predictions/FAKE", headers=headers)
+  assert user_cache.get("test-user@example.com") is not None
+
+  result = await db_session.execute(select(User).filter(User.email == "test-user@example.com"))
+  await db_session.delete(result.scalar_one())
+  await db_session.flush()
+  assert user_cache.get("test-user@example.com") is not None
+
+  # db_session.commit to w fixturze flush - prawdziwy commit sesji (zewnętrzna transakcja zostaje)
+  await AsyncSession.commit(db_session)
+  assert user_cache.get("test-user@example.com") is None
+  response = await client.get("/api/v1/predictions/FAKE", headers=headers)
+  assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_password_hashing_runs_off_event_loop():
+  hashed = await security.get_password_hash_async("password123")
+  assert hashed.startswith("$2b$04$")
+  assert await security.verify_password_async("password123", hashed)
+  assert not await security.verify_password_async("wrong", hashed)
+
+@pytest.mark.asyncio
+async def test_login_fails_fast_when_hashing_queue_full(client: AsyncClient, monkeypatch):
+  await client.post(
+    "/api/v1/register",
+    json={"email": "busy@example.com", "password": "password123"},
+  )
+  monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_PENDING", 0)
+
+  response = await client.post(
+    "/api/v1/login",
+    data={"username": "busy@example.com", "password": "password123"},
+    headers={"Content-Type": "application/x-www-form-urlencoded"},
+  )
+  assert response.status_code == 503
+  assert response.headers["Retry-After"] == "1"
+
+  response = await client.post(
+    "/api/v1/register",
+    json={"email": "busy2@example.com", "password": "password123"},
+  )
+  assert response.status_code == 503
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.future import select
+
+from app.models.backtest import BacktestResult
+from app.models.company import Company
+from app.models.predictions import PriceHistory
+from app.workers.backtest import backtest_origins, backtest_segment, garch_variance_path, run_backtest
+from app.workers.model_pipeline import build_sarimax, fit_sarimax, prices_to_series
+
+def fake_arrays(seed: int = 1):
+  dates = pd.bdate_range("2021-01-01", "2023-12-29")
+  rng = np.random.default_rng(seed)
+  closes = 50 + np.cumsum(rng.normal(0, 0.5, len(dates)))
+  return dates.values.astype("datetime64[D]"), closes
+
+def test_backtest_segment_matches_refiltering():
+  dates, closes = fake_arrays()
+  y = prices_to_series(dates, closes)
+  origins = backtest_origins(len(y), 10, 5, 0)[:8]
+  order, seasonal_order = (1, 1, 1), (0, 0, 0, 5)
+
+  score = backtest_segment("X", dates, closes, order, seasonal_order, origins)
+
+  # Przedłużanie filtra daje te same prognozy co filtrowanie całej historii od nowa
+  params = fit_sarimax(build_sarimax(y.iloc[:origins[0] + 1], order, seasonal_order))[0].params
+  abs_error = 0.0
+  for origin in origins:
+    forecast = build_sarimax(y.iloc[:origin + 1], order, seasonal_order).filter(params).forecast(10)
+    abs_error += np.abs(np.asarray(forecast) - y.to_numpy()[origin + 1:origin + 11]).sum()
+  assert score.origins == len(origins)
+  assert score.n == 10 * len(origins)
+  assert score.abs_error == pytest.approx(abs_error, rel=1e-6)
+  assert score.n_qlike == score.n
+
+def test_garch_variance_path_converges_to_unconditional():
+  params = np.array([0.1, 0.1, 0.8])
+  path = garch_variance_path(params, sigma2=5.0, last_innovation=0.0, horizon=500)
+  assert path[0] == pytest.approx(0.1 + 0.8 * 5.0)
+  assert path[-1] == pytest.approx(0.1 / (1 - 0.9))
+
+@pytest.mark.asyncio
+async def test_run_backtest_persists_results(db_session):
+  company_id = (await db_session.execute(
+    select(Company.id).where(Company.ticker == "PKO.WA")
+  )).scalar_one()
+  dates, closes = fake_arrays()
+  await db_session.execute(insert(PriceHistory), [
+    {"company_id": company_id, "date": d.item(), "close": float(c)} for d, c in zip(dates, closes)
+  ])
+  await db_session.commit()
+
+  rows = await run_backtest(
+    db_session, tickers=["PKO.WA"], years=0.5, step=20, refit_every=3, workers=1
+  )
+
+  assert len(rows) == 1
+  saved = (await db_session.execute(
+    select(BacktestResult).where(BacktestResult.company_id == company_id)
+  )).scalars().all()
+  assert len(saved) == 1
+  result = saved[0]
+  assert result.order == [3, 1, 1]
+  n_obs = len(prices_to_series(dates, closes))
+  assert result.origins == len(backtest_origins(n_obs, 10, 20, n_obs - 1 - int(0.5 * 261)))
+  assert result.mae > 0
+  assert result.rmse >= result.mae
+  assert result.qlike is not None
+  assert result.start_date < result.end_date
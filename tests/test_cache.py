@@ -0,0 +1,33 @@
+import time
+
+from app.core.cache import TTLCache
+
+def test_cache_get_set():
+  cache = TTLCache(max_size=10, ttl=60)
+  cache.set("PKO.WA", b"payload")
+  assert cache.get("PKO.WA") == b"payload"
+  assert cache.get("SPL.WA") is None
+
+def test_cache_expires_after_ttl():
+  cache = TTLCache(max_size=10, ttl=0.01)
+  cache.set("PKO.WA", b"payload")
+  time.sleep(0.02)
+  assert cache.get("PKO.WA") is None
+  assert len(cache) == 0
+
+def test_cache_evicts_least_recently_used():
+  cache = TTLCache(max_size=2, ttl=60)
+  cache.set("A", 1)
+  cache.set("B", 2)
+  cache.get("A")
+  cache.set("C", 3)
+  assert cache.get("A") == 1
+  assert cache.get("B") is None
+  assert cache.get("C") == 3
+
+def test_cache_invalidate():
+  cache = TTLCache(max_size=10, ttl=60)
+  cache.set("A", 1)
+  cache.invalidate("A")
+  cache.invalidate("missing")
+  assert cache.get("A") is None
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+from datetime import date
+
+from app.workers import data_loader
+from app.workers.data_loader import FileMarketDataProvider, MarketDataProvider, YahooFinanceProvider, split_by_ticker
+
+def _yahoo_frame(tickers: list[str], start: str) -> pd.DataFrame:
+  dates = pd.bdate_range(start, periods=3, name="Date")
+  columns = pd.MultiIndex.from_product([["Close", "Open"], tickers], names=["Price", "Ticker"])
+  values = [[float(i)] * len(columns) for i in range(len(dates))]
+  return pd.DataFrame(values, index=dates, columns=columns)
+
+def test_yahoo_provider_groups_tickers_by_start_date(monkeypatch):
+  calls = []
+
+  def fake_download(tickers, start, **kwargs):
+    calls.append((tuple(tickers), start))
+    return _yahoo_frame(tickers, start)
+
+  monkeypatch.setattr(data_loader.yf, "download", fake_download)
+
+  prices = YahooFinanceProvider().fetch({
+    "PKO.WA": date(2024, 1, 2),
+    "SPL.WA": date(2024, 1, 2),
+    "BOS.WA": date(2024, 2, 1),
+  })
+
+  assert sorted(calls) == [(("BOS.WA",), "2024-02-01"), (("PKO.WA", "SPL.WA"), "2024-01-02")]
+  assert list(prices.columns) == ["Ticker", "Date", "Close"]
+  assert len(prices) == 9
+
+  by_ticker = split_by_ticker(prices)
+  assert set(by_ticker) == {"PKO.WA", "SPL.WA", "BOS.WA"}
+  assert by_ticker["BOS.WA"]["Date"].iloc[0] == pd.Timestamp("2024-02-01")
+  assert by_ticker["PKO.WA"]["Close"].tolist() == [0.0, 1.0, 2.0]
+
+def test_yahoo_provider_returns_empty_frame_on_error(monkeypatch):
+  def failing_download(*args, **kwargs):
+    raise RuntimeError("no network")
+
+  monkeypatch.setattr(data_loader.yf, "download", failing_download)
+  prices = YahooFinanceProvider().fetch({"PKO.WA": date(2024, 1, 2)})
+  assert prices.empty
+  assert split_by_ticker(prices) == {}
+
+def test_file_provider_filters_by_start_date(tmp_path):
+  pd.DataFrame({
+    "Date": pd.bdate_range("2024-01-01", periods=5),
+    "Close": [1.0, 2.0, 3.0, 4.0, 5.0],
+  }).to_csv(tmp_path / "PKO.WA.csv", index=False)
+
+  prices = FileMarketDataProvider(tmp_path).fetch({"PKO.WA": date(2024, 1, 4), "MISSING": date(2024, 1, 1)})
+  assert prices["Ticker"].unique().tolist() == ["PKO.WA"]
+  assert prices["Close"].tolist() == [4.0, 5.0]
+
+def test_provider_without_fetch_cannot_be_created():
+  class IncompleteProvider(MarketDataProvider):
+    pass
+
+  with pytest.raises(TypeError):
+    IncompleteProvider()
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import settings
+from app.core.metrics import registry
+from app.db.session import TimedQueuePool, engine_options
+
+def test_engine_options_postgres(monkeypatch):
+  monkeypatch.setattr(settings, "DB_POOL_TIMEOUT", 5)
+  monkeypatch.setattr(settings, "DB_POOL_RECYCLE", 600)
+  monkeypatch.setattr(settings, "DB_POOL_PRE_PING", False)
+  monkeypatch.setattr(settings, "DB_STATEMENT_CACHE_SIZE", 0)
+
+  options = engine_options("postgresql+asyncpg://u:p@db/stock", pool_size=3, max_overflow=1)
+  assert options["poolclass"] is TimedQueuePool
+  assert options["pool_size"] == 3
+  assert options["max_overflow"] == 1
+  assert options["pool_timeout"] == 5
+  assert options["pool_recycle"] == 600
+  assert options["pool_pre_ping"] is False
+  assert options["connect_args"] == {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+
+def test_engine_options_sqlite_keeps_dialect_pool():
+  options = engine_options("sqlite+aiosqlite:///:memory:", pool_size=3, max_overflow=1)
+  assert options == {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+
+@pytest.mark.asyncio
+async def test_pool_records_checkout_wait(tmp_path):
+  before = registry.get_sample_value("db_pool_checkout_wait_seconds_count") or 0
+  engine = create_async_engine(
+    f"sqlite+aiosqlite:///{tmp_path}/pool.db", poolclass=TimedQueuePool, pool_size=1, max_overflow=0
+  )
+  try:
+    for _ in range(3):
+      async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+  finally:
+    await engine.dispose()
+  assert registry.get_sample_value("db_pool_checkout_wait_seconds_count") == before + 3
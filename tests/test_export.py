@@ -0,0 +1,102 @@
+import csv
+import io
+import json
+import pytest
+from httpx import AsyncClient
+from datetime import date, timedelta
+from sqlalchemy.future import select
+
+from app.models.company import Company
+from app.models.predictions import PredictionArima, PredictionGarch, PriceHistory
+
+async def _company(db_session, ticker: str) -> Company:
+  result = await db_session.execute(select(Company).where(Company.ticker == ticker))
+  return result.scalar_one()
+
+async def _add_prices(db_session, ticker: str, start: date, days: int):
+  company = await _company(db_session, ticker)
+  for i in range(days):
+    db_session.add(PriceHistory(company_id=company.id, date=start + timedelta(days=i), close=100.0 + i))
+  await db_session.commit()
+
+@pytest.mark.asyncio
+async def test_export_unauthorized(client: AsyncClient):
+  response = await client.get("/api/v1/export/prices")
+  assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_export_prices_ndjson_filters(client: AsyncClient, logged_in_token: str, db_session):
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  await _add_prices(db_session, "PKO.WA", date(2024, 1, 1), 10)
+  await _add_prices(db_session, "SPL.WA", date(2024, 1, 1), 10)
+
+  response = await client.get(
+    "/api/v1/export/prices",
+    params={"tickers": "pko.wa", "start": "2024-01-03", "end": "2024-01-05"},
+    headers=headers,
+  )
+  assert response.status_code == 200
+  assert response.headers["content-type"].startswith("application/x-ndjson")
+  rows = [json.loads(line) for line in response.text.splitlines()]
+  assert rows == [
+    {"ticker": "PKO.WA", "date": "2024-01-03", "close": 102.0},
+    {"ticker": "PKO.WA", "date": "2024-01-04", "close": 103.0},
+    {"ticker": "PKO.WA", "date": "2024-01-05", "close": 104.0},
+  ]
+
+@pytest.mark.asyncio
+async def test_export_prices_csv(client: AsyncClient, logged_in_token: str, db_session):
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  await _add_prices(db_session, "PKO.WA", date(2024, 1, 1), 3)
+  await _add_prices(db_session, "SPL.WA", date(2024, 1, 1), 2)
+
+  response = await client.get("/api/v1/export/prices", params={"format": "csv"}, headers=headers)
+  assert response.status_code == 200
+  assert 'filename="prices.csv"' in response.headers["content-disposition"]
+  rows = list(csv.reader(io.StringIO(response.text)))
+  assert rows[0] == ["ticker", "date", "close"]
+  assert [row[0] for row in rows[1:]] == ["PKO.WA"] * 3 + ["SPL.WA"] * 2
+  assert rows[1] == ["PKO.WA", "2024-01-01", "100.0"]
+
+@pytest.mark.asyncio
+async def test_export_forecasts_arrow(client: AsyncClient, logged_in_token: str, db_session):
+  pa = pytest.importorskip("pyarrow")
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  company = await _company(db_session, "BHW.WA")
+  for forecast_date in (date(2024, 1, 2), date(2024, 1, 5)):
+    for i in range(3):
+      target = forecast_date + timedelta(days=i + 1)
+      db_session.add(PredictionArima(
+        company_id=company.id, forecast_date=forecast_date, target_date=target, predicted_value=10.0 + i
+      ))
+      if i < 2:
+        db_session.add(PredictionGarch(
+          company_id=company.id, forecast_date=forecast_date, target_date=target, predicted_volatility=0.5
+        ))
+  await db_session.commit()
+
+  response = await client.get(
+    "/api/v1/export/forecasts",
+    params={"tickers": "BHW.WA", "start": "2024-01-05", "format": "arrow"},
+    headers=headers,
+  )
+  assert response.status_code == 200
+  table = pa.ipc.open_stream(response.content).read_all()
+  assert table.column_names == [
+    "ticker", "forecast_date", "target_date", "predicted_value", "predicted_volatility"
+  ]
+  assert table.num_rows == 3
+  assert table.column("forecast_date").to_pylist() == [date(2024, 1, 5)] * 3
+  assert table.column("predicted_volatility").to_pylist() == [0.5, 0.5, None]
+
+@pytest.mark.asyncio
+async def test_export_empty_arrow_has_schema(client: AsyncClient, logged_in_token: str):
+  pa = pytest.importorskip("pyarrow")
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  response = await client.get(
+    "/api/v1/export/prices", params={"tickers": "FAKE", "format": "arrow"}, headers=headers
+  )
+  assert response.status_code == 200
+  table = pa.ipc.open_stream(response.content).read_all()
+  assert table.num_rows == 0
+  assert table.column_names == ["ticker", "date", "close"]
@@ -0,0 +1,81 @@
+import warnings
+import numpy as np
+import pytest
+from arch import arch_model
+
+from app.workers.garch_batch import fit_garch_batch, linear_recursion, variance_forecast
+from app.workers.model_pipeline import FORECAST_DAYS, FitResult, fit_garch_batched
+
+def simulate_garch(n: int, omega: float, alpha: float, beta: float, seed: int) -> np.ndarray:
+  rng = np.random.default_rng(seed)
+  resid = np.empty(n)
+  sigma2 = omega / (1 - alpha - beta)
+  for t in range(n):
+    resid[t] = np.sqrt(sigma2) * rng.standard_normal()
+    sigma2 = omega + alpha * resid[t] ** 2 + beta * sigma2
+  return resid
+
+def fit_arch(resid: np.ndarray):
+  with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    return arch_model(resid, mean="Zero", vol="Garch", p=1, q=1).fit(disp="off")
+
+def test_linear_recursion_matches_loop():
+  rng = np.random.default_rng(0)
+  u = rng.random((3, 64))
+  beta = np.array([0.0, 0.5, 0.97])
+  initial = np.array([1.0, 2.0, 3.0])
+
+  expected = np.empty_like(u)
+  state = initial
+  for t in range(u.shape[1]):
+    state = u[:, t] + beta * state
+    expected[:, t] = state
+  np.testing.assert_allclose(linear_recursion(u, beta, initial), expected, rtol=1e-12)
+
+def test_batch_matches_arch():
+  # Różne długości (maskowane dopełnienie), skale i trwałości, w tym alpha na ograniczeniu
+  series = [
+    simulate_garch(1000, 0.05, 0.08, 0.90, seed=0),
+    simulate_garch(700, 0.2, 0.15, 0.80, seed=1),
+    simulate_garch(1200, 0.015, 0.05, 0.93, seed=2),
+    np.random.default_rng(3).standard_normal(400) * 30,
+  ]
+  batch = fit_garch_batch(series)
+  assert batch.converged.all()
+
+  forecasts = batch.forecast(FORECAST_DAYS)
+  for i, resid in enumerate(series):
+    reference = fit_arch(resid)
+    assert batch.loglik[i] == pytest.approx(reference.loglikelihood, abs=1e-4)
+    np.testing.assert_allclose(batch.params[i], reference.params.to_numpy(), atol=2e-3, rtol=1e-2)
+    np.testing.assert_allclose(
+      forecasts[i], reference.forecast(horizon=FORECAST_DAYS).variance.iloc[-1].to_numpy(), rtol=1e-3
+    )
+
+def test_variance_forecast_matches_recursion():
+  params = np.array([[0.1, 0.1, 0.8], [0.02, 0.05, 0.95 - 1e-7]])
+  sigma2_last = np.array([5.0, 1.0])
+  resid_last = np.array([1.5, -0.3])
+  path = variance_forecast(params, sigma2_last, resid_last, 20)
+
+  for i, (omega, alpha, beta) in enumerate(params):
+    sigma2 = omega + alpha * resid_last[i] ** 2 + beta * sigma2_last[i]
+    for h in range(20):
+      assert path[i, h] == pytest.approx(sigma2, rel=1e-9)
+      sigma2 = omega + (alpha + beta) * sigma2
+
+def test_fit_garch_batched_fills_fit_results():
+  resid = simulate_garch(800, 0.05, 0.1, 0.85, seed=4)
+  fits = [
+    FitResult(ticker="A", arima_forecast=np.zeros(FORECAST_DAYS), garch_forecast=None, garch_residuals=resid),
+    FitResult(ticker="B", arima_forecast=np.zeros(FORECAST_DAYS), garch_forecast=np.zeros(FORECAST_DAYS)),
+  ]
+  fit_garch_batched(fits, start_params=[[0.05, 0.1, 0.85], None])
+
+  reference = fit_arch(resid)
+  expected = np.sqrt(reference.forecast(horizon=FORECAST_DAYS).variance.iloc[-1].to_numpy()) / 100
+  np.testing.assert_allclose(fits[0].garch_forecast, expected, rtol=1e-3)
+  assert len(fits[0].garch_params) == 3
+  assert fits[0].garch_residuals is None
+  np.testing.assert_array_equal(fits[1].garch_forecast, np.zeros(FORECAST_DAYS))
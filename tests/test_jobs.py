@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from contextlib import asynccontextmanager
+from httpx import AsyncClient
+
+from app.config import settings
+from app.models.job_run import JobRun
+from app.workers import scheduler
+from app.workers.cron import nightly_prediction_job
+from app.workers.job_runs import JOB_NIGHTLY, finish_job_run, start_job_run
+from app.workers.model_pipeline import FORECAST_DAYS, FitResult
+
+def shared_session_factory(session):
+  @asynccontextmanager
+  async def factory():
+    yield session
+  return factory
+
+@pytest.mark.asyncio
+async def test_job_run_is_single_flight(db_session, monkeypatch):
+  first = await start_job_run(db_session, JOB_NIGHTLY, owner="worker-a")
+  assert first is not None
+  assert await start_job_run(db_session, JOB_NIGHTLY, owner="worker-b") is None
+  # Inne zadanie nie jest blokowane
+  assert await start_job_run(db_session, "forecast_compaction") is not None
+
+  await finish_job_run(db_session, first, "succeeded", {1: "written", 2: "failed", 3: "written"})
+  run = await db_session.get(JobRun, first)
+  await db_session.refresh(run)
+  assert (run.status, run.written, run.failed, run.skipped) == ("succeeded", 2, 1, None)
+
+  second = await start_job_run(db_session, JOB_NIGHTLY, owner="worker-b")
+  assert second is not None
+
+  # Run, który nie skończył się w JOB_RUN_TIMEOUT_SECONDS, zostaje porzucony
+  monkeypatch.setattr(settings, "JOB_RUN_TIMEOUT_SECONDS", -1)
+  third = await start_job_run(db_session, JOB_NIGHTLY, owner="worker-c")
+  assert third is not None
+  stale = await db_session.get(JobRun, second)
+  await db_session.refresh(stale)
+  assert stale.status == "abandoned"
+
+@pytest.mark.asyncio
+async def test_nightly_job_records_run(db_session, monkeypatch, client: AsyncClient, logged_in_token: str):
+  monkeypatch.setattr(settings, "TRAINING_WORKERS", 1)
+  dates = np.arange(np.datetime64("2023-01-02"), np.datetime64("2023-12-30"))
+
+  async def no_download(start_dates):
+    return {}
+
+  async def fake_history(db, company_id, ticker, last_date, store=None):
+    return dates, np.linspace(10, 20, len(dates))
+
+  def quick_fit(ticker, dates, closes, **kwargs):
+    return FitResult(ticker=ticker, arima_forecast=np.ones(FORECAST_DAYS), garch_forecast=None)
+
+  monkeypatch.setattr(scheduler, "download_prices", no_download)
+  monkeypatch.setattr(scheduler, "load_price_arrays", fake_history)
+  monkeypatch.setattr(scheduler, "fit_ticker", quick_fit)
+
+  await nightly_prediction_job(shared_session_factory(db_session), tickers=["PKO.WA", "BOS.WA"])
+
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  response = await client.get("/api/v1/jobs", params={"job_name": JOB_NIGHTLY}, headers=headers)
+  assert response.status_code == 200
+  [run] = response.json()
+  assert run["status"] == "succeeded"
+  assert run["written"] == 2
+  assert run["finished_at"] is not None
+
+@pytest.mark.asyncio
+async def test_jobs_requires_auth(client: AsyncClient):
+  response = await client.get("/api/v1/jobs")
+  assert response.status_code == 401
@@ -1,3 +1,6 @@
+import os
+import subprocess
+import sys
 from fastapi.testclient import TestClient
 from app.main import app
 
@@ -11,4 +14,23 @@ def test_read_root():
 def test_health_check():
   response = client.get("/health")
   assert response.status_code == 200
-  assert response.json() == {"status": "ok"}
\ No newline at end of file
+  assert response.json() == {"status": "ok"}
+
+def test_metrics_endpoint():
+  client.get("/health")
+  response = client.get("/metrics")
+  assert response.status_code == 200
+  assert response.headers["content-type"].startswith("text/plain")
+  body = response.text
+  assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in body
+  assert "pipeline_stage_duration_seconds" in body
+
+def test_import_does_not_load_modelling_stack():
+  # Osobny proces - w procesie testów stos modelowania jest już załadowany przez inne testy
+  heavy = ("pandas", "pmdarima", "statsmodels", "arch", "yfinance")
+  code = f"import sys, app.main; print([m for m in {heavy!r} if m in sys.modules])"
+  result = subprocess.run(
+    [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+    env={**os.environ, "SECRET_KEY": "test", "DATABASE_URL": "sqlite+aiosqlite:///:memory:"},
+  )
+  assert result.stdout.strip() == "[]"
@@ -0,0 +1,38 @@
+import urllib.request
+import pytest
+
+from app.core.metrics import observe_stage, registry, stage_timer, start_metrics_server
+
+def _count(stage: str, ticker: str, outcome: str) -> float:
+  value = registry.get_sample_value(
+    "pipeline_stage_duration_seconds_count",
+    {"stage": stage, "ticker": ticker, "outcome": outcome},
+  )
+  return value or 0.0
+
+def test_stage_timer_records_success():
+  before = _count("test_stage", "PKO.WA", "success")
+  with stage_timer("test_stage", "PKO.WA"):
+    pass
+  assert _count("test_stage", "PKO.WA", "success") == before + 1
+
+def test_stage_timer_records_failure():
+  before = _count("test_stage", "PKO.WA", "error")
+  with pytest.raises(RuntimeError):
+    with stage_timer("test_stage", "PKO.WA"):
+      raise RuntimeError("boom")
+  assert _count("test_stage", "PKO.WA", "error") == before + 1
+
+def test_worker_metrics_server_exposes_pipeline_histograms():
+  server, thread = start_metrics_server(0, addr="127.0.0.1")
+  try:
+    observe_stage("arima_fit", "SCRAPE.WA", 0.2)
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics", timeout=5) as response:
+      body = response.read().decode()
+  finally:
+    server.shutdown()
+    server.server_close()
+    thread.join(timeout=5)
+  assert 'pipeline_stage_duration_seconds_count{outcome="success",stage="arima_fit",ticker="SCRAPE.WA"} 1.0' in body
+  assert "pipeline_run_duration_seconds" in body
+  assert "pipeline_tickers_total" in body
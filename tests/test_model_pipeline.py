@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+from arch import arch_model
+
+from app.workers import model_pipeline
+from app.workers.model_pipeline import FORECAST_DAYS, build_sarimax, fit_ticker, prices_to_series
+
+PKO_ORDER = {"order": (3, 1, 1), "seasonal_order": (0, 0, 0, 5)}
+
+def _prices(n_days: int = 600):
+  dates = pd.bdate_range("2021-01-01", periods=n_days)
+  closes = 50 + np.cumsum(np.random.default_rng(3).normal(0, 0.5, n_days))
+  return dates.values.astype("datetime64[D]"), closes
+
+def test_fit_ticker_warm_start_from_previous_params():
+  dates, closes = _prices()
+  cold = fit_ticker("PKO.WA", dates[:-1], closes[:-1], **PKO_ORDER)
+  assert not cold.arima_warm_started and not cold.garch_warm_started
+  assert len(cold.garch_params) == 3
+
+  warm = fit_ticker(
+    "PKO.WA", dates, closes, **PKO_ORDER,
+    arima_start_params=cold.arima_params, garch_start_params=cold.garch_params
+  )
+  assert warm.arima_warm_started
+  assert warm.garch_warm_started
+
+  reference = fit_ticker("PKO.WA", dates, closes, **PKO_ORDER)
+  np.testing.assert_allclose(warm.arima_forecast, reference.arima_forecast, rtol=1e-3)
+
+def test_fit_ticker_ignores_mismatched_start_params():
+  dates, closes = _prices()
+  result = fit_ticker(
+    "PKO.WA", dates, closes, **PKO_ORDER,
+    arima_start_params=[0.1, 0.2], garch_start_params=[1.0]
+  )
+  assert not result.arima_warm_started
+  assert not result.garch_warm_started
+  assert result.arima_forecast is not None
+
+def test_fit_ticker_reuses_stored_order():
+  dates, closes = _prices()
+  result = fit_ticker("PKO.WA", dates, closes, **PKO_ORDER)
+  assert not result.order_selected
+  assert result.order == (3, 1, 1)
+  assert result.seasonal_order == (0, 0, 0, 5)
+  assert 0.0 <= result.residual_pvalue <= 1.0
+
+def test_fit_ticker_selects_order_when_missing(monkeypatch):
+  monkeypatch.setattr(model_pipeline, "select_order", lambda y: ((1, 1, 0), (0, 0, 0, 5)))
+  dates, closes = _prices()
+  result = fit_ticker("NEW.WA", dates, closes)
+  assert result.order_selected
+  assert result.order == (1, 1, 0)
+  assert result.arima_forecast is not None
+
+def test_fit_ticker_reselects_order_when_residuals_degrade(monkeypatch):
+  calls = []
+
+  def fake_select_order(y):
+    calls.append(len(y))
+    return (1, 1, 0), (0, 0, 0, 5)
+
+  monkeypatch.setattr(model_pipeline, "select_order", fake_select_order)
+  dates, closes = _prices()
+  result = fit_ticker("PKO.WA", dates, closes, **PKO_ORDER, min_residual_pvalue=1.1)
+  assert len(calls) == 1
+  assert result.order_selected
+  assert result.order == (1, 1, 0)
+
+def test_fit_ticker_does_not_reselect_when_selected_order_already_failed(monkeypatch):
+  calls = []
+
+  def fake_select_order(y):
+    calls.append(len(y))
+    return PKO_ORDER["order"], PKO_ORDER["seasonal_order"]
+
+  # Próg powyżej 1 - reszty każdego dopasowania "nie przechodzą" testu Ljung-Boxa
+  monkeypatch.setattr(model_pipeline, "select_order", fake_select_order)
+  dates, closes = _prices()
+  selected = fit_ticker("PKO.WA", dates[:-1], closes[:-1], min_residual_pvalue=1.1)
+  assert len(calls) == 1
+  assert selected.order_selected
+
+  # Ten sam rząd już wtedy był poniżej progu - kolejna estymacja nie uruchamia auto_arima
+  result = fit_ticker(
+    "PKO.WA", dates, closes, **PKO_ORDER,
+    min_residual_pvalue=1.1, previous_residual_pvalue=selected.residual_pvalue
+  )
+  assert len(calls) == 1
+  assert not result.order_selected
+
+def _update_from(fit, **overrides) -> dict:
+  update = {
+    "order": fit.order, "seasonal_order": fit.seasonal_order, "arima_params": fit.arima_params,
+    "filter_state": fit.filter_state, "state_date": fit.state_date, "garch_params": fit.garch_params,
+    "garch_sigma2": fit.garch_sigma2, "garch_resid": fit.garch_resid, "min_drift_pvalue": 0.001,
+  }
+  update.update(overrides)
+  return update
+
+def test_fit_ticker_update_matches_full_filter():
+  dates, closes = _prices()
+  fit = fit_ticker("PKO.WA", dates[:-5], closes[:-5], **PKO_ORDER)
+
+  updated = fit_ticker("PKO.WA", dates, closes, update=_update_from(fit), **PKO_ORDER)
+  assert updated.incremental
+  assert updated.arima_params == fit.arima_params
+  assert updated.state_date == dates[-1].item()
+  assert updated.innovations_n == 5
+
+  # Ten sam wynik co filtr po całym szeregu przy tych samych parametrach
+  y = prices_to_series(dates, closes)
+  results = build_sarimax(y, **PKO_ORDER).filter(np.asarray(fit.arima_params))
+  np.testing.assert_allclose(updated.arima_forecast, results.forecast(FORECAST_DAYS), rtol=1e-8)
+
+  garch = arch_model(results.resid.dropna() * 100, mean="Zero", vol="Garch", p=1, q=1).fix(fit.garch_params)
+  expected = np.sqrt(garch.forecast(horizon=FORECAST_DAYS).variance.iloc[-1].to_numpy()) / 100
+  np.testing.assert_allclose(updated.garch_forecast, expected, rtol=1e-6)
+
+def test_fit_ticker_refits_on_drift():
+  dates, closes = _prices()
+  fit = fit_ticker("PKO.WA", dates[:-20], closes[:-20], **PKO_ORDER)
+  # Zmienność ostatnich notowań kilkanaście razy większa niż w próbie estymacji
+  shocks = np.random.default_rng(7).normal(0, 8, 20)
+  closes = np.concatenate([closes[:-20], closes[-21] + np.cumsum(shocks)])
+
+  result = fit_ticker("PKO.WA", dates, closes, update=_update_from(fit), **PKO_ORDER)
+  assert not result.incremental
+  assert result.arima_params != fit.arima_params
+  assert result.innovations_n == 0
+
+  # Luka w ciągłości (stan z daty spoza szeregu) - również pełna estymacja
+  gap = fit_ticker(
+    "PKO.WA", dates, closes, update=_update_from(fit, state_date=dates[-1].item() + pd.Timedelta(days=7)),
+    **PKO_ORDER
+  )
+  assert not gap.incremental
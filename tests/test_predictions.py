@@ -1,6 +1,15 @@
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from app.config import settings
+from app.core.cache import dashboard_cache
+from app.models.company import Company
+from app.models.predictions import ForecastSnapshot, PredictionArima, PredictionGarch
+from app.schemas.predictions import DashboardData, dashboard_json
 
 @pytest.mark.asyncio
 async def test_get_predictions_unauthorized(client: AsyncClient):
@@ -53,3 +62,214 @@ async def test_get_predictions_success(
   assert "target_date" in garch_first
   assert "predicted_volatility" in garch_first
   assert isinstance(garch_first["predicted_volatility"], (int, float))
+
+async def _add_forecast(db_session, ticker: str, forecast_date: date):
+  result = await db_session.execute(select(Company).filter_by(ticker=ticker))
+  company = result.scalar_one()
+  db_session.add(ForecastSnapshot(
+    company_id=company.id,
+    forecast_date=forecast_date,
+    horizon=[
+      {
+        "target_date": (forecast_date + timedelta(days=i + 1)).isoformat(),
+        "predicted_value": 10.0 + i,
+        "predicted_volatility": 0.1 * (i + 1),
+      }
+      for i in range(10)
+    ]
+  ))
+  await db_session.commit()
+  return company
+
+@pytest.mark.asyncio
+async def test_get_predictions_served_from_cache(
+  client: AsyncClient, logged_in_token: str, db_session
+):
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  company = await _add_forecast(db_session, "PKO.WA", date(2024, 1, 2))
+
+  response = await client.get("/api/v1/predictions/pko.wa", headers=headers)
+  assert response.status_code == 200
+  assert response.json()["last_update"] == "2024-01-02"
+  assert dashboard_cache.get("PKO.WA").body == response.content
+
+  # Ta sama wersja snapshotu - odpowiedź z pamięci podręcznej, nie z bazy
+  snapshot = await db_session.get(ForecastSnapshot, company.id)
+  snapshot.payload = b'{"stale":true}'
+  await db_session.commit()
+  cached = await client.get("/api/v1/predictions/PKO.WA", headers=headers)
+  assert cached.status_code == 200
+  assert cached.content == response.content
+
+  # Nowy run zapisany przez inny proces (bez invalidate w tym procesie) - nowa wersja z bazy
+  snapshot.forecast_date = date(2024, 1, 3)
+  snapshot.payload = None
+  await db_session.commit()
+  response = await client.get("/api/v1/predictions/PKO.WA", headers=headers)
+  assert response.status_code == 200
+  assert response.json()["last_update"] == "2024-01-03"
+  batch = await client.get("/api/v1/predictions?tickers=PKO.WA", headers=headers)
+  assert batch.json()["PKO.WA"]["last_update"] == "2024-01-03"
+
+  await db_session.execute(delete(ForecastSnapshot).where(ForecastSnapshot.company_id == company.id))
+  response = await client.get("/api/v1/predictions/PKO.WA", headers=headers)
+  assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_get_predictions_from_snapshot(
+  client: AsyncClient, logged_in_token: str, db_session
+):
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  await _add_forecast(db_session, "SPL.WA", date(2024, 3, 1))
+
+  response = await client.get("/api/v1/predictions/SPL.WA", headers=headers)
+  assert response.status_code == 200
+  data = response.json()
+  assert data["ticker"] == "SPL.WA"
+  assert data["last_update"] == "2024-03-01"
+  assert len(data["arima_forecast"]) == 10
+  assert len(data["garch_forecast"]) == 10
+  assert data["arima_forecast"][0] == {"target_date": "2024-03-02", "predicted_value": 10.0}
+  assert data["garch_forecast"][-1]["predicted_volatility"] == pytest.approx(1.0)
+
+def test_dashboard_json_matches_schema():
+  horizon = [
+    {"target_date": "2024-03-02", "predicted_value": 10.0, "predicted_volatility": 0.012345678901},
+    {"target_date": "2024-03-03", "predicted_value": 10.25, "predicted_volatility": None},
+    {"target_date": "2024-03-04", "predicted_value": 11, "predicted_volatility": 1e-7},
+  ]
+  expected = DashboardData(
+    ticker="SPL.WA",
+    last_update=date(2024, 3, 1),
+    arima_forecast=horizon,
+    garch_forecast=[h for h in horizon if h["predicted_volatility"] is not None],
+  ).model_dump_json().encode()
+  assert dashboard_json("SPL.WA", date(2024, 3, 1), horizon) == expected
+  assert dashboard_json("SPL.WA", "2024-03-01", horizon) == expected
+
+@pytest.mark.asyncio
+async def test_get_predictions_serves_precomputed_payload(
+  client: AsyncClient, logged_in_token: str, db_session
+):
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  company = await _add_forecast(db_session, "SPL.WA", date(2024, 3, 1))
+  snapshot = await db_session.get(ForecastSnapshot, company.id)
+  payload = dashboard_json("SPL.WA", date(2024, 3, 1), snapshot.horizon[:2])
+  snapshot.payload = payload
+  await db_session.commit()
+
+  response = await client.get("/api/v1/predictions/SPL.WA", headers=headers)
+  assert response.status_code == 200
+  assert response.headers["content-type"] == "application/json"
+  assert response.content == payload
+
+  dashboard_cache.clear()
+  response = await client.get("/api/v1/predictions?tickers=SPL.WA", headers=headers)
+  assert response.status_code == 200
+  assert response.content == b'{"SPL.WA":' + payload + b"}"
+
+@pytest.mark.asyncio
+async def test_get_predictions_batch(
+  client: AsyncClient, logged_in_token: str, db_session
+):
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  await _add_forecast(db_session, "PKO.WA", date(2024, 1, 2))
+  await _add_forecast(db_session, "SPL.WA", date(2024, 1, 3))
+
+  # SPL.WA z cache, PKO.WA z bazy
+  await client.get("/api/v1/predictions/SPL.WA", headers=headers)
+
+  response = await client.get(
+    "/api/v1/predictions",
+    params={"tickers": "pko.wa, SPL.WA,BOS.WA,FAKE"},
+    headers=headers,
+  )
+  assert response.status_code == 200
+  data = response.json()
+  assert list(data) == ["PKO.WA", "SPL.WA"]
+  assert data["PKO.WA"]["last_update"] == "2024-01-02"
+  assert data["SPL.WA"]["last_update"] == "2024-01-03"
+  assert len(data["PKO.WA"]["garch_forecast"]) == 10
+
+@pytest.mark.asyncio
+async def test_get_predictions_batch_too_many(client: AsyncClient, logged_in_token: str):
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  tickers = ",".join(f"T{i}" for i in range(101))
+  response = await client.get("/api/v1/predictions", params={"tickers": tickers}, headers=headers)
+  assert response.status_code == 400
+
+async def _add_forecast_run(db_session, company_id: int, forecast_date: date, base: float):
+  for i in range(10):
+    target = forecast_date + timedelta(days=i + 1)
+    db_session.add(PredictionArima(
+      company_id=company_id, forecast_date=forecast_date,
+      target_date=target, predicted_value=base + i
+    ))
+    db_session.add(PredictionGarch(
+      company_id=company_id, forecast_date=forecast_date,
+      target_date=target, predicted_volatility=0.5
+    ))
+  await db_session.commit()
+
+@pytest.mark.asyncio
+async def test_get_predictions_as_of(client: AsyncClient, logged_in_token: str, db_session):
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  company = await _add_forecast(db_session, "BHW.WA", date(2024, 1, 10))
+  await _add_forecast_run(db_session, company.id, date(2024, 1, 2), base=100.0)
+  await _add_forecast_run(db_session, company.id, date(2024, 1, 5), base=200.0)
+  await _add_forecast_run(db_session, company.id, date(2024, 1, 10), base=300.0)
+
+  response = await client.get(
+    "/api/v1/predictions/BHW.WA", params={"as_of": "2024-01-07"}, headers=headers
+  )
+  assert response.status_code == 200
+  data = response.json()
+  assert data["last_update"] == "2024-01-05"
+  assert data["arima_forecast"][0] == {"target_date": "2024-01-06", "predicted_value": 200.0}
+  assert len(data["garch_forecast"]) == 10
+
+  response = await client.get(
+    "/api/v1/predictions/BHW.WA", params={"as_of": "2024-01-01"}, headers=headers
+  )
+  assert response.status_code == 404
+  assert response.json()["detail"] == "No predictions found for this company yet."
+
+  response = await client.get("/api/v1/predictions/BHW.WA", headers=headers)
+  assert response.json()["last_update"] == "2024-01-10"
+
+@pytest.mark.asyncio
+async def test_get_predictions_conditional(client: AsyncClient, logged_in_token: str, db_session):
+  headers = {"Authorization": f"Bearer {logged_in_token}"}
+  company = await _add_forecast(db_session, "SPL.WA", date(2024, 1, 2))
+  snapshot = await db_session.get(ForecastSnapshot, company.id)
+  snapshot.updated_at = datetime(2024, 1, 2, 1, 30)
+  await db_session.commit()
+
+  response = await client.get("/api/v1/predictions/SPL.WA", headers=headers)
+  assert response.status_code == 200
+  etag = response.headers["etag"]
+  assert etag.startswith(f'"{company.id}-20240102')
+  assert response.headers["last-modified"] == "Tue, 02 Jan 2024 01:30:00 GMT"
+  assert response.headers["cache-control"] == settings.PREDICTIONS_CACHE_CONTROL
+
+  not_modified = await client.get(
+    "/api/v1/predictions/SPL.WA", headers={**headers, "If-None-Match": f'W/"x", {etag}'}
+  )
+  assert not_modified.status_code == 304
+  assert not_modified.content == b""
+  assert not_modified.headers["etag"] == etag
+
+  since = await client.get(
+    "/api/v1/predictions/SPL.WA", headers={**headers, "If-Modified-Since": response.headers["last-modified"]}
+  )
+  assert since.status_code == 304
+
+  # Nowy run (zapisany przez worker) - stary ETag już nie pasuje, wpis w pamięci podręcznej jest pomijany
+  assert dashboard_cache.get("SPL.WA").etag == etag
+  snapshot.forecast_date = date(2024, 1, 3)
+  snapshot.updated_at = datetime(2024, 1, 3, 1, 30)
+  await db_session.commit()
+  changed = await client.get("/api/v1/predictions/SPL.WA", headers={**headers, "If-None-Match": etag})
+  assert changed.status_code == 200
+  assert changed.headers["etag"] != etag
+  assert changed.json()["last_update"] == "2024-01-03"
@@ -0,0 +1,43 @@
+import numpy as np
+from datetime import date
+
+from app.workers.price_store import PriceStore
+
+def _arrays(start: str, n: int, first_close: float = 1.0):
+  dates = np.arange(np.datetime64(start), np.datetime64(start) + n, dtype="datetime64[D]")
+  closes = np.arange(n, dtype=np.float64) + first_close
+  return dates, closes
+
+def test_price_store_write_and_read(tmp_path):
+  store = PriceStore(tmp_path)
+  assert store.read("PKO.WA") is None
+
+  dates, closes = _arrays("2024-01-01", 5)
+  store.write("PKO.WA", dates, closes)
+
+  read_dates, read_closes = store.read("PKO.WA")
+  assert isinstance(read_closes, np.memmap)
+  np.testing.assert_array_equal(read_dates, dates)
+  np.testing.assert_array_equal(read_closes, closes)
+  assert store.last_date("PKO.WA") == date(2024, 1, 5)
+
+def test_price_store_append(tmp_path):
+  store = PriceStore(tmp_path)
+  store.write("PKO.WA", *_arrays("2024-01-01", 3))
+  store.append("PKO.WA", *_arrays("2024-01-04", 2, first_close=10.0))
+
+  dates, closes = store.read("PKO.WA")
+  assert len(dates) == 5
+  assert store.last_date("PKO.WA") == date(2024, 1, 5)
+  assert closes.tolist() == [1.0, 2.0, 3.0, 10.0, 11.0]
+
+def test_price_store_detects_torn_files(tmp_path):
+  store = PriceStore(tmp_path)
+  store.write("PKO.WA", *_arrays("2024-01-01", 3))
+  dates_path, closes_path = store._paths("PKO.WA")
+  with open(closes_path, "ab") as f:
+    f.write(b"\0" * 8)
+  assert store.read("PKO.WA") is None
+
+  store.invalidate("PKO.WA")
+  assert not dates_path.exists() and not closes_path.exists()
@@ -0,0 +1,315 @@
+import asyncio
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from app.config import settings
+from app.core.metrics import registry
+from app.models.company import Company
+from app.models.model_state import ModelState
+from app.models.predictions import ForecastSnapshot, PredictionArima, PredictionGarch, PriceHistory
+from app.schemas.predictions import dashboard_json
+from app.workers import scheduler
+from app.workers.model_pipeline import FORECAST_DAYS, FitResult, fit_ticker
+from app.workers.price_store import PriceStore
+from app.workers.scheduler import fit_kwargs, price_rows_from_frame
+
+def fake_prices(ticker: str, start_date: date) -> pd.DataFrame:
+  dates = pd.bdate_range(start_date, "2023-12-29")
+  rng = np.random.default_rng(sum(map(ord, ticker)))
+  closes = 50 + np.cumsum(rng.normal(0, 0.5, len(dates)))
+  return pd.DataFrame({"Date": dates, "Close": closes})
+
+@pytest.fixture
+def offline_download(monkeypatch, tmp_path_factory):
+  data_dir = tmp_path_factory.mktemp("market_data")
+  for ticker in ["BOS.WA", "PKO.WA"]:
+    fake_prices(ticker, date(2020, 1, 1)).to_csv(data_dir / f"{ticker}.csv", index=False)
+  monkeypatch.setattr(settings, "MARKET_DATA_PROVIDER", "file")
+  monkeypatch.setattr(settings, "MARKET_DATA_DIR", str(data_dir))
+
+def test_fit_ticker_returns_arrays():
+  df = fake_prices("PKO.WA", date(2022, 1, 3))
+  result = fit_ticker(
+    "PKO.WA", df["Date"].values.astype("datetime64[D]"), df["Close"].values,
+    order=(3, 1, 1), seasonal_order=(0, 0, 0, 5)
+  )
+  assert result.ticker == "PKO.WA"
+  assert isinstance(result.arima_forecast, np.ndarray)
+  assert result.arima_forecast.shape == (FORECAST_DAYS,)
+  assert result.garch_forecast.shape == (FORECAST_DAYS,)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [1, 2])
+async def test_nightly_job_offline(db_session, offline_download, monkeypatch, workers):
+  monkeypatch.setattr(settings, "TRAINING_WORKERS", workers)
+  tickers = ["BOS.WA", "PKO.WA"]
+
+  await scheduler.run_nightly_prediction_job(db=db_session, tickers=tickers)
+
+  companies = (await db_session.execute(
+    select(Company.id, Company.ticker).where(Company.ticker.in_(tickers))
+  )).all()
+  for company_id, ticker in companies:
+    prices = (await db_session.execute(
+      select(PriceHistory).where(PriceHistory.company_id == company_id)
+    )).scalars().all()
+    assert prices[0].date == date(2020, 1, 1)
+    assert prices[-1].date == date(2023, 12, 29)
+
+    arima = (await db_session.execute(
+      select(PredictionArima).where(PredictionArima.company_id == company_id)
+    )).scalars().all()
+    garch = (await db_session.execute(
+      select(PredictionGarch).where(PredictionGarch.company_id == company_id)
+    )).scalars().all()
+    assert len(arima) == FORECAST_DAYS
+    assert len(garch) == FORECAST_DAYS
+
+    snapshot = await db_session.get(ForecastSnapshot, company_id)
+    assert snapshot.forecast_date == date.today()
+    assert len(snapshot.horizon) == FORECAST_DAYS
+    assert snapshot.payload == dashboard_json(ticker, snapshot.forecast_date, snapshot.horizon)
+
+    for stage in ("price_insert", "history_load", "arima_fit", "garch_fit", "forecast_write"):
+      assert registry.get_sample_value(
+        "pipeline_stage_duration_seconds_count",
+        {"stage": stage, "ticker": ticker, "outcome": "success"},
+      )
+
+    state = await db_session.get(ModelState, company_id)
+    assert state.fitted_at == date.today()
+    assert len(state.garch_params) == 3
+    assert state.arima_params
+    assert state.order is not None
+
+@pytest.mark.asyncio
+async def test_nightly_job_batch_garch(db_session, offline_download, monkeypatch):
+  monkeypatch.setattr(settings, "TRAINING_WORKERS", 1)
+  monkeypatch.setattr(settings, "GARCH_ENGINE", "batch")
+  monkeypatch.setattr(settings, "GARCH_BATCH_SIZE", 2)
+  tickers = ["BOS.WA", "PKO.WA"]
+
+  outcomes = await scheduler.run_nightly_prediction_job(db=db_session, tickers=tickers)
+  assert sorted(outcomes.values()) == ["written", "written"]
+
+  company_ids = (await db_session.execute(
+    select(Company.id).where(Company.ticker.in_(tickers))
+  )).scalars().all()
+  for company_id in company_ids:
+    garch = (await db_session.execute(
+      select(PredictionGarch.predicted_volatility).where(PredictionGarch.company_id == company_id)
+    )).scalars().all()
+    assert len(garch) == FORECAST_DAYS
+    assert all(v > 0 for v in garch)
+    state = await db_session.get(ModelState, company_id)
+    assert len(state.garch_params) == 3
+
+@pytest.mark.asyncio
+async def test_nightly_job_overlaps_download_and_fit(db_session, monkeypatch):
+  monkeypatch.setattr(settings, "TRAINING_WORKERS", 1)
+  monkeypatch.setattr(settings, "PIPELINE_DOWNLOAD_BATCH_SIZE", 1)
+  monkeypatch.setattr(settings, "PIPELINE_DOWNLOAD_CONCURRENCY", 1)
+  monkeypatch.setattr(settings, "PIPELINE_QUEUE_SIZE", 1)
+  tickers = ["BHW.WA", "BOS.WA", "PKO.WA"]
+  events = []
+
+  async def slow_download(start_dates):
+    await asyncio.sleep(0.2)
+    events.extend(("downloaded", ticker) for ticker in start_dates)
+    return {ticker: fake_prices(ticker, start) for ticker, start in start_dates.items()}
+
+  def quick_fit(ticker, dates, closes, **kwargs):
+    events.append(("fit", ticker))
+    return FitResult(ticker=ticker, arima_forecast=np.ones(FORECAST_DAYS), garch_forecast=None)
+
+  monkeypatch.setattr(scheduler, "download_prices", slow_download)
+  monkeypatch.setattr(scheduler, "fit_ticker", quick_fit)
+
+  await scheduler.run_nightly_prediction_job(db=db_session, tickers=tickers)
+
+  # Trening pierwszego tickera rusza, zanim skończy się pobieranie ostatniego
+  kinds = [event for event, _ in events]
+  assert kinds.index("fit") < len(kinds) - 1 - kinds[::-1].index("downloaded")
+  assert sorted(ticker for event, ticker in events if event == "fit") == tickers
+  written = (await db_session.execute(
+    select(func.count(func.distinct(PredictionArima.company_id)))
+    .join(Company, Company.id == PredictionArima.company_id)
+    .where(Company.ticker.in_(tickers), PredictionArima.forecast_date == date.today())
+  )).scalar_one()
+  assert written == len(tickers)
+
+def test_price_rows_from_frame_filters_and_deduplicates():
+  df = pd.DataFrame({
+    "Date": pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-03", "2024-01-04", "2024-01-05"]),
+    "Close": [10.0, 11.0, 11.5, np.nan, 12.0],
+  })
+  rows = price_rows_from_frame(7, df, date(2024, 1, 2))
+  assert rows == [
+    {"date": date(2024, 1, 3), "close": 11.5, "company_id": 7},
+    {"date": date(2024, 1, 5), "close": 12.0, "company_id": 7},
+  ]
+  assert price_rows_from_frame(7, pd.DataFrame(), None) == []
+
+@pytest.mark.asyncio
+async def test_nightly_job_uses_price_store(db_session, offline_download, monkeypatch, tmp_path):
+  monkeypatch.setattr(settings, "TRAINING_WORKERS", 1)
+  monkeypatch.setattr(settings, "PRICE_STORE_DIR", str(tmp_path))
+
+  await scheduler.run_nightly_prediction_job(db=db_session, tickers=["PKO.WA"])
+
+  store = PriceStore(tmp_path)
+  dates, closes = store.read("PKO.WA")
+  company_id = (await db_session.execute(
+    select(Company.id).where(Company.ticker == "PKO.WA")
+  )).scalar_one()
+  prices = (await db_session.execute(
+    select(PriceHistory.date, PriceHistory.close)
+    .where(PriceHistory.company_id == company_id)
+    .order_by(PriceHistory.date)
+  )).all()
+  assert [p.date for p in prices] == dates.tolist()
+  assert [p.close for p in prices] == closes.tolist()
+
+  # Plik niezgodny z bazą jest odbudowywany z bazy
+  store.write("PKO.WA", dates[:10], closes[:10])
+  arrays = await scheduler.load_price_arrays(db_session, company_id, "PKO.WA", prices[-1].date, store)
+  assert len(arrays[0]) == len(prices)
+  assert store.last_date("PKO.WA") == prices[-1].date
+
+def test_fit_kwargs_reselects_on_cadence(monkeypatch):
+  monkeypatch.setattr(settings, "ORDER_RESELECT_DAYS", 30)
+  today = date(2024, 3, 1)
+  state = {
+    "order": [3, 1, 1], "seasonal_order": [0, 0, 0, 5],
+    "order_selected_at": date(2024, 2, 15),
+    "arima_params": [0.1], "garch_params": [1.0, 0.1, 0.8], "residual_pvalue": 0.004,
+  }
+  kwargs = fit_kwargs(state, today)
+  assert kwargs["reselect_order"] is False
+  assert kwargs["previous_residual_pvalue"] == 0.004
+  assert kwargs["order"] == [3, 1, 1]
+
+  state["order_selected_at"] = date(2024, 1, 1)
+  assert fit_kwargs(state, today)["reselect_order"] is True
+  assert fit_kwargs(None, today) == {"reselect_order": True}
+
+@pytest.mark.asyncio
+async def test_nightly_job_keeps_forecast_history(db_session, offline_download, monkeypatch):
+  monkeypatch.setattr(settings, "TRAINING_WORKERS", 1)
+  company_id = (await db_session.execute(
+    select(Company.id).where(Company.ticker == "PKO.WA")
+  )).scalar_one()
+  yesterday = date.today() - timedelta(days=1)
+  db_session.add(PredictionArima(
+    company_id=company_id, forecast_date=yesterday, target_date=date.today(), predicted_value=1.0
+  ))
+  await db_session.commit()
+
+  await scheduler.run_nightly_prediction_job(db=db_session, tickers=["PKO.WA"])
+  await scheduler.run_nightly_prediction_job(db=db_session, tickers=["PKO.WA"])
+
+  runs = (await db_session.execute(
+    select(PredictionArima.forecast_date, func.count())
+    .where(PredictionArima.company_id == company_id)
+    .group_by(PredictionArima.forecast_date)
+  )).all()
+  assert dict(runs) == {yesterday: 1, date.today(): FORECAST_DAYS}
+
+@pytest.mark.asyncio
+async def test_refresh_job_updates_filter_without_refit(db_session, monkeypatch, tmp_path):
+  monkeypatch.setattr(settings, "TRAINING_WORKERS", 1)
+  monkeypatch.setattr(settings, "MARKET_DATA_PROVIDER", "file")
+  monkeypatch.setattr(settings, "MARKET_DATA_DIR", str(tmp_path))
+  # Test dryfu wyłączony - tu sprawdzana jest tylko ścieżka aktualizacji
+  monkeypatch.setattr(settings, "MODEL_DRIFT_MIN_PVALUE", 0.0)
+  prices = fake_prices("PKO.WA", date(2021, 1, 1))
+  prices.iloc[:-5].to_csv(tmp_path / "PKO.WA.csv", index=False)
+
+  await scheduler.run_nightly_prediction_job(db=db_session, tickers=["PKO.WA"])
+  company_id = (await db_session.execute(
+    select(Company.id).where(Company.ticker == "PKO.WA")
+  )).scalar_one()
+  state = await db_session.get(ModelState, company_id)
+  fitted_params = list(state.arima_params)
+  assert state.state_date == prices["Date"].iloc[-6].date()
+  assert state.filter_state and state.garch_sigma2 > 0
+
+  # Odświeżanie w dniu ostatniego notowania: zamknięte dni trafiają do historii, dzisiejsze notowanie tylko
+  # do filtra Kalmana. Parametry i zapisany stan bez zmian (aktualizuje je nocny job); spółka bez stanu pominięta
+  prices.to_csv(tmp_path / "PKO.WA.csv", index=False)
+  last_day = prices["Date"].iloc[-1].date()
+  companies = await scheduler.select_companies(db_session, ["PKO.WA", "BOS.WA"])
+  outcomes = await scheduler.process_companies(db_session, companies, last_day, refresh=True)
+  assert sorted(outcomes.values()) == ["skipped", "written"]
+
+  stored = (await db_session.execute(
+    select(func.max(PriceHistory.date)).where(PriceHistory.company_id == company_id)
+  )).scalar_one()
+  assert stored == prices["Date"].iloc[-2].date()
+
+  db_session.expire_all()
+  state = await db_session.get(ModelState, company_id)
+  assert state.arima_params == fitted_params
+  assert state.fitted_at == date.today()
+  assert state.state_date == prices["Date"].iloc[-6].date()
+  assert not state.innovations_n
+  assert registry.get_sample_value(
+    "pipeline_stage_duration_seconds_count", {"stage": "arima_update", "ticker": "PKO.WA", "outcome": "success"}
+  ) >= 1
+
+  snapshot = await db_session.get(ForecastSnapshot, company_id)
+  assert snapshot.forecast_date == last_day
+  assert len(snapshot.horizon) == FORECAST_DAYS
+  assert all(h["predicted_volatility"] > 0 for h in snapshot.horizon)
+
+  # Przy dryfie odświeżanie nie estymuje parametrów - spółka czeka na nocny job
+  monkeypatch.setattr(settings, "MODEL_DRIFT_MIN_PVALUE", 1.1)
+  outcomes = await scheduler.process_companies(db_session, companies, last_day, refresh=True)
+  assert outcomes[company_id] == "skipped"
+
+def test_fit_kwargs_updates_between_refits(monkeypatch):
+  monkeypatch.setattr(settings, "MODEL_REFIT_DAYS", 7)
+  today = date(2024, 3, 8)
+  state = {
+    "order": [3, 1, 1], "seasonal_order": [0, 0, 0, 5], "order_selected_at": date(2024, 3, 1),
+    "arima_params": [0.1], "garch_params": [1.0, 0.1, 0.8], "fitted_at": date(2024, 3, 4),
+    "state_date": date(2024, 3, 7), "filter_state": {"mean": [0.0], "cov": [[1.0]]},
+  }
+  assert fit_kwargs(state, today)["update"]["state_date"] == date(2024, 3, 7)
+
+  state["fitted_at"] = date(2024, 3, 1)
+  assert "update" not in fit_kwargs(state, today)
+  assert "update" in fit_kwargs(state, today, refresh=True)
+
+@pytest.mark.asyncio
+async def test_compact_forecast_history(db_session, monkeypatch):
+  monkeypatch.setattr(settings, "FORECAST_RETENTION_DAYS", 400)
+  monkeypatch.setattr(settings, "FORECAST_COMPACT_AFTER_DAYS", 30)
+  company_id = (await db_session.execute(
+    select(Company.id).where(Company.ticker == "BHW.WA")
+  )).scalar_one()
+  today = date(2024, 6, 3)
+
+  # Pn 2024-04-01 .. Pt 2024-04-12 (stare, do przerzedzenia), 2024-05-31 (świeży), 2023-01-02 (poza retencją)
+  old_runs = [date(2024, 4, 1) + timedelta(days=d) for d in range(12) if d % 7 < 5]
+  all_runs = old_runs + [date(2024, 5, 31), date(2023, 1, 2)]
+  for forecast_date in all_runs:
+    for model, column in ((PredictionArima, "predicted_value"), (PredictionGarch, "predicted_volatility")):
+      db_session.add(model(
+        company_id=company_id, forecast_date=forecast_date,
+        target_date=forecast_date + timedelta(days=1), **{column: 1.0}
+      ))
+  await db_session.commit()
+
+  deleted = await scheduler.compact_forecast_history(db_session, today=today)
+
+  for model in (PredictionArima, PredictionGarch):
+    remaining = (await db_session.execute(
+      select(model.forecast_date).where(model.company_id == company_id).order_by(model.forecast_date)
+    )).scalars().all()
+    assert remaining == [date(2024, 4, 5), date(2024, 4, 12), date(2024, 5, 31)]
+  assert deleted == 2 * (len(all_runs) - 3)
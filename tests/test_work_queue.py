@@ -0,0 +1,141 @@
+import asyncio
+import numpy as np
+import pytest
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from app.config import settings
+from app.models.company import Company
+from app.models.predictions import PredictionArima
+from app.models.work_item import WorkItem
+from app.workers import scheduler
+from app.workers.model_pipeline import FORECAST_DAYS, FitResult
+from app.workers.queue_worker import keep_leases, process_work_batch
+from app.workers.work_queue import claim_work_items, complete_work_items, enqueue_companies, fail_work_items
+
+RUN_DATE = date(2024, 3, 1)
+
+def _session_factory(db_session):
+  # Fabryka sesji workera zwracająca wspólną sesję testu (transakcja wycofywana po teście)
+  @asynccontextmanager
+  async def factory():
+    yield db_session
+  return factory
+
+async def _statuses(db_session) -> dict[int, tuple[str, int]]:
+  rows = (await db_session.execute(select(WorkItem.id, WorkItem.status, WorkItem.attempts))).all()
+  return {item_id: (status, attempts) for item_id, status, attempts in rows}
+
+@pytest.mark.asyncio
+async def test_enqueue_is_idempotent(db_session):
+  assert await enqueue_companies(db_session, RUN_DATE) == 5
+  await enqueue_companies(db_session, RUN_DATE)
+  await enqueue_companies(db_session, RUN_DATE, ["PKO.WA"])
+
+  count = (await db_session.execute(select(func.count()).select_from(WorkItem))).scalar_one()
+  assert count == 5
+
+@pytest.mark.asyncio
+async def test_claims_are_disjoint(db_session):
+  await enqueue_companies(db_session, RUN_DATE)
+
+  first = await claim_work_items(db_session, "worker-a", 3)
+  second = await claim_work_items(db_session, "worker-b", 3)
+  third = await claim_work_items(db_session, "worker-c", 3)
+
+  assert len(first) == 3
+  assert len(second) == 2
+  assert third == []
+  assert not {item[0] for item in first} & {item[0] for item in second}
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_reclaimed(db_session, monkeypatch):
+  monkeypatch.setattr(settings, "WORK_LEASE_SECONDS", 60)
+  monkeypatch.setattr(settings, "WORK_MAX_ATTEMPTS", 2)
+  await enqueue_companies(db_session, RUN_DATE, ["PKO.WA"])
+  now = datetime(2024, 3, 1, 1, 0)
+
+  [(item_id, _, run_date)] = await claim_work_items(db_session, "worker-a", 10, now=now)
+  assert run_date == RUN_DATE
+  assert await claim_work_items(db_session, "worker-b", 10, now=now + timedelta(seconds=30)) == []
+
+  reclaimed = await claim_work_items(db_session, "worker-b", 10, now=now + timedelta(seconds=61))
+  assert [item[0] for item in reclaimed] == [item_id]
+
+  # Poprzedni właściciel stracił dzierżawę - jego wynik jest ignorowany
+  assert await complete_work_items(db_session, [item_id], "worker-a") == 0
+  assert (await _statuses(db_session))[item_id] == ("running", 2)
+
+  # Druga wygasła dzierżawa przy WORK_MAX_ATTEMPTS=2 -> failed
+  assert await claim_work_items(db_session, "worker-c", 10, now=now + timedelta(seconds=200)) == []
+  assert (await _statuses(db_session))[item_id] == ("failed", 2)
+
+@pytest.mark.asyncio
+async def test_failed_item_is_retried(db_session, monkeypatch):
+  monkeypatch.setattr(settings, "WORK_MAX_ATTEMPTS", 2)
+  await enqueue_companies(db_session, RUN_DATE, ["PKO.WA"])
+
+  [(item_id, _, _)] = await claim_work_items(db_session, "worker-a", 10)
+  await fail_work_items(db_session, [item_id], "worker-a", "boom")
+  assert (await _statuses(db_session))[item_id] == ("pending", 1)
+
+  await claim_work_items(db_session, "worker-a", 10)
+  await fail_work_items(db_session, [item_id], "worker-a", "boom")
+  assert (await _statuses(db_session))[item_id] == ("failed", 2)
+  assert await claim_work_items(db_session, "worker-a", 10) == []
+
+@pytest.mark.asyncio
+async def test_process_work_batch_writes_forecasts(db_session, monkeypatch):
+  monkeypatch.setattr(settings, "TRAINING_WORKERS", 1)
+  dates = np.arange(np.datetime64("2023-01-02"), np.datetime64("2023-12-30"))
+
+  async def no_download(start_dates):
+    return {}
+
+  async def fake_history(db, company_id, ticker, last_date, store=None):
+    return dates, np.linspace(10, 20, len(dates))
+
+  def quick_fit(ticker, dates, closes, **kwargs):
+    if ticker == "BOS.WA":
+      raise RuntimeError("fit failed")
+    return FitResult(ticker=ticker, arima_forecast=np.ones(FORECAST_DAYS), garch_forecast=None)
+
+  monkeypatch.setattr(scheduler, "download_prices", no_download)
+  monkeypatch.setattr(scheduler, "load_price_arrays", fake_history)
+  monkeypatch.setattr(scheduler, "fit_ticker", quick_fit)
+  await enqueue_companies(db_session, RUN_DATE, ["PKO.WA", "BOS.WA"])
+
+  assert await process_work_batch(_session_factory(db_session), "worker-a") == 2
+  assert await process_work_batch(_session_factory(db_session), "worker-a", 1) == 1
+
+  items = dict((await db_session.execute(
+    select(Company.ticker, WorkItem.status).join(Company, Company.id == WorkItem.company_id)
+  )).all())
+  assert items == {"PKO.WA": "done", "BOS.WA": "pending"}
+  written = (await db_session.execute(
+    select(func.count()).select_from(PredictionArima)
+    .join(Company, Company.id == PredictionArima.company_id)
+    .where(Company.ticker == "PKO.WA", PredictionArima.forecast_date == RUN_DATE)
+  )).scalar_one()
+  assert written == FORECAST_DAYS
+
+@pytest.mark.asyncio
+async def test_lease_is_renewed_while_batch_runs(db_session, monkeypatch):
+  monkeypatch.setattr(settings, "WORK_LEASE_SECONDS", 0.3)
+  await enqueue_companies(db_session, RUN_DATE, ["PKO.WA", "BOS.WA"])
+  now = datetime(2024, 3, 1, 1, 0)
+  claimed = await claim_work_items(db_session, "worker-a", 10, now=now)
+  item_ids = [item_id for item_id, _, _ in claimed]
+
+  heartbeat = asyncio.create_task(keep_leases(_session_factory(db_session), item_ids, "worker-a"))
+  await asyncio.sleep(0.25)
+  heartbeat.cancel()
+
+  # Dzierżawa przedłużona od chwili bieżącej - inny worker nie przejmie paczki w trakcie treningu
+  assert await claim_work_items(db_session, "worker-b", 10, now=now + timedelta(seconds=1)) == []
+  expires = (await db_session.execute(
+    select(WorkItem.lease_expires_at).where(WorkItem.id.in_(item_ids))
+  )).scalars().all()
+  assert all(e > now + timedelta(seconds=1) for e in expires)